@@ -1,20 +1,9 @@
-import os
-import requests
-import time
-from dotenv import load_dotenv
+from .render_jobs import get_render_queue, DONE
+from .instrumentation import instrument
 
-load_dotenv()
-D_ID_KEY = os.getenv("D_ID_API_KEY")
-
-def create_animated_clip(script_text):
-    """Creates a video of a talking presenter using the D-ID API and returns the video URL."""
-    if not D_ID_KEY:
-        print("D_ID_API_KEY not found.")
-        return None
-
-    create_url = "https://api.d-id.com/animations"
-    
-    payload = {
+def build_talk_payload(script_text):
+    """Builds the D-ID talk request for a script."""
+    return {
         "script": {
             "type": "text",
             "input": script_text,
@@ -23,43 +12,34 @@ def create_animated_clip(script_text):
         "source_url": "https://create-images-results.d-id.com/DefaultPresenters/Naomi_f/image.jpeg", # Stock presenter
         "config": {"result_format": "mp4"}
     }
-    
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Basic {D_ID_KEY}"
-    }
 
-    try:
-        # POST request to start video generation
-        response = requests.post(create_url, json=payload, headers=headers)
-        response.raise_for_status()
-        
-        talk_id = response.json().get("id")
-        if not talk_id:
-            print("Failed to get talk ID from D-ID.")
-            return None
+@instrument()
+def submit_animated_clip(script_text):
+    """Submits a D-ID talking-presenter clip and returns the render job ID without waiting."""
+    queue = get_render_queue()
+    if not queue.providers["d-id"].is_configured():
+        print("D_ID_API_KEY not found.")
+        return None
 
-        # Poll the API to check for video completion
-        get_url = f"https://api.d-id.com/talks/{talk_id}"
-        while True:
-            time.sleep(5)
-            get_response = requests.get(get_url, headers=headers)
-            get_response.raise_for_status()
-            
-            result = get_response.json()
-            status = result.get("status")
+    try:
+        return queue.submit("d-id", build_talk_payload(script_text))
+    except Exception as e:
+        print(f"An API error occurred: {e}")
+        response = getattr(e, "response", None)
+        if response is not None:
+            print(f"Response Body: {response.text}")
+        return None
 
-            if status == "done":
-                video_url = result.get("result_url")
-                print(f"Video created successfully! URL: {video_url}")
-                return video_url
-            elif status == "error":
-                print(f"D-ID video generation failed: {result.get('error')}")
-                return None
+@instrument()
+def create_animated_clip(script_text, timeout=None):
+    """Creates a video of a talking presenter using the D-ID API and returns the video URL."""
+    job_id = submit_animated_clip(script_text)
+    if job_id is None:
+        return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"An API error occurred: {e}")
-        if e.response:
-            print(f"Response Body: {e.response.text}")
-        return None
\ No newline at end of file
+    job = get_render_queue().wait(job_id, timeout=timeout)
+    if job["status"] == DONE:
+        print(f"Video created successfully! URL: {job['result_url']}")
+        return job["result_url"]
+    print(f"D-ID video generation did not complete ({job['status']}). Reason: {job['error']}")
+    return None
@@ -0,0 +1,186 @@
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from .retrieval import tokenize
+from .generator import evaluate_user_answer
+from .settings import get_settings
+from .instrumentation import instrument, annotate, count
+
+# Answers shorter than this get instant feedback instead of a model call.
+MIN_ANSWER_WORDS = get_settings().grader_min_answer_words
+# Key terms taken from the lesson; an answer that mentions none of them is graded locally.
+KEY_TERM_LIMIT = 12
+MIN_KEY_TERMS = 3
+# Shingle (word 3-gram) similarity above which an earlier answer's feedback is reused.
+SHINGLE_SIZE = 3
+DUPLICATE_SIMILARITY = get_settings().grader_duplicate_similarity
+# Lesson context sent with escalated answers; smaller than EVALUATION_CONTEXT_TOKENS
+# because retrieval is focused on the terms the answer missed.
+GRADER_CONTEXT_TOKENS = 800
+MAX_SCENARIOS = 256
+MAX_ANSWERS_PER_SCENARIO = 50
+
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_HEADING_RE = re.compile(r"^\s*#{1,6}\s+(.+)$", re.MULTILINE)
+_MERMAID_RE = re.compile(r"```mermaid.*?```", re.DOTALL)
+# Common words that TF-IDF over a single lesson can't tell apart from content words.
+_GENERIC_WORDS = frozenset(
+    "about also another appear appears because between called could each example just known like "
+    "make makes more only other same some such than then they them think through used using very where would".split()
+)
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ions", "ion", "ness", "ies", "es", "ed", "ly", "s")
+
+def stem(term):
+    """Strips common English suffixes so "refracted" and "refraction" match."""
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 4:
+            return term[:-len(suffix)]
+    return term
+
+def key_terms(explanation, scenario="", limit=KEY_TERM_LIMIT):
+    """
+    Returns the lesson's key terms, most important first: words the lesson puts
+    in bold or headings, then distinctive words by TF-IDF across its paragraphs.
+    Terms that also appear in the scenario are ranked first.
+    """
+    text = _MERMAID_RE.sub(" ", explanation)
+    emphasized = Counter()
+    for match in _BOLD_RE.finditer(text):
+        emphasized.update(tokenize(match.group(1) or match.group(2)))
+    for match in _HEADING_RE.finditer(text):
+        emphasized.update(tokenize(match.group(1)))
+
+    paragraphs = [tokenize(p) for p in re.split(r"\n\s*\n", text) if p.strip()]
+    document_frequency = Counter(term for paragraph in paragraphs for term in set(paragraph))
+    term_frequency = Counter(term for paragraph in paragraphs for term in paragraph)
+    n = len(paragraphs) or 1
+    scenario_stems = {stem(t) for t in tokenize(scenario)}
+
+    weights = {}
+    for term, tf in term_frequency.items():
+        if len(term) < 4 or term.isdigit() or term in _GENERIC_WORDS:
+            continue
+        weight = (1 + math.log(tf)) * math.log(1 + n / document_frequency[term])
+        weight *= 1 + emphasized.get(term, 0)
+        if stem(term) in scenario_stems:
+            weight *= 2
+        key = stem(term)
+        # Inflections of one word count once, under their highest-weighted form.
+        if key not in weights or weight > weights[key][0]:
+            weights[key] = (weight, term)
+    ranked = sorted(weights.values(), key=lambda item: (-item[0], item[1]))
+    return [term for _, term in ranked[:limit]]
+
+def term_coverage(answer, terms):
+    """Returns (fraction of terms the answer mentions, the terms it misses)."""
+    answer_stems = {stem(t) for t in tokenize(answer)}
+    missing = [term for term in terms if stem(term) not in answer_stems]
+    return (1 - len(missing) / len(terms)) if terms else 1.0, missing
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Returns the set of word n-grams of a normalized text."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _scenario_key(scenario):
+    return hashlib.sha256(" ".join(scenario.split()).encode("utf-8")).hexdigest()
+
+class FeedbackMemory:
+    """
+    Feedback given to earlier answers, per scenario, so a resubmitted or
+    near-identical answer gets the same feedback without another model call.
+    Keeps the most recent answers of the most recently used scenarios.
+    """
+
+    def __init__(self, max_scenarios=MAX_SCENARIOS, max_answers=MAX_ANSWERS_PER_SCENARIO):
+        self.max_scenarios = max_scenarios
+        self.max_answers = max_answers
+        self._scenarios = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find(self, scenario, answer, threshold=DUPLICATE_SIMILARITY):
+        """Returns the feedback of the most similar earlier answer above threshold, or None."""
+        key, answer_shingles = _scenario_key(scenario), shingles(answer)
+        best, best_similarity = None, threshold
+        with self._lock:
+            answers = self._scenarios.get(key)
+            if not answers:
+                return None
+            self._scenarios.move_to_end(key)
+            for previous_shingles, feedback in answers:
+                similarity = _jaccard(answer_shingles, previous_shingles)
+                if similarity >= best_similarity:
+                    best, best_similarity = feedback, similarity
+        return best
+
+    def remember(self, scenario, answer, feedback):
+        key = _scenario_key(scenario)
+        with self._lock:
+            answers = self._scenarios.setdefault(key, [])
+            self._scenarios.move_to_end(key)
+            answers.append((shingles(answer), feedback))
+            del answers[:-self.max_answers]
+            while len(self._scenarios) > self.max_scenarios:
+                self._scenarios.popitem(last=False)
+
+def _short_answer_feedback(answer):
+    if not answer.strip():
+        return "### Feedback:\nYou haven't written an answer yet. Give it a try, explaining your reasoning step by step!"
+    return ("### Feedback:\nYour answer is too short to evaluate. Explain *why* you think so, "
+            "using the ideas from the lesson, and submit again.")
+
+def _off_topic_feedback(terms):
+    hints = ", ".join(f"**{term}**" for term in terms[:5])
+    return ("### Feedback:\nYour answer doesn't seem to use any of the key ideas from this lesson yet, "
+            f"so it is likely **incorrect**. Re-read the lesson and think about how these apply to the scenario: {hints}.")
+
+@instrument()
+def grade_answer(scenario, user_answer, explanation, memory=None):
+    """
+    Tiered evaluation of a scenario answer. Empty or very short answers, answers
+    that miss every key term of the lesson, and near-duplicates of earlier answers
+    are handled locally; only the rest are sent to the model, with a trimmed
+    context focused on the key terms the answer missed.
+    Returns {"feedback", "tier", "coverage", "missing_terms"}; tier is one of
+    "empty", "off_topic", "duplicate" or "llm".
+    """
+    memory = memory or get_feedback_memory()
+    terms = key_terms(explanation, scenario)
+    coverage, missing = term_coverage(user_answer, terms)
+    result = {"coverage": round(coverage, 2), "missing_terms": missing}
+
+    if len(user_answer.split()) < MIN_ANSWER_WORDS:
+        result.update(feedback=_short_answer_feedback(user_answer), tier="empty")
+    elif len(terms) >= MIN_KEY_TERMS and coverage == 0:
+        result.update(feedback=_off_topic_feedback(terms), tier="off_topic")
+    else:
+        feedback = memory.find(scenario, user_answer)
+        if feedback is not None:
+            result.update(feedback=feedback, tier="duplicate")
+        else:
+            feedback = evaluate_user_answer(scenario, user_answer, explanation, GRADER_CONTEXT_TOKENS, missing)
+            if not feedback.startswith("Error"):
+                memory.remember(scenario, user_answer, feedback)
+            result.update(feedback=feedback, tier="llm")
+
+    count(f"grader_{result['tier']}")
+    annotate(tier=result["tier"], coverage=result["coverage"])
+    return result
+
+_memory = None
+_memory_lock = threading.Lock()
+
+def get_feedback_memory():
+    """Returns the process-wide feedback memory."""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = FeedbackMemory()
+        return _memory
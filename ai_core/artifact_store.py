@@ -0,0 +1,79 @@
+import weakref
+import threading
+
+class DocumentLease:
+    """
+    A session's reference to a shared document. The reference is dropped when the
+    lease is released or when the lease itself is garbage collected (for example
+    because the Streamlit session that held it has ended).
+    """
+
+    def __init__(self, store, doc_id):
+        self.doc_id = doc_id
+        self._finalizer = weakref.finalize(self, store._release, doc_id)
+
+    def release(self):
+        self._finalizer()
+
+class ArtifactStore:
+    """
+    Process-wide, reference-counted store of per-document artifacts (chapter text,
+    concepts, generated lessons, ...), keyed by document hash. A document is
+    evicted as soon as no session holds a lease on it.
+    """
+
+    def __init__(self):
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, doc_id):
+        """Registers a reference to a document and returns the lease that keeps it alive."""
+        with self._lock:
+            doc = self._docs.setdefault(doc_id, {"refs": 0, "artifacts": {}})
+            doc["refs"] += 1
+        return DocumentLease(self, doc_id)
+
+    def _release(self, doc_id):
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is None:
+                return
+            doc["refs"] -= 1
+            if doc["refs"] > 0:
+                return
+            del self._docs[doc_id]
+        # Give artifacts with background work (e.g. a LessonPrefetcher) a chance to stop.
+        for artifact in doc["artifacts"].values():
+            close = getattr(artifact, "close", None)
+            if callable(close):
+                close()
+
+    def get(self, doc_id, name, default=None):
+        """Returns an artifact of a document, or default if either doesn't exist."""
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is None:
+                return default
+            return doc["artifacts"].get(name, default)
+
+    def put(self, doc_id, name, value):
+        """Stores an artifact for a document. Ignored if the document has been evicted."""
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is not None:
+                doc["artifacts"][name] = value
+
+    def setdefault(self, doc_id, name, factory):
+        """Returns an artifact, creating it with factory() first if it doesn't exist yet."""
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is None:
+                return factory()
+            if name not in doc["artifacts"]:
+                doc["artifacts"][name] = factory()
+            return doc["artifacts"][name]
+
+    def stats(self):
+        """Returns the number of documents held and the references to each."""
+        with self._lock:
+            return {doc_id: doc["refs"] for doc_id, doc in self._docs.items()}
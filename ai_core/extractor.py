@@ -1,18 +1,114 @@
-import pdfplumber
+import threading
+from collections import deque
+from .settings import get_settings
+from .instrumentation import instrument, annotate
+
+# Pages handed to a worker process at a time. Small enough that only a few pages
+# are held in memory per worker, large enough to amortise re-opening the PDF.
+PAGES_PER_TASK = 4
+# Chapters shorter than two tasks are parsed in-process; a pool round trip buys nothing.
+MIN_PARALLEL_PAGES = 2 * PAGES_PER_TASK
+# Page ranges queued per worker; bounds how many parsed pages wait in memory.
+RANGES_IN_FLIGHT_PER_WORKER = 2
+EXTRACT_WORKERS = get_settings().pdf_extract_workers
 
 def clean_whitespace(s):
     """Cleans up extra whitespace from a string."""
     return " ".join(s.split())
 
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from a PDF file."""
-    text = ""
+def join_pages(pages):
+    """Joins cleaned page texts into a single document string."""
+    return " ".join(page for page in pages if page)
+
+def _page_text(page):
+    text = clean_whitespace(page.extract_text() or "")
+    page.close()
+    return text
+
+def _extract_page_range(pdf_path, start, stop):
+    """Extracts cleaned text for pages [start, stop). Runs inside a worker process."""
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return [_page_text(page) for page in pdf.pages[start:stop]]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Returns the process-wide extraction pool, started on first use and shared by every later extraction."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # multiprocessing is only imported once a chapter is long enough to need it.
+            from concurrent.futures import ProcessPoolExecutor
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+        return _pool
+
+def _discard_pool(pool):
+    """Drops a pool whose workers died, so the next extraction starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _iter_pool_pages(pdf_path, page_count, pages_per_task):
+    """Yields page texts from the shared pool in order, with a bounded window of ranges in flight."""
+    from concurrent.futures.process import BrokenProcessPool
+    pool = _get_pool()
+    ranges = iter([(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)])
+    pending = deque()
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, stop))
+            if len(pending) >= EXTRACT_WORKERS * RANGES_IN_FLIGHT_PER_WORKER:
+                break
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(pool.submit(_extract_page_range, pdf_path, *next_range))
+            yield from texts
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        # A consumer that stops early leaves the rest of its ranges unparsed.
+        for future in pending:
+            future.cancel()
+
+def iter_page_texts(pdf_path, parallel=True, pages_per_task=PAGES_PER_TASK):
+    """
+    Yields the cleaned text of each page, in page order, as soon as it is ready.
+    Long chapters are spread across the shared process pool with only a few
+    ranges in flight at once, so memory stays bounded to a few pages per worker.
+    parallel=False parses in-process (e.g. when already inside a worker process).
+    """
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        if not (parallel and EXTRACT_WORKERS > 1 and page_count >= MIN_PARALLEL_PAGES):
             for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text += page_text + "\n\n"
+                yield _page_text(page)
+            return
+    yield from _iter_pool_pages(pdf_path, page_count, pages_per_task)
+
+@instrument()
+def extract_pages_from_pdf(pdf_path, parallel=True):
+    """Extracts the whitespace-cleaned text of every page in a PDF file."""
+    try:
+        pages = list(iter_page_texts(pdf_path, parallel=parallel))
+        annotate(pages=len(pages))
+        return pages
+    except Exception as e:
+        print(f"Error reading PDF: {e}")
+        return None
+
+@instrument()
+def extract_text_from_pdf(pdf_path, parallel=True):
+    """Extracts text from a PDF file, joining pages as they are parsed."""
+    try:
+        return join_pages(iter_page_texts(pdf_path, parallel=parallel))
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return None
-    return clean_whitespace(text)
\ No newline at end of file
@@ -1,36 +1,30 @@
-import os
-import json
 import re
-from dotenv import load_dotenv
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+from .llm_client import get_client
+from .llm_cache import generate_from_template, stream_from_template
+from .structured_output import generate_validated, validate_concept_list
+from .retrieval import build_context, chunk_text
+from .instrumentation import instrument, in_current_context
 
-load_dotenv()
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+# Prompt context budgets, in estimated tokens, for the chunks retrieved per call.
+EXPLANATION_CONTEXT_TOKENS = 3000
+SCENARIO_CONTEXT_TOKENS = 500
+EVALUATION_CONTEXT_TOKENS = 1000
 
-def extract_key_concepts(full_text):
-    """Uses Gemini to identify and list the key concepts from the text."""
-    if not GEMINI_KEY:
-        return ["Error: GEMINI_API_KEY not found."]
-    try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f'Read the following textbook text and identify the main learning concepts. Return as a JSON list of strings. Text: "{full_text[:15000]}"'
-        response = model.generate_content(prompt)
-        json_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(json_text)
-    except Exception as e:
-        return [f"Error extracting concepts: {e}"]
+# Chapters longer than one concept prompt are split and mapped in parallel.
+CONCEPT_CHUNK_CHARS = 15000
+CONCEPT_CHUNK_OVERLAP = 500
+CONCEPT_MAP_WORKERS = 4
+# Prefix of the text returned (or streamed last) when a lesson fails to generate.
+EXPLANATION_ERROR = "Error: Failed to generate explanation"
+# Words ignored when deciding whether two concept names mean the same thing.
+CONCEPT_FILLER_WORDS = frozenset("a an the of and in on for to with its their".split())
 
-def generate_detailed_explanation_with_diagrams(context_text, concept_title):
-    """
-    Generates a detailed explanation with Mermaid.js diagrams embedded directly in the text.
-    """
-    if not GEMINI_KEY:
-        return "Error: GEMINI_API_KEY not found."
-    try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
+CONCEPTS_PROMPT = 'Read the following textbook text and identify the main learning concepts. Return as a JSON list of strings. Text: "{text}"'
+
+CONCEPTS_RETRY_PROMPT = 'Read the following textbook text and identify the main learning concepts. Respond with ONLY a JSON list of strings and no other text. Text: "{text}"'
+
+EXPLANATION_PROMPT = """
         Act as an expert science teacher. For the concept "{concept_title}", write a detailed explanation for a 10th-grade student.
         - Use headings, bold text, and bullet points to structure the content.
         - Break the explanation into multiple paragraphs.
@@ -38,41 +32,19 @@ def generate_detailed_explanation_with_diagrams(context_text, concept_title):
           - Each diagram must be enclosed in ```mermaid ... ``` blocks.
           - Place them at logical points where a visual would be most helpful.
 
-        Context: "{context_text[:12000]}"
+        Context: "{context}"
         """
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error: Failed to generate explanation: {e}"
 
-def generate_practical_scenario(concept_title, context_text):
-    """Uses Gemini to create a practical, real-world scenario question."""
-    if not GEMINI_KEY:
-        return "Error: GEMINI_API_KEY not found."
-    try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
+SCENARIO_PROMPT = """
         Based on the concept of "{concept_title}", create a short, practical, real-world scenario problem for a 10th-grade student.
         The scenario should end with a question that requires the student to apply their knowledge.
         For example, for "Reflection of Light", a scenario could be: "You are standing by a calm lake in the morning and see a perfect reflection of a mountain. Based on the concept of relative motion, describe the mountain's state (at rest or in motion) from two different perspectives: a) Your perspective, standing at the bus stop. b) The perspective of another passenger sitting directly opposite Sarah inside the bus. For each perspective, explain your reasoning, explicitly stating the reference point used for your observation."
         Return only the scenario and the question.
 
-        Context: "{context_text[:2000]}"
+        Context: "{context}"
         """
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        return f"Error generating scenario: {e}"
 
-def evaluate_user_answer(scenario, user_answer, context_text):
-    """Uses Gemini to evaluate the user's answer to the scenario and provide feedback."""
-    if not GEMINI_KEY:
-        return "Error: GEMINI_API_KEY not found."
-    try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
+EVALUATION_PROMPT = """
         A student was given the following scenario:
         ---
         {scenario}
@@ -87,9 +59,139 @@ def evaluate_user_answer(scenario, user_answer, context_text):
         - Provide a simple, encouraging explanation of the correct answer and why.
         - Use markdown for formatting.
 
-        Correct Context: "{context_text[:4000]}"
+        Correct Context: "{context}"
         """
-        response = model.generate_content(prompt)
-        return response.text.strip()
+
+@instrument()
+def _extract_chunk_concepts(text):
+    """Runs concept extraction on one prompt-sized piece of text and returns the parsed list."""
+    concepts, problems = generate_validated(CONCEPTS_PROMPT, validate_concept_list, topup_template=CONCEPTS_RETRY_PROMPT, text=text)
+    if not concepts:
+        raise ValueError("; ".join(problems) or "no concepts found")
+    return concepts
+
+def _singular(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+def concept_key(concept):
+    """
+    Returns the identity of a concept name: its content words, singularized and
+    unordered. "The Concave Mirror" and "concave mirrors" share a key, while
+    "Concave Mirrors" and "Convex Mirrors" don't, because one content word differs.
+    """
+    words = re.sub(r"[^a-z0-9]+", " ", concept.lower()).split()
+    return tuple(sorted({_singular(w) for w in words if w not in CONCEPT_FILLER_WORDS}))
+
+def merge_concept_lists(concept_lists):
+    """
+    Merges per-chunk concept lists into one list in order of first appearance,
+    dropping concepts whose key (see concept_key) matches an earlier one.
+    """
+    merged, seen = [], set()
+    for concepts in concept_lists:
+        for concept in concepts:
+            key = concept_key(concept)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(concept)
+    return merged
+
+def extract_concepts_from_chunks(chunks, max_workers=CONCEPT_MAP_WORKERS):
+    """
+    Map step: extracts concepts from every chunk concurrently. Returns one list per
+    chunk, or the exception raised for a chunk whose extraction failed (also
+    recorded on its span), so callers can report backend errors.
+    """
+    def extract(chunk):
+        try:
+            return _extract_chunk_concepts(chunk)
+        except Exception as e:
+            return e
+
+    if len(chunks) == 1:
+        return [extract(chunks[0])]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(in_current_context(extract), chunk) for chunk in chunks]
+        return [future.result() for future in futures]
+
+@instrument()
+def extract_key_concepts(full_text):
+    """Uses Gemini to identify and list the key concepts from the text."""
+    client = get_client()
+    if not client.is_configured():
+        return ["Error: GEMINI_API_KEY not found."]
+    try:
+        if len(full_text) <= CONCEPT_CHUNK_CHARS:
+            return _extract_chunk_concepts(full_text)
+        chunks = chunk_text(full_text, CONCEPT_CHUNK_CHARS, CONCEPT_CHUNK_OVERLAP)
+        results = extract_concepts_from_chunks(chunks)
+        concept_lists = [concepts for concepts in results if not isinstance(concepts, Exception)]
+        if not concept_lists:
+            raise results[0]
+        return merge_concept_lists(concept_lists)
+    except Exception as e:
+        return [f"Error extracting concepts: {e}"]
+
+@instrument()
+def generate_detailed_explanation_with_diagrams(context_text, concept_title):
+    """
+    Generates a detailed explanation with Mermaid.js diagrams embedded directly in the text.
+    """
+    client = get_client()
+    if not client.is_configured():
+        return "Error: GEMINI_API_KEY not found."
+    try:
+        return generate_from_template(EXPLANATION_PROMPT, concept_title=concept_title, context=build_context(context_text, concept_title, EXPLANATION_CONTEXT_TOKENS))
+    except Exception as e:
+        return f"{EXPLANATION_ERROR}: {e}"
+
+@instrument()
+def stream_detailed_explanation_with_diagrams(context_text, concept_title):
+    """
+    Streaming version of generate_detailed_explanation_with_diagrams that yields
+    text chunks as Gemini produces them. Errors are yielded as a final chunk.
+    """
+    client = get_client()
+    if not client.is_configured():
+        yield "Error: GEMINI_API_KEY not found."
+        return
+    try:
+        yield from stream_from_template(EXPLANATION_PROMPT, concept_title=concept_title, context=build_context(context_text, concept_title, EXPLANATION_CONTEXT_TOKENS))
+    except Exception as e:
+        yield f"{EXPLANATION_ERROR}: {e}"
+
+@instrument()
+def generate_practical_scenario(concept_title, context_text):
+    """Uses Gemini to create a practical, real-world scenario question."""
+    client = get_client()
+    if not client.is_configured():
+        return "Error: GEMINI_API_KEY not found."
+    try:
+        # Not cached: students expect a fresh scenario each time they ask.
+        response_text = generate_from_template(SCENARIO_PROMPT, use_cache=False, concept_title=concept_title, context=build_context(context_text, concept_title, SCENARIO_CONTEXT_TOKENS))
+        return response_text.strip()
+    except Exception as e:
+        return f"Error generating scenario: {e}"
+
+@instrument()
+def evaluate_user_answer(scenario, user_answer, context_text, context_tokens=EVALUATION_CONTEXT_TOKENS, focus_terms=()):
+    """
+    Uses Gemini to evaluate the user's answer to the scenario and provide feedback.
+    focus_terms (e.g. key terms the answer missed) steer which context is retrieved.
+    """
+    client = get_client()
+    if not client.is_configured():
+        return "Error: GEMINI_API_KEY not found."
+    try:
+        context = build_context(context_text, " ".join([scenario, user_answer, *focus_terms]), context_tokens)
+        response_text = generate_from_template(EVALUATION_PROMPT, use_cache=False, scenario=scenario, user_answer=user_answer, context=context)
+        return response_text.strip()
     except Exception as e:
-        return f"Error evaluating answer: {e}"
\ No newline at end of file
+        return f"Error evaluating answer: {e}"
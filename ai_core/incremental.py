@@ -0,0 +1,203 @@
+import os
+import math
+import json
+import hashlib
+import difflib
+import threading
+from .utils import ensure_dir, write_atomic
+from .extractor import join_pages
+from .generator import extract_concepts_from_chunks, merge_concept_lists, concept_key, CONCEPT_CHUNK_CHARS
+from .instrumentation import instrument, annotate
+
+ANALYSIS_DIR = os.path.join("output", "cache", "analyses")
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _pack_pages(pages, start, stop, max_chars):
+    """
+    Splits pages[start:stop] into as few (start, stop) windows as max_chars
+    allows, evenly sized and cut at the page boundary nearest each split, so a
+    window can run over by at most half a page.
+    """
+    lengths = [len(pages[i]) + 1 for i in range(start, stop)]
+    count = max(1, math.ceil(sum(lengths) / max_chars))
+    target = sum(lengths) / count
+    windows, offset = [], 0
+    for i, length in zip(range(start, stop), lengths):
+        index = min(count - 1, int((offset + length / 2) // target))
+        if windows and windows[-1][0] == index:
+            windows[-1][2] = i + 1
+        else:
+            windows.append([index, i, i + 1])
+        offset += length
+    return [(first, last) for _, first, last in windows]
+
+def plan_windows(pages, page_hashes, previous_windows=(), max_chars=CONCEPT_CHUNK_CHARS):
+    """
+    Splits a chapter into prompt-sized windows of whole pages, returned as
+    (start, stop) page ranges. Windows of the previous version (lists of page
+    hashes) are kept wherever the same run of pages still appears, wherever it
+    moved to; only the pages between them are packed into new windows. So a
+    first analysis costs as many calls as map-reduce over the same text would, and inserting,
+    removing or editing a page only changes the window around it.
+    """
+    runs = {}
+    for run in previous_windows:
+        if run:
+            runs.setdefault(run[0], []).append(tuple(run))
+    for candidates in runs.values():
+        candidates.sort(key=len, reverse=True)
+
+    windows, gap_start, i = [], 0, 0
+    while i < len(pages):
+        run = next((r for r in runs.get(page_hashes[i], ()) if tuple(page_hashes[i:i + len(r)]) == r), None)
+        if run is None:
+            i += 1
+            continue
+        windows.extend(_pack_pages(pages, gap_start, i, max_chars))
+        windows.append((i, i + len(run)))
+        i = gap_start = i + len(run)
+    windows.extend(_pack_pages(pages, gap_start, len(pages), max_chars))
+    return windows
+
+def diff_pages(old_page_hashes, new_page_hashes):
+    """Returns the indices of pages in the new version that don't appear, in order, in the old one."""
+    unchanged = set()
+    matcher = difflib.SequenceMatcher(None, old_page_hashes, new_page_hashes, autojunk=False)
+    for block in matcher.get_matching_blocks():
+        unchanged.update(range(block.b, block.b + block.size))
+    return [i for i in range(len(new_page_hashes)) if i not in unchanged]
+
+def _source_windows(concepts, window_hashes, window_concepts):
+    """Maps each merged concept to the windows whose extracted concepts it came from."""
+    by_key = {concept_key(concept): concept for concept in concepts}
+    sources = {concept: [] for concept in concepts}
+    for window_hash in window_hashes:
+        for extracted in window_concepts.get(window_hash) or []:
+            concept = by_key.get(concept_key(extracted))
+            if concept is not None and window_hash not in sources[concept]:
+                sources[concept].append(window_hash)
+    return sources
+
+@instrument()
+def analyze_chapter(pages, previous=None):
+    """
+    Extracts the concept list for a chapter given its per-page text. Pages are
+    grouped into prompt-sized windows that are mapped in parallel (one call for a
+    short chapter). If the analysis of a previous version is given, its windows
+    are reused wherever their pages are unchanged and only the rest are sent to
+    the model. Returns (analysis, report); the report lists the changed pages and
+    the concepts whose lessons must be regenerated ("stale_concepts"), and the
+    errors of windows whose extraction failed ("errors"). If every window failed,
+    the first error is raised instead, so a bad key or exhausted quota reaches
+    the caller rather than looking like a chapter without concepts.
+    """
+    previous = previous or {}
+    page_hashes = [content_hash(page) for page in pages]
+    ranges = plan_windows(pages, page_hashes, previous.get("windows") or [])
+    windows = [join_pages(pages[start:stop]) for start, stop in ranges]
+    window_hashes = [content_hash(window) for window in windows]
+
+    window_concepts = {h: c for h, c in (previous.get("window_concepts") or {}).items() if h in window_hashes}
+    missing = [(h, text) for h, text in zip(window_hashes, windows) if h not in window_concepts and text]
+    # Identical windows (e.g. repeated blank pages) only need one call.
+    missing = list(dict(missing).items())
+    errors = []
+    if missing:
+        for (window_hash, _), concepts in zip(missing, extract_concepts_from_chunks([text for _, text in missing])):
+            if isinstance(concepts, Exception):
+                errors.append(concepts)
+            else:
+                window_concepts[window_hash] = concepts
+
+    concept_lists = [window_concepts[h] for h in window_hashes if h in window_concepts]
+    if errors and not concept_lists:
+        raise errors[0]
+    concepts = concept_lists[0] if len(concept_lists) == 1 else merge_concept_lists(concept_lists)
+    concept_windows = _source_windows(concepts, window_hashes, window_concepts)
+
+    old_windows = set(previous.get("window_hashes") or [])
+    old_concepts = set(previous.get("concepts") or [])
+    stale = [
+        concept for concept in concepts
+        if concept not in old_concepts or any(h not in old_windows for h in concept_windows[concept])
+    ]
+    analysis = {
+        "page_hashes": page_hashes,
+        "windows": [page_hashes[start:stop] for start, stop in ranges],
+        "window_hashes": window_hashes,
+        "window_concepts": window_concepts,
+        "concepts": concepts,
+        "concept_windows": concept_windows,
+    }
+    report = {
+        "changed_pages": diff_pages(previous.get("page_hashes") or [], page_hashes),
+        "extracted_windows": len(missing),
+        "reused_windows": len(window_hashes) - len(missing),
+        "stale_concepts": stale,
+        "errors": [f"{type(e).__name__}: {e}" for e in errors],
+    }
+    annotate(**{k: v for k, v in report.items() if k not in ("stale_concepts", "errors")},
+             stale_concepts=len(stale), failed_windows=len(errors))
+    return analysis, report
+
+class AnalysisStore:
+    """
+    Keeps the analysis of each document on disk, keyed by the SHA-256 of its PDF
+    bytes, so the same chapter is never analyzed twice and a revised upload can
+    be diffed against the version it replaces.
+    """
+
+    def __init__(self, analysis_dir=ANALYSIS_DIR):
+        self.analysis_dir = analysis_dir
+        self._lock = threading.Lock()
+        ensure_dir(analysis_dir)
+
+    def _path(self, doc_id):
+        if not doc_id.isalnum():
+            raise ValueError(f"not a document hash: {doc_id!r}")
+        return os.path.join(self.analysis_dir, f"{doc_id}.json")
+
+    def load(self, doc_id):
+        """Returns the saved analysis of a document, or None."""
+        try:
+            with open(self._path(doc_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, doc_id, name, analysis):
+        """Saves a document's analysis, tagged with its hash and the file name it was uploaded as."""
+        with self._lock:
+            write_atomic(self._path(doc_id), json.dumps({**analysis, "doc_id": doc_id, "name": name}))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_analysis_store():
+    """Returns the process-wide analysis store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AnalysisStore()
+        return _store
+
+def analyze_document(doc_id, name, pages, previous=None):
+    """
+    Returns (analysis, report) for a document. One analyzed before is served
+    from the analysis store without any model calls; otherwise it is analyzed,
+    diffed against `previous` (the analysis of the version it revises, if any),
+    and saved if concepts were found in every window; a partial analysis is not
+    saved, so the failed windows are retried on the next upload.
+    """
+    analyses = get_analysis_store()
+    saved = analyses.load(doc_id)
+    if saved is not None:
+        report = {"changed_pages": [], "extracted_windows": 0,
+                  "reused_windows": len(saved["window_hashes"]), "stale_concepts": [], "errors": []}
+        return saved, report
+    analysis, report = analyze_chapter(pages, previous)
+    if analysis["concepts"] and not report["errors"]:
+        analyses.save(doc_id, name, analysis)
+    return analysis, report
@@ -0,0 +1,312 @@
+"""
+Lightweight tracing for the ai_core pipeline.
+
+Entry points are wrapped with @instrument; while tracing is disabled the wrapper
+is a single flag check. When enabled, every call records a span (wall time,
+parent span, and attributes such as prompt/response sizes, token counts, cache
+hits and retries) and hands it to the configured sinks.
+
+Tracing is switched on with LEARNVERSE_TRACE, a comma-separated list of sinks:
+"ring" (in-memory buffer, shown in the app's debug panel), "jsonl" (appends to
+LEARNVERSE_TRACE_FILE) and "prometheus" (text endpoint on LEARNVERSE_METRICS_PORT,
+bound to LEARNVERSE_METRICS_HOST, loopback by default).
+"""
+import os
+import json
+import time
+import inspect
+import itertools
+import threading
+import functools
+import contextvars
+from collections import deque, defaultdict
+from .settings import get_settings
+
+TRACE_FILE = get_settings().trace_file
+METRICS_HOST = get_settings().metrics_host
+METRICS_PORT = get_settings().metrics_port
+RING_CAPACITY = 1000
+
+_enabled = False
+_sinks = []
+_span_ids = itertools.count(1)
+_current_span = contextvars.ContextVar("learnverse_current_span", default=None)
+
+class Span:
+    """One timed operation. Attributes are free-form; counters are summed with incr()."""
+
+    __slots__ = ("span_id", "name", "parent_id", "start", "duration", "attrs")
+
+    def __init__(self, name, parent_id, attrs):
+        self.span_id = next(_span_ids)
+        self.name = name
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attrs = dict(attrs)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, name, amount=1):
+        self.attrs[name] = self.attrs.get(name, 0) + amount
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_s": self.duration,
+            **self.attrs,
+        }
+
+class _SpanContext:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.span = Span(self.name, parent.span_id if parent else None, self.attrs)
+        self._perf_start = time.perf_counter()
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration = time.perf_counter() - self._perf_start
+        if exc is not None:
+            self.span.set(error=f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        _emit(self.span)
+        return False
+
+class _NullSpanContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN_CONTEXT = _NullSpanContext()
+
+def _emit(span):
+    for sink in _sinks:
+        try:
+            sink.emit(span)
+        except Exception as e:
+            print(f"Trace sink {type(sink).__name__} failed: {e}")
+
+def is_enabled():
+    return _enabled
+
+def enable(*sinks):
+    """Turns tracing on and adds the given sinks."""
+    global _enabled
+    _sinks.extend(sinks)
+    _enabled = True
+
+def disable():
+    """Turns tracing off and removes all sinks."""
+    global _enabled
+    _enabled = False
+    _sinks.clear()
+
+def get_sink(sink_type):
+    """Returns the first configured sink of a type, or None."""
+    for sink in _sinks:
+        if isinstance(sink, sink_type):
+            return sink
+    return None
+
+def span(name, **attrs):
+    """Context manager that records a span. Yields the Span, or None while tracing is disabled."""
+    if not _enabled:
+        return _NULL_SPAN_CONTEXT
+    return _SpanContext(name, attrs)
+
+def annotate(**attrs):
+    """Sets attributes on the innermost active span, if any."""
+    if _enabled:
+        current = _current_span.get()
+        if current is not None:
+            current.set(**attrs)
+
+def count(name, amount=1):
+    """Increments a counter on the innermost active span, if any."""
+    if _enabled:
+        current = _current_span.get()
+        if current is not None:
+            current.incr(name, amount)
+
+def in_current_context(fn):
+    """
+    Binds fn to a copy of the caller's context, so spans it records inside a
+    worker thread are attached to the caller's current span.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+def instrument(name=None):
+    """Decorator that records a span for every call of the wrapped function."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                if not _enabled:
+                    yield from fn(*args, **kwargs)
+                    return
+                # The span is only current while the wrapped generator runs, not
+                # while the consumer handles a chunk between yields.
+                parent = _current_span.get()
+                record = Span(span_name, parent.span_id if parent else None, {})
+                perf_start, chunks, chars = time.perf_counter(), 0, 0
+                iterator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_span.set(record)
+                        try:
+                            chunk = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current_span.reset(token)
+                        if chunks == 0:
+                            record.set(first_chunk_s=time.perf_counter() - perf_start)
+                        chunks += 1
+                        chars += len(chunk) if isinstance(chunk, str) else 0
+                        yield chunk
+                except Exception as e:
+                    record.set(error=f"{type(e).__name__}: {e}")
+                    raise
+                finally:
+                    iterator.close()
+                    record.duration = time.perf_counter() - perf_start
+                    record.set(chunks=chunks, response_chars=chars)
+                    _emit(record)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _SpanContext(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class RingBufferSink:
+    """Keeps the most recent spans in memory."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self._spans = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, span):
+        with self._lock:
+            self._spans.append(span.to_dict())
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+class JsonLinesSink:
+    """Appends each span as one JSON object per line."""
+
+    def __init__(self, path=TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def emit(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class PrometheusSink:
+    """Aggregates spans per name and renders them in the Prometheus text format."""
+
+    COUNTERS = ("cache_hits", "cache_misses", "llm_retries", "prompt_tokens", "response_tokens")
+
+    def __init__(self):
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._seconds = defaultdict(float)
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def emit(self, span):
+        with self._lock:
+            self._calls[span.name] += 1
+            self._seconds[span.name] += span.duration or 0.0
+            if "error" in span.attrs:
+                self._errors[span.name] += 1
+            for counter in self.COUNTERS:
+                value = span.attrs.get(counter)
+                if isinstance(value, (int, float)):
+                    self._counters[(counter, span.name)] += value
+
+    def render(self):
+        lines = [
+            "# TYPE learnverse_span_calls_total counter",
+            "# TYPE learnverse_span_errors_total counter",
+            "# TYPE learnverse_span_seconds_total counter",
+        ]
+        with self._lock:
+            for name in sorted(self._calls):
+                lines.append(f'learnverse_span_calls_total{{span="{name}"}} {self._calls[name]}')
+                lines.append(f'learnverse_span_errors_total{{span="{name}"}} {self._errors[name]}')
+                lines.append(f'learnverse_span_seconds_total{{span="{name}"}} {self._seconds[name]:.6f}')
+            for (counter, name), value in sorted(self._counters.items()):
+                lines.append(f'learnverse_{counter}_total{{span="{name}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Serves /metrics on a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        sink = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return self._server
+
+def configure_from_env():
+    """Enables the sinks listed in LEARNVERSE_TRACE. Called once on import."""
+    sinks = []
+    for name in get_settings().trace_sinks:
+        if name == "ring":
+            sinks.append(RingBufferSink())
+        elif name == "jsonl":
+            sinks.append(JsonLinesSink())
+        elif name == "prometheus":
+            sink = PrometheusSink()
+            try:
+                sink.serve()
+            except OSError as e:
+                print(f"Could not start metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}")
+            sinks.append(sink)
+        else:
+            print(f"Unknown trace sink '{name}' in LEARNVERSE_TRACE.")
+    if sinks:
+        enable(*sinks)
+
+configure_from_env()
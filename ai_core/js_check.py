@@ -0,0 +1,188 @@
+from .settings import get_settings
+
+# Generated simulations are a single inline script; anything far larger is a runaway generation.
+MAX_SCRIPT_BYTES = get_settings().simulation_max_script_bytes
+
+# Globals a canvas simulation has no business touching: network access, storage,
+# dynamic code evaluation and background workers.
+BANNED_IDENTIFIERS = {
+    "eval", "Function", "fetch", "XMLHttpRequest", "WebSocket", "EventSource",
+    "importScripts", "Worker", "SharedWorker", "ServiceWorker", "localStorage",
+    "sessionStorage", "indexedDB", "import",
+}
+# Names of the global object; a banned API read off one of them is still banned.
+GLOBAL_OBJECTS = {"window", "globalThis", "self", "top", "parent", "frames"}
+# Also the global object in a simulation's top-level code ("this") or reached from
+# the document ("document.defaultView").
+GLOBAL_OWNERS = GLOBAL_OBJECTS | {"this", "defaultView"}
+# Global object names a script never shadows, so any other use of them as a
+# value (const w = window, Reflect.get(window, ...)) is an alias of the global.
+UNSHADOWED_GLOBALS = {"window", "globalThis"}
+BANNED_MEMBERS = {
+    ("document", "cookie"), ("document", "write"), ("document", "writeln"),
+    ("window", "open"), ("navigator", "sendBeacon"), ("navigator", "serviceWorker"),
+}
+
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+# Tokens after which a "/" starts a regular expression rather than a division.
+_REGEX_AFTER_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield", "await"}
+
+def _is_identifier_start(char):
+    return char.isalpha() or char in "_$"
+
+def _is_identifier_char(char):
+    return char.isalnum() or char in "_$"
+
+def tokenize_javascript(code):
+    """
+    Splits JavaScript into significant tokens, skipping comments and the contents
+    of string, template and regex literals. Returns (tokens, problems), where
+    problems lists unterminated literals and unbalanced brackets.
+    """
+    tokens, problems, brackets = [], [], []
+    # Each "${" inside a template literal pushes a marker, so its closing "}"
+    # resumes scanning the template instead of closing a code block.
+    i, length = 0, len(code)
+
+    def scan_template(i):
+        """Scans template text from i; returns the index after the closing backtick or "${"."""
+        while i < length:
+            char = code[i]
+            if char == "\\":
+                i += 2
+            elif char == "`":
+                return i + 1
+            elif char == "$" and code.startswith("${", i):
+                brackets.append("${")
+                return i + 2
+            else:
+                i += 1
+        problems.append("unterminated template literal")
+        return length
+
+    while i < length:
+        char = code[i]
+        if char.isspace():
+            i += 1
+        elif code.startswith("//", i):
+            end = code.find("\n", i)
+            i = length if end == -1 else end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            if end == -1:
+                problems.append("unterminated block comment")
+                break
+            i = end + 2
+        elif char in "'\"":
+            i += 1
+            while i < length and code[i] != char and code[i] != "\n":
+                i += 2 if code[i] == "\\" else 1
+            if i >= length or code[i] != char:
+                problems.append("unterminated string literal")
+                break
+            i += 1
+            tokens.append(char)
+        elif char == "`":
+            i = scan_template(i + 1)
+            tokens.append("`")
+        elif char == "/":
+            previous = tokens[-1] if tokens else None
+            is_regex = previous is None or previous in _REGEX_AFTER_KEYWORDS or not (
+                _is_identifier_char(previous[-1]) or previous in (")", "]", "}", "'", '"', "`")
+            )
+            if not is_regex:
+                tokens.append("/")
+                i += 1
+                continue
+            i += 1
+            in_class = False
+            while i < length and code[i] != "\n":
+                if code[i] == "\\":
+                    i += 2
+                    continue
+                if code[i] == "[":
+                    in_class = True
+                elif code[i] == "]":
+                    in_class = False
+                elif code[i] == "/" and not in_class:
+                    break
+                i += 1
+            if i >= length or code[i] != "/":
+                problems.append("unterminated regular expression")
+                break
+            i += 1
+            while i < length and _is_identifier_char(code[i]):
+                i += 1
+            tokens.append("/")
+        elif _is_identifier_start(char):
+            start = i
+            while i < length and _is_identifier_char(code[i]):
+                i += 1
+            tokens.append(code[start:i])
+        elif char.isdigit():
+            while i < length and (_is_identifier_char(code[i]) or code[i] == "."):
+                i += 1
+            tokens.append("0")
+        elif char in "([{":
+            brackets.append(char)
+            tokens.append(char)
+            i += 1
+        elif char in _CLOSERS:
+            if brackets and brackets[-1] == "${" and char == "}":
+                brackets.pop()
+                i = scan_template(i + 1)
+                tokens.append("`")
+                continue
+            if not brackets or brackets[-1] != _CLOSERS[char]:
+                problems.append(f"unbalanced '{char}'")
+                break
+            brackets.pop()
+            tokens.append(char)
+            i += 1
+        else:
+            tokens.append(char)
+            i += 1
+
+    if not problems and brackets:
+        problems.append(f"unclosed '{brackets[-1]}'")
+    return tokens, problems
+
+def check_javascript(code, max_bytes=MAX_SCRIPT_BYTES):
+    """
+    Runs a fast offline sanity check of generated JavaScript before it is cached.
+    Returns a list of problems; an empty list means the script passed.
+
+    This is best-effort: it rejects the common ways a script reaches banned APIs,
+    but code that builds names at run time (e.g. a string passed to a
+    constructor's constructor) can't be recognized statically. The page's
+    Content-Security-Policy (see simulation_store) is what enforces the rules.
+    """
+    if not code.strip():
+        return ["script is empty"]
+    size = len(code.encode("utf-8"))
+    if size > max_bytes:
+        return [f"script is {size} bytes (limit {max_bytes})"]
+    problems = []
+    # The script is inlined into the page, so it must not be able to close its own tag.
+    if "</script" in code.lower():
+        problems.append("script contains a closing </script> tag")
+
+    tokens, syntax_problems = tokenize_javascript(code)
+    problems.extend(syntax_problems)
+    for i, token in enumerate(tokens):
+        is_member = i > 0 and tokens[i - 1] == "."
+        following = tokens[i + 1] if i < len(tokens) - 1 else None
+        if token in BANNED_IDENTIFIERS and (not is_member or (i > 1 and tokens[i - 2] in GLOBAL_OWNERS)):
+            problems.append(f"uses banned API '{token}'")
+        elif token in GLOBAL_OBJECTS and not is_member and following == "[":
+            # window["fe" + "tch"] can't be checked statically.
+            problems.append(f"uses computed member access on '{token}'")
+        elif token in UNSHADOWED_GLOBALS and not is_member and following not in (".", "[") \
+                and (i == 0 or tokens[i - 1] != "typeof"):
+            problems.append(f"uses the global object '{token}' as a value")
+        elif token == "." and 0 < i < len(tokens) - 1:
+            owner = "window" if tokens[i - 1] in GLOBAL_OBJECTS else tokens[i - 1]
+            if (owner, tokens[i + 1]) in BANNED_MEMBERS:
+                problems.append(f"uses banned API '{owner}.{tokens[i + 1]}'")
+    # Report each banned API once, keeping first-seen order.
+    return list(dict.fromkeys(problems))
@@ -0,0 +1,300 @@
+"""
+Persistent library of analyzed chapters.
+
+Documents, their retrieval chunks and their concepts live in one SQLite file,
+with FTS5 full-text tables when the SQLite build supports them, so students
+can search and open any chapter without re-uploading or re-analyzing it.
+
+    python -m ai_core.library ingest path/to/chapters
+    python -m ai_core.library search "refraction"
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .utils import ensure_dir
+from .settings import get_settings
+from .pdf_cache import hash_pdf_bytes
+from .extractor import extract_pages_from_pdf, join_pages
+from .incremental import analyze_document
+from .llm_client import get_client
+from .retrieval import chunk_text
+from .instrumentation import instrument, annotate, in_current_context
+
+LIBRARY_PATH = os.path.join("output", "library", "library.sqlite3")
+# PDFs parsed in parallel (CPU-bound) and chapters whose concepts are extracted in parallel (I/O-bound).
+INGEST_WORKERS = get_settings().library_ingest_workers
+CONCEPT_WORKERS = get_settings().library_concept_workers
+LIBRARY_CHUNK_CHARS = 1500
+LIBRARY_CHUNK_OVERLAP = 200
+
+_TERM_RE = re.compile(r"\w+")
+
+def _fts_query(query):
+    """Turns free text into an FTS5 query: every term must match, the last one as a prefix."""
+    terms = _TERM_RE.findall(query.lower())
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+def _snippet(text, query, width=160):
+    """Returns a window of text around the first query term, for the LIKE fallback."""
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in _TERM_RE.findall(query.lower())]
+    positions = [p for p in positions if p != -1]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    return ("…" if start else "") + text[start:start + width] + ("…" if start + width < len(text) else "")
+
+class LibraryIndex:
+    """
+    SQLite index of documents (keyed by the SHA-256 of the PDF bytes), their
+    chunks and their concept lists. Documents only enter it when published on
+    purpose (an explicit "add to library" or a bulk ingest); different PDFs
+    with the same file name are separate documents.
+    """
+
+    def __init__(self, path=LIBRARY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            ensure_dir(os.path.dirname(path) or ".")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id TEXT PRIMARY KEY, name TEXT NOT NULL, text TEXT NOT NULL, added REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS documents_name ON documents (name)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "doc_id TEXT NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL, PRIMARY KEY (doc_id, position))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS concepts ("
+                "doc_id TEXT NOT NULL, position INTEGER NOT NULL, title TEXT NOT NULL, PRIMARY KEY (doc_id, position))"
+            )
+        try:
+            with self._conn:
+                self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, doc_id UNINDEXED)")
+                self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS concepts_fts USING fts5(title, doc_id UNINDEXED)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE scans.
+            self.fts = False
+
+    def has_document(self, doc_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE id = ?", (doc_id,)).fetchone() is not None
+
+    def add_document(self, doc_id, name, text, concepts):
+        """Indexes a document's chunks and concepts, replacing an earlier entry for the same PDF bytes."""
+        chunks = chunk_text(text, LIBRARY_CHUNK_CHARS, LIBRARY_CHUNK_OVERLAP)
+        with self._lock, self._conn:
+            self._delete(doc_id)
+            self._conn.execute(
+                "INSERT INTO documents (id, name, text, added) VALUES (?, ?, ?, ?)", (doc_id, name, text, time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (doc_id, position, text) VALUES (?, ?, ?)",
+                [(doc_id, i, chunk) for i, chunk in enumerate(chunks)],
+            )
+            self._conn.executemany(
+                "INSERT INTO concepts (doc_id, position, title) VALUES (?, ?, ?)",
+                [(doc_id, i, title) for i, title in enumerate(concepts)],
+            )
+            if self.fts:
+                self._conn.executemany("INSERT INTO chunks_fts (text, doc_id) VALUES (?, ?)", [(c, doc_id) for c in chunks])
+                self._conn.executemany("INSERT INTO concepts_fts (title, doc_id) VALUES (?, ?)", [(t, doc_id) for t in concepts])
+
+    def _delete(self, doc_id):
+        # Callers hold the lock and the transaction.
+        for table in ("documents", "chunks", "concepts"):
+            column = "id" if table == "documents" else "doc_id"
+            self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (doc_id,))
+        if self.fts:
+            self._conn.execute("DELETE FROM chunks_fts WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM concepts_fts WHERE doc_id = ?", (doc_id,))
+
+    def remove_document(self, doc_id):
+        with self._lock, self._conn:
+            self._delete(doc_id)
+
+    def documents(self):
+        """Returns [{"doc_id", "name", "concept_count"}] for every document, by name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id, d.name, COUNT(c.title) FROM documents d LEFT JOIN concepts c ON c.doc_id = d.id "
+                "GROUP BY d.id ORDER BY d.name"
+            ).fetchall()
+        return [{"doc_id": doc_id, "name": name, "concept_count": count} for doc_id, name, count in rows]
+
+    def document(self, doc_id):
+        """Returns {"sha256", "name", "text", "concepts"} for a document, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT name, text FROM documents WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return None
+            concepts = [r[0] for r in self._conn.execute(
+                "SELECT title FROM concepts WHERE doc_id = ? ORDER BY position", (doc_id,))]
+        return {"sha256": doc_id, "name": row[0], "text": row[1], "concepts": concepts}
+
+    def search_concepts(self, query, limit=20):
+        """Returns [{"doc_id", "document", "concept"}] for concepts matching the query, best first."""
+        with self._lock:
+            if self.fts:
+                match = _fts_query(query)
+                if match is None:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT f.doc_id, d.name, f.title FROM concepts_fts f JOIN documents d ON d.id = f.doc_id "
+                    "WHERE concepts_fts MATCH ? ORDER BY bm25(concepts_fts) LIMIT ?", (match, limit)
+                ).fetchall()
+            else:
+                terms = _TERM_RE.findall(query.lower())
+                if not terms:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT c.doc_id, d.name, c.title FROM concepts c JOIN documents d ON d.id = c.doc_id WHERE "
+                    + " AND ".join("lower(c.title) LIKE ?" for _ in terms) + " ORDER BY d.name, c.position LIMIT ?",
+                    [f"%{term}%" for term in terms] + [limit],
+                ).fetchall()
+        return [{"doc_id": doc_id, "document": name, "concept": title} for doc_id, name, title in rows]
+
+    def search_passages(self, query, limit=10):
+        """Returns [{"doc_id", "document", "snippet"}] for chunks matching the query, best first."""
+        with self._lock:
+            if self.fts:
+                match = _fts_query(query)
+                if match is None:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT f.doc_id, d.name, snippet(chunks_fts, 0, '**', '**', '…', 24) FROM chunks_fts f "
+                    "JOIN documents d ON d.id = f.doc_id WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+            else:
+                terms = _TERM_RE.findall(query.lower())
+                if not terms:
+                    return []
+                rows = self._conn.execute(
+                    "SELECT c.doc_id, d.name, c.text FROM chunks c JOIN documents d ON d.id = c.doc_id WHERE "
+                    + " AND ".join("lower(c.text) LIKE ?" for _ in terms) + " LIMIT ?",
+                    [f"%{term}%" for term in terms] + [limit],
+                ).fetchall()
+                rows = [(doc_id, name, _snippet(text, query)) for doc_id, name, text in rows]
+        return [{"doc_id": doc_id, "document": name, "snippet": snippet} for doc_id, name, snippet in rows]
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hash_pdf_bytes(f.read())
+
+def _extract_document(path):
+    """Extracts one PDF's page texts. Runs inside a worker process, so the shared page pool isn't used."""
+    return extract_pages_from_pdf(path, parallel=False)
+
+@instrument("library.ingest_directory")
+def ingest_directory(directory, index=None, workers=INGEST_WORKERS, concept_workers=CONCEPT_WORKERS):
+    """
+    Adds every PDF in a directory to the library. PDFs already indexed (same
+    bytes) are skipped; the rest are parsed in a process pool and their concepts
+    extracted in a thread pool as each text becomes available.
+    Returns {"added": [...], "skipped": [...], "failed": [...]} lists of file names.
+    """
+    index = index or get_library()
+    report = {"added": [], "skipped": [], "failed": []}
+    pending = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith(".pdf") or not os.path.isfile(path):
+            continue
+        doc_id = _hash_file(path)
+        if index.has_document(doc_id):
+            report["skipped"].append(name)
+        else:
+            pending.append((name, path, doc_id))
+
+    if pending and not get_client().is_configured():
+        print("Error: GEMINI_API_KEY not found; concepts can't be extracted.")
+        report["failed"].extend(name for name, _, _ in pending)
+        pending = []
+
+    def analyze(name, doc_id, pages):
+        # The same analysis the app runs on upload, so both agree on a chapter's concepts.
+        try:
+            concepts = analyze_document(doc_id, name, pages)[0]["concepts"]
+        except Exception:
+            # Recorded on the extraction spans; the file is reported as failed.
+            return name, False
+        if concepts:
+            index.add_document(doc_id, name, join_pages(pages), concepts)
+        return name, bool(concepts)
+
+    if pending:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as processes, \
+                ThreadPoolExecutor(max_workers=concept_workers) as threads:
+            extractions = {processes.submit(_extract_document, path): (name, doc_id) for name, path, doc_id in pending}
+            analyses = []
+            for future in as_completed(extractions):
+                name, doc_id = extractions[future]
+                try:
+                    pages = future.result()
+                except Exception:
+                    pages = None
+                if not pages or not join_pages(pages):
+                    report["failed"].append(name)
+                    continue
+                analyses.append(threads.submit(in_current_context(analyze), name, doc_id, pages))
+            for future in as_completed(analyses):
+                name, added = future.result()
+                report["added" if added else "failed"].append(name)
+
+    for names in report.values():
+        names.sort()
+    annotate(**{key: len(names) for key, names in report.items()})
+    return report
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_library():
+    """Returns the process-wide library index."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = LibraryIndex()
+        return _library
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Build and search the LearnVerse chapter library.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="add every PDF in a directory")
+    ingest.add_argument("directory")
+    ingest.add_argument("--workers", type=int, default=INGEST_WORKERS, help="PDFs parsed in parallel")
+    search = commands.add_parser("search", help="search concepts and passages")
+    search.add_argument("query")
+    commands.add_parser("list", help="list indexed documents")
+    args = parser.parse_args(argv)
+
+    library = get_library()
+    if args.command == "ingest":
+        report = ingest_directory(args.directory, library, workers=args.workers)
+        for key, names in report.items():
+            print(f"{key}: {len(names)}" + (f" ({', '.join(names)})" if names else ""))
+        return 1 if report["failed"] else 0
+    if args.command == "search":
+        for hit in library.search_concepts(args.query):
+            print(f"[concept] {hit['concept']}  —  {hit['document']}")
+        for hit in library.search_passages(args.query):
+            print(f"[passage] {hit['document']}: {hit['snippet']}")
+        return 0
+    for doc in library.documents():
+        print(f"{doc['name']}  ({doc['concept_count']} concepts)  {doc['doc_id'][:12]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
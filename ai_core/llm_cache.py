@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from .utils import ensure_dir
+from .llm_client import get_client
+from .single_flight import SingleFlight
+from .settings import get_settings
+from .instrumentation import count
+
+CACHE_PATH = os.path.join("output", "cache", "llm_responses.sqlite3")
+CACHE_TTL_SECONDS = get_settings().llm_cache_ttl
+CACHE_MAX_ENTRIES = get_settings().llm_cache_max_entries
+
+def normalize_template(template):
+    """Collapses whitespace so re-indenting a prompt template doesn't change its cache key."""
+    return " ".join(template.split())
+
+def make_cache_key(template, model, **fields):
+    """Hashes a prompt template, model name and the (already truncated) prompt fields."""
+    payload = json.dumps([normalize_template(template), model, sorted(fields.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed store of model responses. Entries expire after ttl seconds and the
+    least recently used ones are dropped once there are more than max_entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            ensure_dir(os.path.dirname(path) or ".")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def get(self, key):
+        """Returns the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """Stores a response and evicts expired or least recently used entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def add(self, key, value):
+        """Stores a response unless the key is already cached (keeps the original TTL)."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+
+    def delete(self, key):
+        """Removes a single entry, e.g. when a cached response turned out to be unusable."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def stats(self):
+        """Returns hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Returns the process-wide response cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+def set_response_cache(cache):
+    """Replaces the process-wide response cache (e.g. with an in-memory one for benchmarks)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+# Identical prompts that miss the cache at the same time share one model call.
+_flights = SingleFlight()
+
+def _model_id(client):
+    # The backend name keeps stub responses from ever being served for real calls.
+    return f"{client.backend.name}:{client.model}"
+
+def _generate_and_cache(client, cache, key, prompt):
+    # Re-check: an identical call may have finished between our miss and taking the lead.
+    response_text = cache.get(key)
+    if response_text is None:
+        response_text = client.generate(prompt)
+        cache.set(key, response_text)
+    return response_text
+
+def generate_from_template(template, use_cache=True, **fields):
+    """
+    Fills a prompt template and returns the model's response, served from the
+    response cache when the same template, model and fields were seen before.
+    Concurrent identical misses wait for a single model call.
+    """
+    client = get_client()
+    prompt = template.format(**fields)
+    if not use_cache:
+        return client.generate(prompt)
+
+    cache = get_response_cache()
+    key = make_cache_key(template, _model_id(client), **fields)
+    cached = cache.get(key)
+    if cached is not None:
+        count("cache_hits")
+        return cached
+    count("cache_misses")
+
+    # Waiters give up only once the leader's call could no longer be running.
+    return _flights.do(key, _generate_and_cache, client, cache, key, prompt, timeout=client.max_call_seconds())
+
+async def generate_from_template_async(template, use_cache=True, **fields):
+    """
+    Awaitable version of generate_from_template. The model call runs on a worker
+    thread and is shared with any thread or asyncio caller making the same call.
+    """
+    client = get_client()
+    prompt = template.format(**fields)
+    if not use_cache:
+        import asyncio
+        return await asyncio.to_thread(client.generate, prompt)
+
+    cache = get_response_cache()
+    key = make_cache_key(template, _model_id(client), **fields)
+    cached = cache.get(key)
+    if cached is not None:
+        count("cache_hits")
+        return cached
+    count("cache_misses")
+
+    return await _flights.do_async(key, _generate_and_cache, client, cache, key, prompt,
+                                   timeout=client.max_call_seconds())
+
+def stream_from_template(template, use_cache=True, **fields):
+    """
+    Like generate_from_template, but yields the response in chunks as it arrives.
+    A cached response is yielded in one piece; a fresh one is cached once complete.
+    Concurrent identical streams share one model stream.
+    """
+    client = get_client()
+    if not use_cache:
+        yield from client.stream(template.format(**fields))
+        return
+
+    cache = get_response_cache()
+    key = make_cache_key(template, _model_id(client), **fields)
+    cached = cache.get(key)
+    if cached is not None:
+        count("cache_hits")
+        yield cached
+        return
+    count("cache_misses")
+    yield from _flights.stream(
+        key,
+        lambda: client.stream(template.format(**fields)),
+        on_complete=lambda chunks: cache.set(key, "".join(chunks)),
+        timeout=client.max_call_seconds(),
+    )
+
+def remember_template_response(template, response_text, **fields):
+    """Caches a response obtained outside generate/stream_from_template (e.g. a stream cut short)."""
+    key = make_cache_key(template, _model_id(get_client()), **fields)
+    get_response_cache().add(key, response_text)
+
+def forget_template_response(template, **fields):
+    """Drops the cached response for a template and fields (e.g. after it failed to parse)."""
+    key = make_cache_key(template, _model_id(get_client()), **fields)
+    get_response_cache().delete(key)
@@ -0,0 +1,191 @@
+import time
+import random
+import threading
+from .settings import get_settings
+from .instrumentation import instrument, span, annotate, count
+
+_settings = get_settings()
+GEMINI_KEY = _settings.gemini_api_key
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+MAX_CONCURRENCY = _settings.llm_max_concurrency
+REQUEST_TIMEOUT = _settings.llm_timeout
+MAX_RETRIES = _settings.llm_max_retries
+BACKOFF_BASE = _settings.llm_backoff_base
+BACKOFF_MAX = _settings.llm_backoff_max
+
+class RateLimitError(Exception):
+    """Raised by backends (or stubs) when the provider rejects a call for quota reasons."""
+
+class GeminiBackend:
+    """Talks to Gemini. The SDK is configured once and model objects are reused."""
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._genai = None
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def _model(self, model_name):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            return model
+
+    def generate(self, prompt, model_name, timeout):
+        response = self._model(model_name).generate_content(prompt, request_options={"timeout": timeout})
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            annotate(prompt_tokens=usage.prompt_token_count, response_tokens=usage.candidates_token_count)
+        return response.text
+
+    def stream(self, prompt, model_name, timeout):
+        response = self._model(model_name).generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def is_rate_limit_error(self, exc):
+        if isinstance(exc, RateLimitError):
+            return True
+        try:
+            from google.api_core import exceptions as google_exceptions
+            if isinstance(exc, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests, google_exceptions.ServiceUnavailable)):
+                return True
+        except ImportError:
+            pass
+        message = str(exc).lower()
+        return "429" in message or "quota" in message or "rate limit" in message
+
+class StubBackend:
+    """
+    Offline backend for tests and local runs. `responder` is either a fixed string
+    or a callable taking the prompt and returning the response text.
+    """
+
+    name = "stub"
+
+    def __init__(self, responder="", latency=0.0, chunk_size=40):
+        self.responder = responder
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def is_configured(self):
+        return True
+
+    def generate(self, prompt, model_name, timeout):
+        with self._lock:
+            self.calls.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.responder):
+            return self.responder(prompt)
+        return self.responder
+
+    def stream(self, prompt, model_name, timeout):
+        text = self.generate(prompt, model_name, timeout)
+        for start in range(0, len(text), self.chunk_size):
+            yield text[start:start + self.chunk_size]
+
+    def is_rate_limit_error(self, exc):
+        return isinstance(exc, RateLimitError)
+
+class LLMClient:
+    """
+    Thread-safe front door for every model call in ai_core. Caps the number of
+    concurrent requests and retries rate-limited calls with full-jitter backoff.
+    """
+
+    def __init__(self, backend, model=DEFAULT_MODEL, max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.backend = backend
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def is_configured(self):
+        return self.backend.is_configured()
+
+    def max_call_seconds(self):
+        """Returns how long one generate() can take at worst: every attempt timing out, plus the longest backoffs."""
+        return (self.max_retries + 1) * self.timeout + self.max_retries * self.backoff_max
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def generate(self, prompt, model=None):
+        """Returns the response text for a prompt, retrying on rate-limit errors."""
+        with span("llm.generate", model=model or self.model, prompt_chars=len(prompt), prompt_tokens=len(prompt) // 4) as record:
+            attempt = 0
+            while True:
+                with self._slots:
+                    try:
+                        response_text = self.backend.generate(prompt, model or self.model, self.timeout)
+                        break
+                    except Exception as e:
+                        if attempt >= self.max_retries or not self.backend.is_rate_limit_error(e):
+                            raise
+                # Sleep outside the semaphore so waiting retries don't block other callers.
+                time.sleep(self._backoff_delay(attempt))
+                attempt += 1
+                count("llm_retries")
+            if record is not None:
+                # Token counts are estimated unless the backend reported exact usage.
+                record.set(response_chars=len(response_text))
+                record.attrs.setdefault("response_tokens", len(response_text) // 4)
+            return response_text
+
+    @instrument("llm.stream")
+    def stream(self, prompt, model=None):
+        """
+        Yields response text chunks as the model produces them. Rate-limit errors are
+        only retried if they happen before the first chunk has been yielded.
+        """
+        attempt = 0
+        while True:
+            with self._slots:
+                started = False
+                try:
+                    for chunk in self.backend.stream(prompt, model or self.model, self.timeout):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or attempt >= self.max_retries or not self.backend.is_rate_limit_error(e):
+                        raise
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+            count("llm_retries")
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide LLM client, creating a Gemini-backed one on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(GeminiBackend(GEMINI_KEY))
+        return _client
+
+def set_client(client):
+    """Replaces the process-wide LLM client (e.g. with a StubBackend for offline runs)."""
+    global _client
+    with _client_lock:
+        _client = client
@@ -0,0 +1,154 @@
+import os
+import glob
+import time
+import wave
+import shutil
+import tempfile
+import textwrap
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from .tts_maker import synthesize_sentences
+from .utils import ensure_dir
+from .settings import get_settings
+from .instrumentation import instrument
+
+FFMPEG = get_settings().ffmpeg_binary
+FFPROBE = get_settings().ffprobe_binary
+OUTPUT_DIR = "output"
+SCENE_IMAGE_PATTERN = os.path.join(OUTPUT_DIR, "scene_*.png")
+RENDER_WORKERS = os.cpu_count() or 1
+VIDEO_WIDTH, VIDEO_HEIGHT, FPS = 854, 480, 25
+AUDIO_RATE = 44100
+SUBTITLE_WIDTH = 48
+MIN_SCENE_SECONDS = 3.0
+READING_WORDS_PER_SECOND = 3.0
+
+def split_script(script_text):
+    """Splits a script into the sentences that become scenes."""
+    return [s.strip() for s in script_text.split('.') if s.strip()]
+
+def audio_duration(path):
+    """Returns the length of an audio file in seconds, or None if it can't be read."""
+    try:
+        with wave.open(path, "rb") as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError, OSError):
+        pass
+    try:
+        result = subprocess.run(
+            [FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path],
+            check=True, capture_output=True, text=True,
+        )
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+def build_timeline(sentences, images, audio_paths=None):
+    """
+    Lays out one scene per sentence. Scene images are cycled in order and each
+    scene lasts as long as its narration, but at least as long as it takes to
+    read its subtitle.
+    """
+    timeline, start = [], 0.0
+    for i, sentence in enumerate(sentences):
+        audio = audio_paths[i] if audio_paths else None
+        duration = max(MIN_SCENE_SECONDS, len(sentence.split()) / READING_WORDS_PER_SECOND)
+        if audio:
+            duration = max(duration, audio_duration(audio) or 0.0)
+        timeline.append({
+            "index": i,
+            "text": sentence,
+            "image": images[i % len(images)] if images else None,
+            "audio": audio,
+            "start": start,
+            "duration": duration,
+        })
+        start += duration
+    return timeline
+
+def _narrate(sentences):
+    """Returns per-sentence narration segments, or None if no TTS engine is available."""
+    for voice in ("gtts:en", "pyttsx3"):
+        try:
+            return synthesize_sentences(sentences, voice)
+        except Exception as e:
+            print(f"Narration with {voice} failed: {e}")
+    return None
+
+def _scene_command(scene, subtitle_path, out_path):
+    cmd = [FFMPEG, "-y", "-loglevel", "error"]
+    if scene["image"]:
+        cmd += ["-loop", "1", "-framerate", str(FPS), "-i", scene["image"]]
+    else:
+        cmd += ["-f", "lavfi", "-i", f"color=c=black:s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:r={FPS}"]
+    if scene["audio"]:
+        cmd += ["-i", scene["audio"]]
+    else:
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={AUDIO_RATE}:cl=stereo"]
+
+    video_filter = (
+        f"scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={VIDEO_WIDTH}:{VIDEO_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"drawtext=textfile='{subtitle_path}':fontcolor=white:fontsize=24:line_spacing=6:"
+        f"box=1:boxcolor=black@0.4:boxborderw=10:x=(w-text_w)/2:y=h-text_h-40"
+    )
+    # Every scene is encoded with identical stream parameters so the final
+    # concatenation can copy the streams instead of re-encoding them.
+    cmd += [
+        "-t", f"{scene['duration']:.3f}",
+        "-vf", video_filter, "-af", "apad",
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-r", str(FPS), "-threads", "1",
+        "-c:a", "aac", "-ar", str(AUDIO_RATE), "-ac", "2",
+        out_path,
+    ]
+    return cmd
+
+def _encode_scene(scene, work_dir):
+    subtitle_path = os.path.join(work_dir, f"scene_{scene['index']:04d}.txt")
+    with open(subtitle_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(textwrap.wrap(scene["text"], SUBTITLE_WIDTH)))
+    out_path = os.path.join(work_dir, f"scene_{scene['index']:04d}.mp4")
+    subprocess.run(_scene_command(scene, subtitle_path, out_path), check=True, capture_output=True)
+    return out_path
+
+def _concat_scenes(scene_paths, work_dir, out_path):
+    list_path = os.path.join(work_dir, "scenes.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in scene_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    cmd = [FFMPEG, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", out_path]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return out_path
+
+@instrument()
+def render_video_locally(script_text, out_path=None, workers=RENDER_WORKERS):
+    """
+    Renders a narrated, subtitled slideshow from the generated scene images and
+    returns the path of the MP4, or None on failure. Each scene is encoded by its
+    own ffmpeg process and the results are joined without re-encoding.
+    """
+    if shutil.which(FFMPEG) is None:
+        print("ffmpeg not found; cannot render video locally.")
+        return None
+
+    sentences = split_script(script_text)
+    if not sentences:
+        print("Script is empty or could not be split into sentences.")
+        return None
+
+    images = sorted(glob.glob(SCENE_IMAGE_PATTERN))
+    timeline = build_timeline(sentences, images, _narrate(sentences))
+    out_path = out_path or os.path.join(OUTPUT_DIR, f"video_{int(time.time())}.mp4")
+    ensure_dir(os.path.dirname(out_path) or ".")
+
+    with tempfile.TemporaryDirectory(prefix="render_") as work_dir:
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                scene_paths = list(pool.map(lambda scene: _encode_scene(scene, work_dir), timeline))
+            _concat_scenes(scene_paths, work_dir, out_path)
+        except subprocess.CalledProcessError as e:
+            print(f"Local render failed: {e.stderr.decode(errors='replace') if e.stderr else e}")
+            return None
+    print(f"Video created successfully! Path: {out_path}")
+    return out_path
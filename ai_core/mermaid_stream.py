@@ -0,0 +1,54 @@
+MERMAID_OPEN = "```mermaid"
+FENCE = "```"
+
+class MermaidStreamParser:
+    """
+    Incrementally splits streamed explanation text into markdown and Mermaid
+    segments. Markdown is emitted as soon as it arrives; only an unterminated
+    ```mermaid block (or a tail that could be the start of one) is held back.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_mermaid = False
+
+    def feed(self, chunk):
+        """Consumes a chunk of text and returns a list of ("markdown" | "mermaid", text) segments."""
+        self._buffer += chunk
+        segments = []
+        while True:
+            if self._in_mermaid:
+                end = self._buffer.find(FENCE, len(MERMAID_OPEN))
+                if end == -1:
+                    break
+                code = self._buffer[len(MERMAID_OPEN):end].strip()
+                segments.append(("mermaid", code))
+                self._buffer = self._buffer[end + len(FENCE):]
+                self._in_mermaid = False
+            else:
+                start = self._buffer.find(MERMAID_OPEN)
+                if start == -1:
+                    # Keep back a tail that might grow into "```mermaid" with the next chunk.
+                    keep = _partial_open_length(self._buffer)
+                    ready = self._buffer[:len(self._buffer) - keep]
+                    if ready:
+                        segments.append(("markdown", ready))
+                    self._buffer = self._buffer[len(ready):]
+                    break
+                if start:
+                    segments.append(("markdown", self._buffer[:start]))
+                self._buffer = self._buffer[start:]
+                self._in_mermaid = True
+        return segments
+
+    def close(self):
+        """Flushes whatever is left. An unterminated Mermaid block is returned as markdown."""
+        rest, self._buffer, self._in_mermaid = self._buffer, "", False
+        return [("markdown", rest)] if rest else []
+
+def _partial_open_length(text):
+    """Returns the length of the longest suffix of text that is a proper prefix of ```mermaid."""
+    for length in range(min(len(text), len(MERMAID_OPEN) - 1), 0, -1):
+        if MERMAID_OPEN.startswith(text[-length:]):
+            return length
+    return 0
@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import threading
+from .utils import ensure_dir, write_atomic
+from .extractor import extract_pages_from_pdf, join_pages
+from .settings import get_settings
+from .instrumentation import instrument, count
+
+CACHE_DIR = os.path.join("output", "cache", "pdf_text")
+MAX_CACHE_BYTES = get_settings().pdf_cache_max_bytes
+
+def hash_pdf_bytes(pdf_bytes):
+    """Returns the SHA-256 hex digest used as the cache key for a PDF."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+class PdfTextCache:
+    """
+    On-disk cache of extracted PDF text, keyed by the SHA-256 of the PDF bytes.
+    Entries are small JSON files; the least recently used ones are evicted once
+    the directory grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        ensure_dir(cache_dir)
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest):
+        """Returns the cached entry for a digest, or None on a miss."""
+        path = self._path(digest)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Bump the modification time so eviction treats it as recently used.
+            os.utime(path, None)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, digest, pages):
+        """Stores the per-page text for a digest and returns the new entry."""
+        entry = {"sha256": digest, "text": join_pages(pages), "pages": pages}
+        write_atomic(self._path(digest), json.dumps(entry))
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries, total = [], 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+            entries.sort()
+            # Never evict the newest entry, even if it alone exceeds the budget.
+            for mtime, size, name in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+    @instrument("pdf_cache.load_or_extract")
+    def load_or_extract(self, pdf_bytes, pdf_path):
+        """
+        Returns the cached entry for the PDF bytes. On a miss the bytes are written
+        to pdf_path, parsed, and cached. Returns None if the PDF cannot be read.
+        """
+        digest = hash_pdf_bytes(pdf_bytes)
+        entry = self.get(digest)
+        if entry is not None:
+            count("cache_hits")
+            return entry
+        count("cache_misses")
+
+        ensure_dir(os.path.dirname(pdf_path) or ".")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        pages = extract_pages_from_pdf(pdf_path)
+        if pages is None:
+            return None
+        return self.put(digest, pages)
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_pdf_cache():
+    """Returns the process-wide PDF text cache."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PdfTextCache()
+        return _default_cache
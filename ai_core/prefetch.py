@@ -0,0 +1,183 @@
+import itertools
+import threading
+from concurrent.futures import Future
+from .generator import stream_detailed_explanation_with_diagrams, EXPLANATION_ERROR
+from .settings import get_settings
+
+PREFETCH_CONCURRENCY = get_settings().prefetch_concurrency
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _background_loop():
+    """Returns the shared asyncio loop that all prefetchers schedule their work on."""
+    # asyncio is imported on first use: it is a large share of the app's import time.
+    import asyncio
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="lesson-prefetch", daemon=True).start()
+        return _loop
+
+def stream_lesson(context_text, concept):
+    """
+    Generates a lesson through the shared model stream rather than a blocking
+    call, so a student who opens the concept meanwhile subscribes to the stream
+    in flight (see SingleFlight.stream) and watches it arrive.
+    """
+    return "".join(stream_detailed_explanation_with_diagrams(context_text, concept))
+
+def is_failed_lesson(lesson):
+    """True for the error text the explanation generators return (or stream last) instead of a lesson."""
+    return not lesson or not lesson.strip() or lesson.startswith("Error:") or EXPLANATION_ERROR in lesson
+
+class LessonPrefetcher:
+    """
+    Generates the explanation for every concept of a chapter concurrently in the
+    background, so switching topics usually finds the lesson already waiting,
+    or already streaming. The selected concept is always generated first.
+    """
+
+    def __init__(self, generate=stream_lesson, concurrency=PREFETCH_CONCURRENCY):
+        self._generate = generate
+        self._concurrency = concurrency
+        self._loop = None
+        self._lock = threading.Lock()
+        self._results = {}
+        self._started = set()
+        self._queue = None
+        self._batch = None
+        self._order = itertools.count()
+
+    def start(self, context_text, concepts, selected=None):
+        """Cancels any running batch and starts prefetching lessons for a new chapter."""
+        import asyncio
+        self.cancel()
+        self._loop = _background_loop()
+        with self._lock:
+            self._results = {concept: Future() for concept in concepts}
+            self._started = set()
+            results = self._results
+        self._batch = asyncio.run_coroutine_threadsafe(
+            self._prefetch(context_text, list(concepts), selected, results), self._loop
+        )
+
+    def cancel(self):
+        """Stops scheduling further lessons, e.g. when a new PDF is analyzed."""
+        if self._batch is not None:
+            self._batch.cancel()
+            self._batch = None
+        with self._lock:
+            for future in self._results.values():
+                future.cancel()
+            self._results = {}
+            self._started = set()
+            self._queue = None
+
+    def close(self):
+        """Alias of cancel(), called when the owning document is evicted from the artifact store."""
+        self.cancel()
+
+    def claim(self, concept):
+        """
+        Takes a concept out of the background queue so the caller can generate it in
+        the foreground (e.g. streamed). Returns False if generation already started.
+        """
+        with self._lock:
+            if concept not in self._results or concept in self._started:
+                return False
+            self._started.add(concept)
+            return True
+
+    def store(self, concept, lesson):
+        """
+        Records a lesson generated in the foreground (e.g. streamed by the app).
+        Failed lessons are not stored, so the concept is generated again next time.
+        """
+        if is_failed_lesson(lesson):
+            return
+        with self._lock:
+            future = self._results.get(concept)
+            if future is None:
+                return
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                future = self._results[concept] = Future()
+        if not future.done():
+            future.set_result(lesson)
+
+    def prioritize(self, concept):
+        """Moves a concept to the front of the queue if it hasn't started yet."""
+        queue = self._queue
+        if queue is not None:
+            self._loop.call_soon_threadsafe(queue.put_nowait, (0, next(self._order), concept))
+
+    def is_ready(self, concept):
+        """Returns True once the lesson for a concept has been generated successfully."""
+        future = self._results.get(concept)
+        return future is not None and future.done() and not future.cancelled() and future.exception() is None
+
+    def get(self, concept, timeout=None):
+        """
+        Returns the lesson for a concept, waiting up to timeout seconds for it.
+        Returns None if the concept isn't part of the current batch, failed, or isn't ready in time.
+        """
+        future = self._results.get(concept)
+        if future is None:
+            return None
+        self.prioritize(concept)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    async def _prefetch(self, context_text, concepts, selected, results):
+        import asyncio
+        queue = asyncio.PriorityQueue()
+        with self._lock:
+            if self._results is not results:
+                return
+            self._queue = queue
+            started = self._started
+        for concept in concepts:
+            queue.put_nowait((0 if concept == selected else 1, next(self._order), concept))
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        tasks = []
+        try:
+            while True:
+                with self._lock:
+                    if self._results is not results or len(started) >= len(results):
+                        break
+                await semaphore.acquire()
+                _, _, concept = await queue.get()
+                with self._lock:
+                    skip = concept in started or concept not in results
+                    if not skip:
+                        started.add(concept)
+                if skip:
+                    semaphore.release()
+                    continue
+                tasks.append(asyncio.create_task(self._generate_one(context_text, concept, results[concept], semaphore)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_one(self, context_text, concept, future, semaphore):
+        import asyncio
+        try:
+            if future.done():
+                return
+            lesson = await asyncio.to_thread(self._generate, context_text, concept)
+            if future.done():
+                return
+            if is_failed_lesson(lesson):
+                future.set_exception(RuntimeError(lesson))
+            else:
+                future.set_result(lesson)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            semaphore.release()
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .utils import ensure_dir, write_atomic
+from .quiz_generator import generate_question_pool
+from .structured_output import normalize_question_text
+
+BANK_DIR = os.path.join("output", "cache", "question_bank")
+QUIZ_SIZE = 5
+POOL_BATCH_SIZE = 20
+LOW_WATERMARK = 10
+MAX_POOL_SIZE = 60
+# A fill that fails or adds nothing isn't retried by warm() until this backoff (doubling per failure) expires.
+FILL_BACKOFF_BASE = 30.0
+FILL_BACKOFF_MAX = 30 * 60.0
+
+class QuestionBank:
+    """
+    Persistent pool of validated quiz questions per concept text. Quizzes are
+    sampled locally from the pool, favouring questions served least often, and
+    the pool is topped up in the background once few unseen questions remain.
+    At most one fill per concept runs at a time, and concepts whose fills keep
+    failing are backed off instead of being retried on every rerun.
+    """
+
+    def __init__(self, bank_dir=BANK_DIR, generate=generate_question_pool, batch_size=POOL_BATCH_SIZE,
+                 low_watermark=LOW_WATERMARK, max_pool_size=MAX_POOL_SIZE,
+                 backoff_base=FILL_BACKOFF_BASE, backoff_max=FILL_BACKOFF_MAX):
+        self.bank_dir = bank_dir
+        self.generate = generate
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.max_pool_size = max_pool_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._fills = {}
+        self._failures = {}
+        self._refiller = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-bank")
+        ensure_dir(bank_dir)
+
+    def _key(self, concept_text):
+        return hashlib.sha256(concept_text[:4000].encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.bank_dir, f"{key}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, key, pool):
+        write_atomic(self._path(key), json.dumps(pool))
+
+    def size(self, concept_text):
+        """Returns the number of questions banked for a concept text."""
+        with self._lock:
+            return len(self._load(self._key(concept_text)))
+
+    def fill(self, concept_text):
+        """Generates a batch of questions and adds the new ones to the pool. Returns how many were added."""
+        key = self._key(concept_text)
+        questions = self.generate(concept_text, self.batch_size)
+        with self._lock:
+            pool = self._load(key)
+            seen = {normalize_question_text(entry["question"]["question_text"]) for entry in pool}
+            added = 0
+            for question in questions:
+                normalized = normalize_question_text(question["question_text"])
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+                pool.append({"question": question, "served": 0})
+                added += 1
+            if len(pool) > self.max_pool_size:
+                # Drop the most-served questions first.
+                pool.sort(key=lambda entry: entry["served"])
+                pool = pool[:self.max_pool_size]
+            self._save(key, pool)
+        return added
+
+    def _fill_in_background(self, concept_text, respect_backoff=True):
+        """
+        Returns the future of the concept's in-flight fill, starting one if none
+        is running. Returns None if the concept is backing off after failed fills.
+        """
+        key = self._key(concept_text)
+        with self._lock:
+            future = self._fills.get(key)
+            if future is not None:
+                return future
+            retry_at = self._failures.get(key, (0, 0.0))[1]
+            if respect_backoff and time.monotonic() < retry_at:
+                return None
+            future = self._refiller.submit(self._run_fill, key, concept_text)
+            self._fills[key] = future
+            return future
+
+    def _run_fill(self, key, concept_text):
+        added = 0
+        try:
+            added = self.fill(concept_text)
+        except Exception as e:
+            print(f"Question bank refill failed: {e}")
+        finally:
+            with self._lock:
+                self._fills.pop(key, None)
+                if added:
+                    self._failures.pop(key, None)
+                else:
+                    failures = self._failures.get(key, (0, 0.0))[0] + 1
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                    self._failures[key] = (failures, time.monotonic() + delay)
+        return added
+
+    def warm(self, concept_text):
+        """Starts filling the bank in the background if it can't yet serve a full quiz."""
+        if self.size(concept_text) < self.low_watermark:
+            self._fill_in_background(concept_text)
+
+    def draw_quiz(self, concept_text, size=QUIZ_SIZE):
+        """
+        Returns {"questions": [...]} sampled from the bank (same shape as
+        generate_quiz_questions), or {"error": ...} if no questions can be generated.
+        """
+        key = self._key(concept_text)
+        if self.size(concept_text) < size:
+            # Wait for the fill warm() started rather than paying for a second one.
+            self._fill_in_background(concept_text, respect_backoff=False).result()
+
+        with self._lock:
+            pool = self._load(key)
+            if not pool:
+                return {"error": "Failed to generate quiz: no valid questions were produced."}
+            random.shuffle(pool)
+            pool.sort(key=lambda entry: entry["served"])
+            chosen = pool[:size]
+            for entry in chosen:
+                entry["served"] += 1
+            self._save(key, pool)
+            unseen = sum(1 for entry in pool if entry["served"] == 0)
+
+        if unseen < self.low_watermark:
+            self._fill_in_background(concept_text)
+        return {"questions": [entry["question"] for entry in chosen]}
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def get_question_bank():
+    """Returns the process-wide question bank."""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank()
+        return _bank
@@ -1,21 +1,10 @@
-import os
-import json
-from dotenv import load_dotenv
-import google.generativeai as genai
+from .llm_client import get_client
+from .structured_output import generate_validated, validate_quiz_questions, normalize_question_text
+from .instrumentation import instrument
 
-load_dotenv()
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+QUIZ_SIZE = 5
 
-def generate_quiz_questions(concept_text):
-    """Uses Gemini to generate a multiple-choice quiz from the concept text."""
-    if not GEMINI_KEY:
-        return {"error": "GEMINI_API_KEY not found."}
-    
-    try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        prompt = f"""
+QUIZ_PROMPT = """
         Based on the following educational text, create a JSON object for a quiz.
         The JSON object must have one key: "questions".
         The value should be a list of 5 multiple-choice question objects.
@@ -25,14 +14,73 @@ def generate_quiz_questions(concept_text):
         3. "correct_answer": The string of the correct answer from the "options" list.
 
         Educational Text:
-        "{concept_text[:4000]}"
+        "{text}"
         """
-        
-        response = model.generate_content(prompt)
-        # Clean up potential markdown formatting from the response
-        json_text = response.text.strip().replace("```json", "").replace("```", "")
-        quiz_data = json.loads(json_text)
-        return quiz_data
+
+QUIZ_TOPUP_PROMPT = """
+        Based on the following educational text, create a JSON object with {count} more quiz questions.
+        The JSON object must have one key: "questions".
+        The questions must be different from these existing ones: {existing}
+        Each question object must have three keys:
+        1. "question_text": The question itself.
+        2. "options": A list of 4 strings, where one is the correct answer.
+        3. "correct_answer": The string of the correct answer from the "options" list.
+
+        Educational Text:
+        "{text}"
+        """
+
+QUESTION_POOL_PROMPT = """
+        Based on the following educational text, create a JSON object for a question bank.
+        The JSON object must have one key: "questions".
+        The value should be a list of {count} distinct multiple-choice question objects covering different parts of the text.
+        Each question object must have three keys:
+        1. "question_text": The question itself.
+        2. "options": A list of 4 strings, where one is the correct answer.
+        3. "correct_answer": The string of the correct answer from the "options" list.
+
+        Educational Text:
+        "{text}"
+        """
+
+def _question_key(question):
+    return normalize_question_text(question["question_text"])
+
+@instrument()
+def generate_question_pool(concept_text, count):
+    """
+    Generates up to `count` questions in one call and returns the ones that pass
+    validation, without duplicates. Returns an empty list on failure.
+    """
+    client = get_client()
+    if not client.is_configured():
+        return []
+    try:
+        # Not cached: refills must produce new questions, not replay the last batch.
+        questions, problems = generate_validated(QUESTION_POOL_PROMPT, validate_quiz_questions, use_cache=False,
+                                                 key=_question_key, count=count, text=concept_text[:4000])
+    except Exception as e:
+        print(f"Failed to generate question pool: {e}")
+        return []
+    if problems:
+        print(f"Skipped {len(problems)} invalid question(s) in the question pool.")
+    return questions
+
+@instrument()
+def generate_quiz_questions(concept_text):
+    """Uses Gemini to generate a multiple-choice quiz from the concept text."""
+    client = get_client()
+    if not client.is_configured():
+        return {"error": "GEMINI_API_KEY not found."}
+    
+    try:
+        # Invalid or missing questions are re-requested on their own instead of regenerating the quiz.
+        questions, problems = generate_validated(QUIZ_PROMPT, validate_quiz_questions, expected=QUIZ_SIZE,
+                                                 topup_template=QUIZ_TOPUP_PROMPT, key=_question_key,
+                                                 text=concept_text[:4000])
+        if not questions:
+            return {"error": f"Failed to generate quiz: {'; '.join(problems) or 'no valid questions'}"}
+        return {"questions": questions}
 
     except Exception as e:
-        return {"error": f"Failed to generate quiz: {e}"}
\ No newline at end of file
+        return {"error": f"Failed to generate quiz: {e}"}
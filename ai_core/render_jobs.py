@@ -0,0 +1,260 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from .utils import ensure_dir
+from .settings import get_settings
+
+_settings = get_settings()
+SHOTSTACK_KEY = _settings.shotstack_api_key
+SHOTSTACK_STAGE = _settings.shotstack_stage
+SHOTSTACK_API_URL = _settings.shotstack_api_url
+D_ID_KEY = _settings.d_id_api_key
+D_ID_API_URL = _settings.d_id_api_url
+
+JOBS_PATH = os.path.join("output", "jobs", "render_jobs.sqlite3")
+POLL_INITIAL_INTERVAL = 2.0
+POLL_MAX_INTERVAL = 30.0
+POLL_BACKOFF = 1.5
+JOB_TIMEOUT = _settings.render_job_timeout
+
+PENDING, DONE, FAILED, TIMEOUT = "pending", "done", "failed", "timeout"
+
+def _http():
+    """Returns the requests module, imported on first use so only processes that render pay for it."""
+    import requests
+    return requests
+
+class ShotstackProvider:
+    """Submits edits to the Shotstack render API and reads back their status."""
+
+    name = "shotstack"
+
+    def __init__(self, api_key=SHOTSTACK_KEY, stage=SHOTSTACK_STAGE, base_url=SHOTSTACK_API_URL):
+        self.api_key = api_key
+        self.render_url = f"{base_url.rstrip('/')}/{stage}/render"
+        self.headers = {"Content-Type": "application/json", "x-api-key": api_key or ""}
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def submit(self, payload, session=None):
+        response = (session or _http()).post(self.render_url, json=payload, headers=self.headers, timeout=30)
+        response.raise_for_status()
+        return response.json()["response"]["id"]
+
+    def check(self, remote_id, session=None):
+        """Returns (status, result_url, error) for a submitted render."""
+        response = (session or _http()).get(f"{self.render_url}/{remote_id}", headers=self.headers, timeout=30)
+        response.raise_for_status()
+        result = response.json()["response"]
+        status = result.get("status")
+        if status == "done":
+            return DONE, result.get("url"), None
+        if status == "failed":
+            return FAILED, None, result.get("error")
+        return PENDING, None, None
+
+class DIdProvider:
+    """Submits talking-presenter clips to the D-ID talks API and reads back their status."""
+
+    name = "d-id"
+
+    def __init__(self, api_key=D_ID_KEY, base_url=D_ID_API_URL):
+        self.api_key = api_key
+        self.talks_url = f"{base_url.rstrip('/')}/talks"
+        self.headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "authorization": f"Basic {api_key or ''}",
+        }
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def submit(self, payload, session=None):
+        response = (session or _http()).post(self.talks_url, json=payload, headers=self.headers, timeout=30)
+        response.raise_for_status()
+        talk_id = response.json().get("id")
+        if not talk_id:
+            raise ValueError("D-ID response did not include a talk ID")
+        return talk_id
+
+    def check(self, remote_id, session=None):
+        """Returns (status, result_url, error) for a submitted talk."""
+        response = (session or _http()).get(f"{self.talks_url}/{remote_id}", headers=self.headers, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        status = result.get("status")
+        if status == "done":
+            return DONE, result.get("result_url"), None
+        if status in ("error", "rejected"):
+            return FAILED, None, str(result.get("error"))
+        return PENDING, None, None
+
+class RenderJobQueue:
+    """
+    Tracks remote render jobs. submit() returns a job ID as soon as the provider has
+    accepted the job; one background thread then polls every outstanding job with
+    per-job exponential backoff until it finishes or hits its deadline. Jobs are
+    stored in SQLite, so pending renders are picked up again after a restart.
+    """
+
+    def __init__(self, providers, path=JOBS_PATH, initial_interval=POLL_INITIAL_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, backoff=POLL_BACKOFF, timeout=JOB_TIMEOUT):
+        self.providers = {provider.name: provider for provider in providers}
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        if path != ":memory:":
+            ensure_dir(os.path.dirname(path) or ".")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, provider TEXT NOT NULL, remote_id TEXT NOT NULL, status TEXT NOT NULL, "
+                "result_url TEXT, error TEXT, submitted REAL NOT NULL, deadline REAL NOT NULL, "
+                "next_poll REAL NOT NULL, interval REAL NOT NULL)"
+            )
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._poller = None
+
+    def start(self):
+        """Starts the background poller (also resumes jobs persisted by an earlier run)."""
+        with self._cond:
+            if self._poller is None:
+                self._stopped = False
+                self._poller = threading.Thread(target=self._poll_loop, name="render-poller", daemon=True)
+                self._poller.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+
+    def submit(self, provider_name, payload, timeout=None):
+        """Submits a job to a provider and returns its local job ID. Raises if the provider rejects it."""
+        provider = self.providers[provider_name]
+        remote_id = provider.submit(payload)
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._cond:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, provider, remote_id, status, submitted, deadline, next_poll, interval) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, provider_name, str(remote_id), PENDING, now, now + (timeout or self.timeout),
+                     now + self.initial_interval, self.initial_interval),
+                )
+            self._cond.notify_all()
+        self.start()
+        return job_id
+
+    def status(self, job_id):
+        """Returns the job as a dict, or None if the ID is unknown."""
+        with self._cond:
+            row = self._conn.execute(
+                "SELECT id, provider, remote_id, status, result_url, error, submitted, deadline FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "provider", "remote_id", "status", "result_url", "error", "submitted", "deadline")
+        return dict(zip(keys, row))
+
+    def wait(self, job_id, timeout=None):
+        """
+        Blocks until a job leaves the pending state and returns its status. If
+        timeout elapses first, the job is returned still pending, with an error
+        saying so; it keeps being polled until its own deadline.
+        """
+        give_up = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                job = self.status(job_id)
+                if job is None or job["status"] != PENDING:
+                    return job
+                remaining = None if give_up is None else give_up - time.time()
+                if remaining is not None and remaining <= 0:
+                    job["error"] = f"Still rendering after waiting {timeout:g}s (job {job_id})."
+                    return job
+                self._cond.wait(remaining)
+
+    async def wait_async(self, job_id, timeout=None):
+        """Awaitable version of wait()."""
+        # Any caller awaiting this already has asyncio loaded; importing it here keeps it off the startup path.
+        import asyncio
+        return await asyncio.to_thread(self.wait, job_id, timeout)
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _poll_loop(self):
+        session = _http().Session()
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.time()
+                due = self._conn.execute(
+                    "SELECT id, provider, remote_id, deadline, interval FROM jobs WHERE status = ? AND next_poll <= ?",
+                    (PENDING, now),
+                ).fetchall()
+                if not due:
+                    next_poll = self._conn.execute(
+                        "SELECT MIN(next_poll) FROM jobs WHERE status = ?", (PENDING,)
+                    ).fetchone()[0]
+                    self._cond.wait(None if next_poll is None else max(0.0, next_poll - now))
+                    continue
+
+            for job_id, provider_name, remote_id, deadline, interval in due:
+                self._poll_job(session, job_id, provider_name, remote_id, deadline, interval)
+
+    def _poll_job(self, session, job_id, provider_name, remote_id, deadline, interval):
+        provider = self.providers.get(provider_name)
+        status, result_url, error = PENDING, None, None
+        if provider is None:
+            status, error = FAILED, f"No provider registered for '{provider_name}'"
+        else:
+            try:
+                status, result_url, error = provider.check(remote_id, session=session)
+            except Exception as e:
+                # Transient errors are retried on the normal backoff schedule until the deadline.
+                print(f"Failed while checking render status for job {job_id}: {e}")
+
+        now = time.time()
+        if status == PENDING and now >= deadline:
+            status, error = TIMEOUT, "Render did not finish before the deadline."
+        with self._cond:
+            if status == PENDING:
+                interval = min(self.max_interval, interval * self.backoff)
+                self._update(job_id, next_poll=now + interval, interval=interval)
+            else:
+                self._update(job_id, status=status, result_url=result_url, error=error)
+                self._cond.notify_all()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_render_queue():
+    """Returns the process-wide render queue with the Shotstack and D-ID providers."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = RenderJobQueue([ShotstackProvider(), DIdProvider()])
+            _queue.start()
+        return _queue
+
+def set_render_queue(queue):
+    """Replaces the process-wide render queue (e.g. with one pointed at a local fake server)."""
+    global _queue
+    with _queue_lock:
+        _queue = queue
@@ -0,0 +1,123 @@
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+CHARS_PER_TOKEN = 4
+INDEX_CACHE_SIZE = 16
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how in into is it its of on or "
+    "that the their there these this to was we what when which while why will with you your".split()
+)
+
+def tokenize(text):
+    """Lower-cases text and splits it into alphanumeric terms, dropping stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def estimate_tokens(text):
+    """Rough token count used for prompt budgets (about four characters per token)."""
+    return len(text) // CHARS_PER_TOKEN
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Splits text into overlapping chunks of roughly chunk_chars, breaking at spaces."""
+    chunks, start, length = [], 0, len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            space = text.rfind(" ", start + chunk_chars // 2, end)
+            if space != -1:
+                end = space
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+class ChapterIndex:
+    """BM25 index over overlapping chunks of a chapter, built once per document."""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+        self.text = text
+        self.chunks = chunk_text(text, chunk_chars, overlap)
+        self._term_counts = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query):
+        """Returns the BM25 score of every chunk for a query."""
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        results = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def top_chunks(self, query, max_tokens, k=None):
+        """
+        Returns the best-scoring chunks for a query that fit in max_tokens, in their
+        original document order. Ties (e.g. no matching terms) favour earlier chunks.
+        """
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+        if k is not None:
+            ranked = ranked[:k]
+        selected, used = [], 0
+        for i in ranked:
+            cost = estimate_tokens(self.chunks[i])
+            if used + cost > max_tokens:
+                continue
+            selected.append(i)
+            used += cost
+        return [self.chunks[i] for i in sorted(selected)]
+
+    def context_for(self, query, max_tokens, k=None):
+        """Builds a prompt context for a query. Text that already fits is returned unchanged."""
+        if estimate_tokens(self.text) <= max_tokens:
+            return self.text
+        return "\n...\n".join(self.top_chunks(query, max_tokens, k))
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_chapter_index(text):
+    """Returns the (cached) index for a chapter's text."""
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = ChapterIndex(text)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+def build_context(text, query, max_tokens, k=None):
+    """Returns the parts of text most relevant to query within a token budget."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return get_chapter_index(text).context_for(query, max_tokens, k)
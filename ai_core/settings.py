@@ -0,0 +1,77 @@
+"""
+Central configuration for ai_core.
+
+The environment (plus a .env file, if present) is read once, the first time
+get_settings() is called, and every module takes its settings from that one
+object instead of calling load_dotenv() and os.getenv() on its own.
+"""
+import os
+import threading
+from dotenv import load_dotenv
+
+def _int(environ, name, default):
+    return int(environ.get(name, default))
+
+def _float(environ, name, default):
+    return float(environ.get(name, default))
+
+class Settings:
+    """Typed view of the environment variables ai_core understands."""
+
+    def __init__(self, environ):
+        # Gemini
+        self.gemini_api_key = environ.get("GEMINI_API_KEY")
+        self.llm_max_concurrency = _int(environ, "LLM_MAX_CONCURRENCY", 8)
+        self.llm_timeout = _float(environ, "LLM_TIMEOUT", 120)
+        self.llm_max_retries = _int(environ, "LLM_MAX_RETRIES", 4)
+        self.llm_backoff_base = _float(environ, "LLM_BACKOFF_BASE", 1.0)
+        self.llm_backoff_max = _float(environ, "LLM_BACKOFF_MAX", 30.0)
+        self.single_flight_timeout = _float(environ, "SINGLE_FLIGHT_TIMEOUT", 300)
+
+        # Caches
+        self.llm_cache_ttl = _float(environ, "LLM_CACHE_TTL", 7 * 24 * 3600)
+        self.llm_cache_max_entries = _int(environ, "LLM_CACHE_MAX_ENTRIES", 5000)
+        self.pdf_cache_max_bytes = _int(environ, "PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+        self.pdf_extract_workers = _int(environ, "PDF_EXTRACT_WORKERS", os.cpu_count() or 1)
+
+        # Video and audio
+        self.video_backend = environ.get("VIDEO_BACKEND", "local")
+        self.ffmpeg_binary = environ.get("FFMPEG_BINARY", "ffmpeg")
+        self.ffprobe_binary = environ.get("FFPROBE_BINARY", "ffprobe")
+        self.shotstack_api_key = environ.get("SHOTSTACK_API_KEY")
+        self.shotstack_stage = environ.get("SHOTSTACK_STAGE", "stage")
+        self.shotstack_api_url = environ.get("SHOTSTACK_API_URL", "https://api.shotstack.io")
+        self.d_id_api_key = environ.get("D_ID_API_KEY")
+        self.d_id_api_url = environ.get("D_ID_API_URL", "https://api.d-id.com")
+        self.render_job_timeout = _float(environ, "RENDER_JOB_TIMEOUT", 900)
+
+        # Lessons, library, simulations and grading
+        self.prefetch_concurrency = _int(environ, "PREFETCH_CONCURRENCY", 3)
+        self.library_ingest_workers = _int(environ, "LIBRARY_INGEST_WORKERS", os.cpu_count() or 1)
+        self.library_concept_workers = _int(environ, "LIBRARY_CONCEPT_WORKERS", 4)
+        self.simulation_host = environ.get("SIMULATION_HOST", "127.0.0.1")
+        self.simulation_port = _int(environ, "SIMULATION_PORT", 8765)
+        # Where students' browsers reach the simulation server (e.g. behind the app's reverse proxy).
+        # Unset, simulations are inlined into the Streamlit page instead.
+        self.simulation_public_url = environ.get("SIMULATION_PUBLIC_URL")
+        self.simulation_max_script_bytes = _int(environ, "SIMULATION_MAX_SCRIPT_BYTES", 64 * 1024)
+        self.grader_min_answer_words = _int(environ, "GRADER_MIN_ANSWER_WORDS", 4)
+        self.grader_duplicate_similarity = _float(environ, "GRADER_DUPLICATE_SIMILARITY", 0.9)
+
+        # Tracing
+        self.trace_sinks = [s.strip().lower() for s in environ.get("LEARNVERSE_TRACE", "").split(",") if s.strip()]
+        self.trace_file = environ.get("LEARNVERSE_TRACE_FILE", os.path.join("output", "traces.jsonl"))
+        self.metrics_host = environ.get("LEARNVERSE_METRICS_HOST", "127.0.0.1")
+        self.metrics_port = _int(environ, "LEARNVERSE_METRICS_PORT", 9464)
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings():
+    """Returns the process-wide settings, loading .env the first time."""
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            load_dotenv()
+            _settings = Settings(os.environ)
+        return _settings
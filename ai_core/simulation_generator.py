@@ -1,71 +1,89 @@
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-import re
+import html
+from string import Template
+from .llm_client import get_client
+from .llm_cache import generate_from_template
+from .js_check import check_javascript
+from .simulation_store import get_simulation_store, PAGE_CONTENT_SECURITY_POLICY
+from .instrumentation import instrument, annotate
 
-load_dotenv()
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+# This boilerplate provides the structure, so the AI only has to write the core logic.
+# It is compiled once; each simulation only substitutes the title and script.
+SIMULATION_PAGE = Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <meta http-equiv="Content-Security-Policy" content="$csp">
+    <title>Interactive Simulation</title>
+    <style>
+        body { font-family: sans-serif; display: flex; flex-direction: column; align-items: center; margin: 0; background-color: #f0f0f0; }
+        #simulationCanvas { border: 1px solid #ccc; background-color: #fff; }
+        .controls { margin-top: 10px; padding: 0 10px; }
+        label { margin: 0 10px; }
+    </style>
+</head>
+<body>
+    <h4>$title Simulation</h4>
+    <canvas id="simulationCanvas" width="700" height="400"></canvas>
+    <div class="controls" id="simulationControls"></div>
 
-def generate_simulation_code(concept_title, context_text):
-    """Generates self-contained HTML/JS code for an interactive simulation by injecting AI-written JS into a template."""
-    if not GEMINI_KEY:
-        return "Error: GEMINI_API_KEY not found."
+    <script>
+$script
+    </script>
+</body>
+</html>
+""")
+
+SIMULATION_PROMPT = """
+Act as an expert JavaScript developer. Your task is to write **only the JavaScript code** that goes inside the `<script>` tag of an HTML file to create an interactive simulation.
+- The simulation must be for the concept: **"{concept_title}"**.
+- It must run on the HTML canvas element with the id 'simulationCanvas'.
+- If you need interactive controls like sliders or buttons, generate the HTML for them and use JavaScript to insert them into the 'simulationControls' div.
+- The code must be self-contained and not require any external libraries, network requests or browser storage.
+- Add comments to explain the logic.
+- Make it interactive (e.g., draggable objects, sliders to change values).
+- Do not include the `<script>` tags or any other HTML in your response. Output only the raw JavaScript code.
 
-    # This boilerplate provides the structure, so the AI only has to write the core logic.
-    html_template = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-g">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Interactive Simulation</title>
-        <style>
-            body {{ font-family: sans-serif; display: flex; flex-direction: column; align-items: center; margin: 0; background-color: #f0f0f0; }}
-            #simulationCanvas {{ border: 1px solid #ccc; background-color: #fff; }}
-            .controls {{ margin-top: 10px; padding: 0 10px; }}
-            label {{ margin: 0 10px; }}
-        </style>
-    </head>
-    <body>
-        <h4>{concept_title} Simulation</h4>
-        <canvas id="simulationCanvas" width="700" height="400"></canvas>
-        <div class="controls" id="simulationControls">
-            </div>
+Here is some context for the concept:
+"{context}"
+"""
 
-        <script>
-            // --- AI-GENERATED JAVASCRIPT LOGIC GOES HERE ---
-        </script>
-    </body>
-    </html>
+SIMULATION_CONTEXT_CHARS = 2000
+
+def render_simulation_page(concept_title, js_code):
+    """Fills the precompiled page template with a title and script."""
+    return SIMULATION_PAGE.substitute(csp=PAGE_CONTENT_SECURITY_POLICY, title=html.escape(concept_title), script=js_code)
+
+@instrument()
+def generate_simulation_code(concept_title, context_text):
     """
+    Returns self-contained HTML/JS for an interactive simulation. Pages are reused
+    per (concept, context); new scripts must pass a static check before they are stored.
+    """
+    store = get_simulation_store()
+    cached = store.get(concept_title, context_text)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if not client.is_configured():
+        return "Error: GEMINI_API_KEY not found."
 
     try:
-        genai.configure(api_key=GEMINI_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        # The store is the cache here: a rejected script must not be replayed from the response cache.
+        response_text = generate_from_template(SIMULATION_PROMPT, use_cache=False, concept_title=concept_title, context=context_text[:SIMULATION_CONTEXT_CHARS])
 
-        prompt = f"""
-        Act as an expert JavaScript developer. Your task is to write **only the JavaScript code** that goes inside the `<script>` tag of an HTML file to create an interactive simulation.
-        - The simulation must be for the concept: **"{concept_title}"**.
-        - It must run on the HTML canvas element with the id 'simulationCanvas'.
-        - If you need interactive controls like sliders or buttons, generate the HTML for them and use JavaScript to insert them into the 'simulationControls' div.
-        - The code must be self-contained and not require any external libraries.
-        - Add comments to explain the logic.
-        - Make it interactive (e.g., draggable objects, sliders to change values).
-        - Do not include the `<script>` tags or any other HTML in your response. Output only the raw JavaScript code.
+        # Clean up potential markdown formatting from the AI's response
+        js_code = response_text.strip().replace("```javascript", "").replace("```js", "").replace("```", "").strip()
 
-        Here is some context for the concept:
-        "{context_text[:2000]}"
-        """
+        problems = check_javascript(js_code)
+        if problems:
+            annotate(rejected=len(problems))
+            return f"Error: Generated simulation failed validation: {'; '.join(problems)}"
 
-        response = model.generate_content(prompt)
-        
-        # Clean up potential markdown formatting from the AI's response
-        js_code = response.text.strip().replace("```javascript", "").replace("```", "")
-        
-        # Inject the AI-generated JavaScript into our HTML template
-        final_html = html_template.replace("// --- AI-GENERATED JAVASCRIPT LOGIC GOES HERE ---", js_code)
-        
+        final_html = render_simulation_page(concept_title, js_code)
+        store.put(concept_title, context_text, final_html)
         return final_html
 
     except Exception as e:
-        return f"Error: Failed to generate simulation code: {e}"
\ No newline at end of file
+        return f"Error: Failed to generate simulation code: {e}"
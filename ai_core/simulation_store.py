@@ -0,0 +1,142 @@
+import os
+import hashlib
+import threading
+from .utils import ensure_dir, write_atomic
+from .settings import get_settings
+from .instrumentation import count
+
+SIMULATION_DIR = os.path.join("output", "cache", "simulations")
+SIMULATION_HOST = get_settings().simulation_host
+SIMULATION_PORT = get_settings().simulation_port
+SIMULATION_PUBLIC_URL = get_settings().simulation_public_url
+
+# Simulations are untrusted generated code with no network access. Pages carry
+# this policy in a <meta> tag, so it also holds when they are inlined.
+PAGE_CONTENT_SECURITY_POLICY = (
+    "default-src 'none'; script-src 'unsafe-inline'; style-src 'unsafe-inline'; img-src data:"
+)
+# Served pages also get an opaque-origin sandbox, which only works as a header.
+CONTENT_SECURITY_POLICY = PAGE_CONTENT_SECURITY_POLICY + "; sandbox allow-scripts"
+
+def simulation_key(concept_title, context_text):
+    """Returns the cache key for a concept's simulation, built from its context."""
+    context_hash = hashlib.sha256(context_text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{concept_title}\0{context_hash}".encode("utf-8")).hexdigest()
+
+class SimulationStore:
+    """
+    On-disk store of generated simulation pages, one HTML file per
+    (concept, context hash). Only scripts that passed the static check are
+    stored, so a bad generation is never served twice. Files can be served
+    over HTTP with strong ETags so browsers revalidate with a 304.
+    """
+
+    def __init__(self, simulation_dir=SIMULATION_DIR):
+        self.simulation_dir = simulation_dir
+        self._etags = {}
+        self._lock = threading.Lock()
+        self._server = None
+        ensure_dir(simulation_dir)
+
+    def path(self, key):
+        return os.path.join(self.simulation_dir, f"{key}.html")
+
+    def get(self, concept_title, context_text):
+        """Returns the stored page for a concept and context, or None."""
+        try:
+            with open(self.path(simulation_key(concept_title, context_text)), "r", encoding="utf-8") as f:
+                html = f.read()
+        except OSError:
+            count("cache_misses")
+            return None
+        count("cache_hits")
+        return html
+
+    def put(self, concept_title, context_text, html):
+        """Stores a page and returns its key."""
+        key = simulation_key(concept_title, context_text)
+        write_atomic(self.path(key), html)
+        return key
+
+    def etag(self, key):
+        """Returns the quoted content hash of a stored page, or None if it doesn't exist."""
+        path = self.path(key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._etags.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+        with open(path, "rb") as f:
+            etag = f'"{hashlib.sha256(f.read()).hexdigest()[:32]}"'
+        with self._lock:
+            self._etags[key] = (version, etag)
+        return etag
+
+    def url(self, key, public_url=SIMULATION_PUBLIC_URL):
+        """
+        Returns the URL a stored page is served at: under public_url when one is
+        configured, else on the local server. None if neither is available.
+        """
+        if public_url:
+            return f"{public_url.rstrip('/')}/simulations/{key}.html"
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"http://{'localhost' if host in ('0.0.0.0', '') else host}:{port}/simulations/{key}.html"
+
+    def serve(self, host=SIMULATION_HOST, port=SIMULATION_PORT):
+        """
+        Serves stored pages at /simulations/<key>.html on a background thread.
+        Binds to loopback unless SIMULATION_HOST says otherwise.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        store = self
+
+        class SimulationHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                name = self.path.split("?", 1)[0]
+                prefix, _, filename = name.rpartition("/")
+                key = filename[:-len(".html")] if filename.endswith(".html") else ""
+                # Keys are hex digests; anything else is rejected before touching the disk.
+                etag = store.etag(key) if prefix == "/simulations" and key.isalnum() else None
+                if etag is None:
+                    self.send_error(404)
+                    return
+                if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                with open(store.path(key), "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Content-Security-Policy", CONTENT_SECURITY_POLICY)
+                self.send_header("X-Content-Type-Options", "nosniff")
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), SimulationHandler)
+        threading.Thread(target=self._server.serve_forever, name="simulations", daemon=True).start()
+        return self._server
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_simulation_store():
+    """Returns the process-wide simulation store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SimulationStore()
+        return _store
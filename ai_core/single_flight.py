@@ -0,0 +1,160 @@
+import threading
+from concurrent.futures import Future
+from .settings import get_settings
+from .instrumentation import count, in_current_context
+
+# How long a caller waits on someone else's in-flight call (or, for streams, for
+# the next chunk) before giving up with a TimeoutError, unless the caller passes
+# its own timeout. Model calls pass LLMClient.max_call_seconds().
+SINGLE_FLIGHT_TIMEOUT = get_settings().single_flight_timeout
+
+class _Broadcast:
+    """Chunks of one in-flight stream, replayed to every subscriber as they arrive."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cancelled = False
+        self.condition = threading.Condition()
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the work
+    and everyone who arrives while it is in flight waits for the same result (or
+    exception) instead of repeating it. Works for threads (do), asyncio (do_async)
+    and chunked streams (stream). Nothing is kept once a call completes; caching
+    the result is up to the caller.
+    """
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+
+    def _join(self, key):
+        """Returns (future, is_leader) for a key, registering a new call if none is in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                count("coalesced")
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _run(self, key, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Returns fn(*args, **kwargs), sharing the call with any concurrent caller
+        using the same key. Waiting callers raise the leader's exception, or
+        concurrent.futures.TimeoutError after timeout seconds.
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn, args, kwargs)
+            return future.result()
+        return future.result(timeout=self.timeout if timeout is None else timeout)
+
+    async def do_async(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Awaitable version of do(). fn is a blocking function; the leader runs it on
+        a worker thread, so cancelling one awaiting task never cancels the shared
+        call. Thread and asyncio callers with the same key share one call.
+        """
+        import asyncio
+        future, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, in_current_context(self._run), key, future, fn, args, kwargs)
+        # shield() keeps a timed-out or cancelled waiter from cancelling the shared future.
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), self.timeout if timeout is None else timeout
+        )
+
+    def stream(self, key, open_stream, on_complete=None, timeout=None):
+        """
+        Yields the chunks of open_stream(), sharing one underlying stream with any
+        concurrent caller using the same key. Late subscribers first receive the
+        chunks already produced. The stream is read on a background thread, so one
+        subscriber stopping early doesn't cut off the others; it is abandoned only
+        once every subscriber has stopped. on_complete(chunks) runs once if the
+        stream finishes.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast()
+            else:
+                count("coalesced")
+            with broadcast.condition:
+                broadcast.subscribers += 1
+        if leader:
+            threading.Thread(
+                target=in_current_context(self._pump), args=(key, broadcast, open_stream, on_complete),
+                name="single-flight-stream", daemon=True,
+            ).start()
+
+        position = 0
+        try:
+            while True:
+                with broadcast.condition:
+                    if not broadcast.condition.wait_for(
+                        lambda: position < len(broadcast.chunks) or broadcast.done, timeout
+                    ):
+                        raise TimeoutError(f"no response chunk within {timeout}s")
+                    pending = broadcast.chunks[position:]
+                    finished, error = broadcast.done, broadcast.error
+                position += len(pending)
+                yield from pending
+                if finished and position == len(broadcast.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            # Same lock order as subscribing, so nobody can join a stream as it is abandoned.
+            with self._lock, broadcast.condition:
+                broadcast.subscribers -= 1
+                if broadcast.subscribers == 0 and not broadcast.done:
+                    broadcast.cancelled = True
+                    if self._streams.get(key) is broadcast:
+                        del self._streams[key]
+
+    def _pump(self, key, broadcast, open_stream, on_complete):
+        """Reads the shared stream into the broadcast until it ends or nobody is listening."""
+        chunks = None
+        try:
+            chunks = open_stream()
+            for chunk in chunks:
+                with broadcast.condition:
+                    if broadcast.cancelled:
+                        break
+                    broadcast.chunks.append(chunk)
+                    broadcast.condition.notify_all()
+            else:
+                if on_complete is not None:
+                    on_complete(broadcast.chunks)
+        except BaseException as e:
+            broadcast.error = e
+        finally:
+            close = getattr(chunks, "close", None)  # Stops the model stream if abandoned.
+            if close is not None:
+                close()
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+            with broadcast.condition:
+                broadcast.done = True
+                broadcast.condition.notify_all()
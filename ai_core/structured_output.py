@@ -0,0 +1,300 @@
+"""
+Shared parsing of JSON answers from the model.
+
+Responses often wrap the JSON in prose or code fences, or get cut off mid-way.
+Instead of failing the whole request, the first JSON value is located (also
+incrementally while streaming), truncated output is repaired by dropping the
+incomplete trailing item, each item is validated against a per-feature schema,
+and only the missing or invalid items are asked for again.
+"""
+import re
+import json
+from .llm_cache import stream_from_template, forget_template_response, remember_template_response
+from .instrumentation import span, count
+
+_DECODER = json.JSONDecoder()
+_OPENERS = {"{": "}", "[": "]"}
+
+def _json_starts(text):
+    """Yields the index of every '{' or '[' in text, in order."""
+    for i, char in enumerate(text):
+        if char in _OPENERS:
+            yield i
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][+-]?\d*)?")
+_LITERALS = {"true": True, "false": False, "null": None}
+# Returned for a value that was cut off before any usable part of it arrived.
+_CUT = object()
+
+def _skip_space(text, i):
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return i
+
+def _parse_truncated(text, i):
+    """
+    Parses the JSON value at text[i] that may be cut off by the end of text.
+    Returns (value, complete, end). An incomplete array keeps its complete items
+    and drops the cut-off one; an incomplete object keeps its complete members and
+    a cut-off container value. A cut-off string or literal is _CUT. Raises
+    ValueError for text that is invalid rather than truncated.
+    """
+    i = _skip_space(text, i)
+    if i == len(text):
+        return _CUT, False, i
+    char = text[i]
+    if char == "[":
+        items, i = [], _skip_space(text, i + 1)
+        if text.startswith("]", i):
+            return items, True, i + 1
+        while True:
+            value, complete, i = _parse_truncated(text, i)
+            if not complete:
+                return items, False, i
+            items.append(value)
+            i = _skip_space(text, i)
+            if i == len(text):
+                return items, False, i
+            if text[i] == "]":
+                return items, True, i + 1
+            if text[i] != ",":
+                raise ValueError(f"expected ',' or ']' at {i}")
+            i += 1
+    if char == "{":
+        members, i = {}, _skip_space(text, i + 1)
+        if text.startswith("}", i):
+            return members, True, i + 1
+        while True:
+            i = _skip_space(text, i)
+            if i < len(text) and text[i] != '"':
+                raise ValueError(f"expected a key at {i}")
+            key, complete, i = _parse_truncated(text, i)
+            i = _skip_space(text, i)
+            if not complete or i == len(text):
+                return members, False, i
+            if text[i] != ":":
+                raise ValueError(f"expected ':' at {i}")
+            value, complete, i = _parse_truncated(text, i + 1)
+            if value is not _CUT and (complete or isinstance(value, (list, dict))):
+                members[key] = value
+            if not complete:
+                return members, False, i
+            i = _skip_space(text, i)
+            if i == len(text):
+                return members, False, i
+            if text[i] == "}":
+                return members, True, i + 1
+            if text[i] != ",":
+                raise ValueError(f"expected ',' or '}}' at {i}")
+            i += 1
+    if char == '"':
+        j, escaped = i + 1, False
+        while j < len(text):
+            if escaped:
+                escaped = False
+            elif text[j] == "\\":
+                escaped = True
+            elif text[j] == '"':
+                return json.loads(text[i:j + 1]), True, j + 1
+            j += 1
+        return _CUT, False, j
+    for literal, value in _LITERALS.items():
+        if text.startswith(literal, i):
+            return value, True, i + len(literal)
+        if literal.startswith(text[i:]):
+            return _CUT, False, len(text)
+    match = _NUMBER_RE.match(text, i)
+    if match:
+        try:
+            return json.loads(match.group()), True, match.end()
+        except ValueError:
+            # "2." or "1e" is a number cut off mid-way.
+            if match.end() == len(text):
+                return _CUT, False, match.end()
+    raise ValueError(f"unexpected {char!r} at {i}")
+
+def repair_truncated_json(text, start=0):
+    """
+    Repairs JSON that starts at text[start] and was cut off: drops the incomplete
+    trailing item of each open array (e.g. a question missing its options), keeps
+    complete scalars, and closes any open arrays/objects. Returns the parsed
+    value, or raises ValueError.
+    """
+    value, _, _ = _parse_truncated(text, start)
+    if not isinstance(value, (list, dict)):
+        raise ValueError("response JSON is truncated before it starts")
+    return value
+
+def parse_json_response(text):
+    """
+    Parses the first JSON value in a model response. A value that starts but is
+    cut off is repaired, rather than skipped in favour of a nested value inside it.
+    """
+    for start in _json_starts(text):
+        try:
+            return _DECODER.raw_decode(text, start)[0]
+        except ValueError:
+            pass
+        try:
+            value = repair_truncated_json(text, start)
+            count("json_repairs")
+            return value
+        except ValueError:
+            continue
+    raise ValueError("no JSON value found in response")
+
+class IncrementalJSONParser:
+    """
+    Consumes a streamed response and reports as soon as the first complete JSON
+    object or array has arrived, so the rest of the stream can be skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.value = None
+        self.done = False
+        self._start = None
+        self._scan = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """Adds a chunk; returns True once a complete JSON value is available in .value."""
+        self.text += chunk
+        i = self._scan
+        while not self.done and i < len(self.text):
+            char = self.text[i]
+            if self._start is None:
+                if char in _OPENERS:
+                    self._start, self._depth, self._in_string, self._escaped = i, 1, False, False
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in _OPENERS:
+                self._depth += 1
+            elif char in ("}", "]"):
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.value = json.loads(self.text[self._start:i + 1])
+                        self.done = True
+                    except ValueError:
+                        # Bracketed prose such as "[note]": resume scanning after it started.
+                        i = self._start
+                        self._start = None
+            i += 1
+        self._scan = i
+        return self.done
+
+def validate_concept_list(value):
+    """Returns (concepts, problems) for a concept-list answer: a JSON list of non-empty strings."""
+    if isinstance(value, dict):
+        value = value.get("concepts")
+    if not isinstance(value, list):
+        return [], ["expected a JSON list of concepts"]
+    concepts, problems, seen = [], [], set()
+    for item in value:
+        if not isinstance(item, str) or not item.strip():
+            problems.append(f"not a concept name: {item!r}")
+            continue
+        key = " ".join(item.lower().split())
+        if key not in seen:
+            seen.add(key)
+            concepts.append(item.strip())
+    return concepts, problems
+
+def normalize_question_text(text):
+    """Normalizes question text for duplicate detection."""
+    return " ".join("".join(c for c in text.lower() if c.isalnum() or c.isspace()).split())
+
+def is_valid_quiz_question(question):
+    """Checks that a question has text, 4 distinct options and a correct answer among them."""
+    if not isinstance(question, dict):
+        return False
+    text, options, answer = question.get("question_text"), question.get("options"), question.get("correct_answer")
+    if not isinstance(text, str) or not text.strip():
+        return False
+    if not isinstance(options, list) or len(options) != 4 or not all(isinstance(o, str) and o.strip() for o in options):
+        return False
+    if len(set(options)) != 4:
+        return False
+    return isinstance(answer, str) and answer in options
+
+def validate_quiz_questions(value):
+    """Returns (questions, problems) for a quiz answer of the form {"questions": [...]}."""
+    if isinstance(value, dict):
+        value = value.get("questions")
+    if not isinstance(value, list):
+        return [], ['expected a "questions" list']
+    questions, problems, seen = [], [], set()
+    for item in value:
+        if not is_valid_quiz_question(item):
+            problems.append(f"invalid question: {str(item)[:80]}")
+            continue
+        key = normalize_question_text(item["question_text"])
+        if key in seen:
+            problems.append(f"duplicate question: {item['question_text'][:80]}")
+            continue
+        seen.add(key)
+        questions.append({k: item[k] for k in ("question_text", "options", "correct_answer")})
+    return questions, problems
+
+def _ask(template, validate, use_cache, fields):
+    """Streams one answer, stops reading once its JSON is complete, and validates it."""
+    parser = IncrementalJSONParser()
+    chunks = stream_from_template(template, use_cache=use_cache, **fields)
+    try:
+        for chunk in chunks:
+            if parser.feed(chunk):
+                break
+    finally:
+        chunks.close()
+
+    try:
+        with span("structured_output.parse", response_chars=len(parser.text)):
+            value = parser.value if parser.done else parse_json_response(parser.text)
+        items, problems = validate(value)
+    except ValueError as e:
+        items, problems = [], [str(e)]
+
+    if use_cache:
+        if items:
+            # The stream was cut short once the JSON was complete, so cache what was read.
+            remember_template_response(template, parser.text, **fields)
+        else:
+            forget_template_response(template, **fields)
+    return items, problems
+
+def generate_validated(template, validate, expected=None, topup_template=None, key=None, max_topups=1,
+                       use_cache=True, **fields):
+    """
+    Asks the model for a JSON answer and returns (items, problems) with only the
+    items that pass `validate`. When fewer than `expected` valid items come back
+    (or none, if expected is None), `topup_template` is sent with {count} and
+    {existing} filled in so the model only produces the missing items.
+    """
+    items, problems = _ask(template, validate, use_cache, fields)
+    key = key or (lambda item: json.dumps(item, sort_keys=True))
+    for _ in range(max_topups):
+        needed = (expected - len(items)) if expected else (0 if items else 1)
+        if needed <= 0 or topup_template is None:
+            break
+        count("structured_topups")
+        existing = json.dumps(items, ensure_ascii=False)
+        more, more_problems = _ask(topup_template, validate, use_cache, {**fields, "count": needed, "existing": existing})
+        problems.extend(more_problems)
+        seen = {key(item) for item in items}
+        for item in more:
+            if key(item) not in seen:
+                seen.add(key(item))
+                items.append(item)
+    if expected:
+        items = items[:expected]
+    return items, problems
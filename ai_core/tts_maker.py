@@ -1,29 +1,108 @@
 import os
-from gtts import gTTS
-import pyttsx3
-from .utils import ensure_dir
+import re
+import wave
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .utils import ensure_dir, atomic_path
+from .instrumentation import instrument, count, in_current_context
+
+SEGMENT_CACHE_DIR = os.path.join("output", "cache", "tts")
+TTS_WORKERS = 4
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def split_sentences(text):
+    """Splits a script into sentences on terminal punctuation."""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
 
 def make_tts_gtts(text, out_path, lang="en"):
     # Try gTTS first (requires internet)
+    from gtts import gTTS
     tts = gTTS(text=text, lang=lang, slow=False)
     tts.save(out_path)
     return out_path
 
 def make_tts_pyttsx3(text, out_path):
-    # Offline fallback (may sound robotic)
-    engine = pyttsx3.init()
-    # save to file (pyttsx3 supports saving as wav via driver on many setups)
-    engine.save_to_file(text, out_path)
-    engine.runAndWait()
+    # Offline fallback (may sound robotic). The engine is created once and shared;
+    # it isn't thread-safe, so calls are serialized.
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            import pyttsx3
+            _engine = pyttsx3.init()
+        # save to file (pyttsx3 supports saving as wav via driver on many setups)
+        _engine.save_to_file(text, out_path)
+        _engine.runAndWait()
+    return out_path
+
+def _segment_path(sentence, voice):
+    digest = hashlib.sha256(f"{voice}\0{sentence}".encode("utf-8")).hexdigest()
+    ext = ".wav" if voice == "pyttsx3" else ".mp3"
+    return os.path.join(SEGMENT_CACHE_DIR, digest + ext)
+
+def synthesize_sentence(sentence, voice="gtts:en"):
+    """
+    Returns the path of the audio for one sentence, synthesizing it only if it
+    isn't cached yet. `voice` is "gtts:<lang>" or "pyttsx3".
+    """
+    path = _segment_path(sentence, voice)
+    if os.path.exists(path):
+        count("cache_hits")
+        return path
+    count("cache_misses")
+    ensure_dir(SEGMENT_CACHE_DIR)
+    # The synthesizers pick the audio format from the extension, so it stays last.
+    with atomic_path(path, keep_extension=True) as tmp_path:
+        if voice == "pyttsx3":
+            make_tts_pyttsx3(sentence, tmp_path)
+        else:
+            make_tts_gtts(sentence, tmp_path, lang=voice.split(":", 1)[1])
+    return path
+
+def synthesize_sentences(sentences, voice="gtts:en", workers=TTS_WORKERS):
+    """Synthesizes sentences concurrently and returns their segment paths in order."""
+    if voice == "pyttsx3":
+        workers = 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(in_current_context(synthesize_sentence), sentence, voice) for sentence in sentences]
+        return [future.result() for future in futures]
+
+def concat_mp3(segment_paths, out_path):
+    """Concatenates MP3 segments by streaming their frames into one file."""
+    with open(out_path, "wb") as out:
+        for path in segment_paths:
+            with open(path, "rb") as segment:
+                shutil.copyfileobj(segment, out)
+    return out_path
+
+def concat_wav(segment_paths, out_path, frames_per_read=65536):
+    """Concatenates WAV segments with matching formats, copying frames in blocks."""
+    with wave.open(out_path, "wb") as out:
+        for i, path in enumerate(segment_paths):
+            with wave.open(path, "rb") as segment:
+                if i == 0:
+                    out.setparams(segment.getparams())
+                while True:
+                    frames = segment.readframes(frames_per_read)
+                    if not frames:
+                        break
+                    out.writeframes(frames)
     return out_path
 
-def make_tts(text, out_path):
+@instrument()
+def make_tts(text, out_path, lang="en"):
     ensure_dir(os.path.dirname(out_path) or ".")
+    # Sentences are cached individually, so editing one sentence only re-synthesizes that one.
+    sentences = split_sentences(text) or [text]
     try:
-        return make_tts_gtts(text, out_path)
+        return concat_mp3(synthesize_sentences(sentences, f"gtts:{lang}"), out_path)
     except Exception as e:
         print("gTTS failed, falling back to pyttsx3:", e)
         # ensure wav extension for pyttsx3
         if not out_path.lower().endswith(".wav"):
             out_path = os.path.splitext(out_path)[0] + ".wav"
-        return make_tts_pyttsx3(text, out_path)
+        return concat_wav(synthesize_sentences(sentences, "pyttsx3"), out_path)
@@ -1,5 +1,43 @@
 import os
+import threading
+from contextlib import contextmanager
 
 def ensure_dir(path):
     """Ensures that a directory exists, creating it if necessary."""
-    os.makedirs(path, exist_ok=True)
\ No newline at end of file
+    os.makedirs(path, exist_ok=True)
+
+def temp_path(path, keep_extension=False):
+    """
+    Returns a temporary path next to `path`, unique per process and thread.
+    By default it ends in ".tmp", so directory scans for the real extension skip
+    it; keep_extension puts the extension last for writers that go by it.
+    """
+    tag = f"{os.getpid()}.{threading.get_ident()}.tmp"
+    if keep_extension:
+        root, extension = os.path.splitext(path)
+        return f"{root}.{tag}{extension}"
+    return f"{path}.{tag}"
+
+@contextmanager
+def atomic_path(path, keep_extension=False):
+    """
+    Yields a temporary path to write a file's new contents to, then moves it over
+    `path` with os.replace, so readers never see a partly written file. The
+    temporary file is removed if writing fails.
+    """
+    tmp_path = temp_path(path, keep_extension)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_atomic(path, text):
+    """Writes text to path atomically (see atomic_path)."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
@@ -1,22 +1,14 @@
-import os
-import requests
-import time
-import json
-from dotenv import load_dotenv
+from .render_jobs import get_render_queue, DONE
+from .local_renderer import render_video_locally
+from .settings import get_settings
+from .instrumentation import instrument
 
-load_dotenv()
-SHOTSTACK_KEY = os.getenv("SHOTSTACK_API_KEY")
-SHOTSTACK_STAGE = os.getenv("SHOTSTACK_STAGE", "stage") # Default to stage
-
-def make_video_from_script(script_text):
-    """Creates an animated video using the Shotstack API and returns the video URL."""
-    if not SHOTSTACK_KEY:
-        print("SHOTSTACK_API_KEY not found.")
-        return None
+VIDEO_BACKEND = get_settings().video_backend
 
+def build_shotstack_edit(script_text):
+    """Builds the Shotstack edit for a script, or returns None if it has no sentences."""
     scenes = [s.strip() for s in script_text.split('.') if s.strip()]
     if not scenes:
-        print("Script is empty or could not be split into sentences.")
         return None
 
     timeline_clips = []
@@ -36,7 +28,7 @@ def make_video_from_script(script_text):
         timeline_clips.extend([video_clip, title_clip])
         start_time += duration
 
-    edit = {
+    return {
         "timeline": {
             "background": "#000000",
             "tracks": [{"clips": timeline_clips}],
@@ -45,40 +37,43 @@ def make_video_from_script(script_text):
         "output": {"format": "mp4", "resolution": "sd"}
     }
 
-    render_url = f"https://api.shotstack.io/{SHOTSTACK_STAGE}/render"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": SHOTSTACK_KEY
-    }
+@instrument()
+def submit_video_from_script(script_text):
+    """Submits a Shotstack render for a script and returns the render job ID without waiting."""
+    queue = get_render_queue()
+    if not queue.providers["shotstack"].is_configured():
+        print("SHOTSTACK_API_KEY not found.")
+        return None
+
+    edit = build_shotstack_edit(script_text)
+    if edit is None:
+        print("Script is empty or could not be split into sentences.")
+        return None
 
-    # Step 1: Submit the job with a POST request
     try:
-        response = requests.post(render_url, data=json.dumps(edit))
-        response.raise_for_status()
-        render_id = response.json()["response"]["id"]
-        print(f"Successfully submitted job. Render ID: {render_id}")
+        job_id = queue.submit("shotstack", edit)
+        print(f"Successfully submitted job. Render job ID: {job_id}")
+        return job_id
     except Exception as e:
         print(f"Failed to submit render job to Shotstack: {e}")
         return None
 
-    # Step 2: Check the status with a GET request to the correct URL, including the render_id
-    status_url = f"{render_url}/{render_id}"
-    while True:
-        try:
-            time.sleep(10)
-            status_response = requests.get(status_url, headers=headers)
-            status_response.raise_for_status()
-            status = status_response.json()["response"]["status"]
-            
-            print(f"Current render status: {status}...")
+@instrument()
+def make_video_from_script(script_text, timeout=None, backend=None):
+    """
+    Creates an animated video from a script. The "local" backend renders it with
+    ffmpeg and returns a file path; the "shotstack" backend returns the video URL.
+    """
+    if (backend or VIDEO_BACKEND) == "local":
+        return render_video_locally(script_text)
+
+    job_id = submit_video_from_script(script_text)
+    if job_id is None:
+        return None
 
-            if status == "done":
-                video_url = status_response.json()["response"]["url"]
-                print(f"Video created successfully! URL: {video_url}")
-                return video_url
-            elif status == "failed":
-                print(f"Shotstack render failed. Reason: {status_response.json()['response'].get('error')}")
-                return None
-        except Exception as e:
-            print(f"Failed while checking render status: {e}")
-            return None
\ No newline at end of file
+    job = get_render_queue().wait(job_id, timeout=timeout)
+    if job["status"] == DONE:
+        print(f"Video created successfully! URL: {job['result_url']}")
+        return job["result_url"]
+    print(f"Shotstack render did not complete ({job['status']}). Reason: {job['error']}")
+    return None
@@ -1,17 +1,24 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import re
-from dotenv import load_dotenv
 from streamlit_mermaid import st_mermaid
 
 # --- Local Imports ---
-from ai_core.extractor import extract_text_from_pdf
-from ai_core.generator import extract_key_concepts, generate_detailed_explanation_with_diagrams, generate_practical_scenario, evaluate_user_answer
-from ai_core.quiz_generator import generate_quiz_questions
+from ai_core.pdf_cache import get_pdf_cache
+from ai_core.llm_client import get_client
+from ai_core.generator import stream_detailed_explanation_with_diagrams, generate_practical_scenario
+from ai_core.answer_grader import grade_answer
+from ai_core.question_bank import get_question_bank
+from ai_core.prefetch import LessonPrefetcher
+from ai_core.artifact_store import ArtifactStore
+from ai_core.incremental import analyze_document, get_analysis_store
+from ai_core.library import get_library
+from ai_core.simulation_generator import generate_simulation_code
+from ai_core.simulation_store import get_simulation_store, simulation_key, SIMULATION_PUBLIC_URL
+from ai_core.mermaid_stream import MermaidStreamParser
 from ai_core.utils import ensure_dir
-
-# --- Load Environment Variables ---
-load_dotenv()
+from ai_core import instrumentation
 
 # --- Page Configuration ---
 st.set_page_config(page_title="AI Interactive Learning", layout="wide")
@@ -21,65 +28,251 @@ st.title("🧠 AI Interactive Learning Assistant")
 OUTPUT_DIR = "output"
 ensure_dir(OUTPUT_DIR)
 
-# Initialize session state
-if 'concepts' not in st.session_state: st.session_state.concepts = []
+@st.cache_resource
+def get_artifact_store():
+    """Chapter text, concepts and lessons shared by every session viewing the same document."""
+    return ArtifactStore()
+
+store = get_artifact_store()
+
+@st.cache_resource
+def start_simulation_server():
+    """Starts the simulation server once per process. Returns an error message if it can't bind."""
+    try:
+        get_simulation_store().serve()
+    except OSError as e:
+        return f"Could not start the simulation server: {e}"
+    return None
+
+# Initialize session state. Only small keys and per-student progress live here;
+# document-sized artifacts are looked up in the shared store by doc_id.
+if 'doc_id' not in st.session_state: st.session_state.doc_id = None
+if 'doc_lease' not in st.session_state: st.session_state.doc_lease = None
 if 'selected_concept' not in st.session_state: st.session_state.selected_concept = None
-if 'explanation' not in st.session_state: st.session_state.explanation = ""
+if 'explanation_failed' not in st.session_state: st.session_state.explanation_failed = False
 if 'scenario' not in st.session_state: st.session_state.scenario = None
+if 'simulation_concept' not in st.session_state: st.session_state.simulation_concept = None
 if 'feedback' not in st.session_state: st.session_state.feedback = None
 
+def doc_artifact(name, default=None):
+    """Returns an artifact of the current session's document from the shared store."""
+    if st.session_state.doc_id is None:
+        return default
+    return store.get(st.session_state.doc_id, name, default)
+
+def open_document(pdf_entry, name):
+    """Points this session at a document, releasing its hold on the previous one."""
+    lease = store.acquire(pdf_entry["sha256"])
+    if st.session_state.doc_lease is not None:
+        st.session_state.doc_lease.release()
+    st.session_state.doc_id, st.session_state.doc_lease = lease.doc_id, lease
+    store.setdefault(lease.doc_id, "name", lambda: name)
+    store.setdefault(lease.doc_id, "full_text", lambda: pdf_entry["text"])
+    store.setdefault(lease.doc_id, "explanations", dict)
+
+def open_library_concept(doc_id, concept=None):
+    """Opens a chapter from the library at a concept, without re-uploading or re-analyzing it."""
+    entry = get_library().document(doc_id)
+    if entry is None or not entry["concepts"]:
+        return
+    open_document(entry, entry["name"])
+    concepts = store.setdefault(doc_id, "concepts", lambda: entry["concepts"])
+    concept = concept if concept in concepts else concepts[0]
+    st.session_state.selected_concept, st.session_state.explanation_failed = concept, False
+    st.session_state.scenario, st.session_state.feedback = None, None
+    # Runs as a button callback, i.e. before the topic radio is drawn, so it can be moved here.
+    st.session_state.concept_radio = concept
+    prefetcher = doc_artifact("prefetcher")
+    if prefetcher is None:
+        explanations = doc_artifact("explanations")
+        prefetcher = store.setdefault(doc_id, "prefetcher", LessonPrefetcher)
+        prefetcher.start(entry["text"], [c for c in concepts if c not in explanations], selected=concept)
+    else:
+        prefetcher.prioritize(concept)
+
 # --- Sidebar ---
 with st.sidebar:
     st.header("1. Get Started")
     pdf_file = st.file_uploader("Upload Chapter PDF", type="pdf")
 
     if pdf_file and st.button("Analyze Chapter"):
-        st.session_state.concepts, st.session_state.selected_concept, st.session_state.explanation = [], None, ""
+        st.session_state.selected_concept, st.session_state.explanation_failed = None, False
         st.session_state.scenario, st.session_state.feedback = None, None
         
         with st.spinner("Reading PDF and finding key concepts..."):
             file_path = os.path.join(OUTPUT_DIR, pdf_file.name)
-            with open(file_path, "wb") as f: f.write(pdf_file.getbuffer())
-            st.session_state.full_text = extract_text_from_pdf(file_path)
-            if st.session_state.full_text:
-                st.session_state.concepts = extract_key_concepts(st.session_state.full_text)
-                st.success("Analysis complete! Please choose a concept.")
+            # Repeat uploads of the same chapter are served from the hash-keyed cache.
+            pdf_entry = get_pdf_cache().load_or_extract(pdf_file.getvalue(), file_path)
+            if pdf_entry and pdf_entry["text"]:
+                # Uploading a new version of the chapter this student has open (same file name)
+                # is treated as a revision of it, so only its changed pages are re-analyzed.
+                previous, previous_explanations = None, {}
+                if st.session_state.doc_id not in (None, pdf_entry["sha256"]):
+                    open_analysis = get_analysis_store().load(st.session_state.doc_id)
+                    if open_analysis and open_analysis.get("name") == pdf_file.name:
+                        previous = open_analysis
+                        # Read before open_document() may release the last hold on the old version.
+                        previous_explanations = dict(doc_artifact("explanations", {}))
+                open_document(pdf_entry, pdf_file.name)
+                if doc_artifact("concepts") is None and not get_client().is_configured():
+                    st.error("Error: GEMINI_API_KEY not found.")
+                elif doc_artifact("concepts") is None:
+                    try:
+                        analysis, report = analyze_document(st.session_state.doc_id, pdf_file.name, pdf_entry["pages"], previous)
+                        concepts = analysis["concepts"]
+                    except Exception as e:
+                        st.error(f"Error extracting concepts: {e}")
+                        concepts, report = None, None
+                    if report and report["errors"]:
+                        st.warning(f"Part of the chapter could not be analyzed ({report['errors'][0]}); upload it again to retry.")
+                    if concepts:
+                        store.put(st.session_state.doc_id, "concepts", concepts)
+                        # Keep lessons whose source pages didn't change; only the rest are regenerated.
+                        explanations = doc_artifact("explanations")
+                        for concept in concepts:
+                            if concept in previous_explanations and concept not in report["stale_concepts"]:
+                                explanations.setdefault(concept, previous_explanations[concept])
+                        if previous and report["reused_windows"]:
+                            st.info(f"Revised chapter: {len(report['changed_pages'])} page(s) changed, "
+                                    f"{len(report['stale_concepts'])} concept(s) need new lessons.")
+                        # Start generating every missing lesson now so topic switches are instant.
+                        prefetcher = store.setdefault(st.session_state.doc_id, "prefetcher", LessonPrefetcher)
+                        prefetcher.start(pdf_entry["text"], [c for c in concepts if c not in explanations])
+                    elif report is not None:
+                        st.error("Could not find any concepts in the PDF.")
+                if doc_artifact("concepts"):
+                    st.success("Analysis complete! Please choose a concept.")
             else:
                 st.error("Could not extract text from the PDF.")
 
-    if st.session_state.concepts and not st.session_state.concepts[0].lower().startswith("error"):
+    library = get_library()
+    # Uploads stay private to the student until they choose to share them with everyone.
+    if doc_artifact("concepts") and not library.has_document(st.session_state.doc_id):
+        if st.button("Add chapter to the shared library"):
+            library.add_document(st.session_state.doc_id, doc_artifact("name"), doc_artifact("full_text"),
+                                 doc_artifact("concepts"))
+            st.success("Chapter added to the library.")
+    library_documents = library.documents()
+    if library_documents:
+        st.header("📚 Library")
+        query = st.text_input("Search all chapters:", key="library_query")
+        if query:
+            concept_hits = library.search_concepts(query, limit=8)
+            for i, hit in enumerate(concept_hits):
+                st.button(f"{hit['concept']} · {hit['document']}", key=f"library_concept_{i}",
+                          on_click=open_library_concept, args=(hit["doc_id"], hit["concept"]))
+            passage_hits = library.search_passages(query, limit=3)
+            for i, hit in enumerate(passage_hits):
+                st.caption(f"{hit['document']}: {hit['snippet']}")
+                st.button("Open chapter", key=f"library_passage_{i}", on_click=open_library_concept, args=(hit["doc_id"],))
+            if not concept_hits and not passage_hits:
+                st.caption("No matches in the library.")
+        else:
+            chapter = st.selectbox("Chapters:", library_documents, format_func=lambda doc: f"{doc['name']} ({doc['doc_id'][:8]})", key="library_chapter")
+            st.button("Open chapter", key="library_open", on_click=open_library_concept, args=(chapter["doc_id"],))
+
+    concepts = doc_artifact("concepts")
+    if concepts:
         st.header("2. Choose a Concept")
-        selected = st.radio("Topics:", st.session_state.concepts, key="concept_radio")
+        selected = st.radio("Topics:", concepts, key="concept_radio")
         if selected != st.session_state.selected_concept:
-            st.session_state.selected_concept, st.session_state.explanation = selected, ""
+            st.session_state.selected_concept, st.session_state.explanation_failed = selected, False
             st.session_state.scenario, st.session_state.feedback = None, None
+            prefetcher = doc_artifact("prefetcher")
+            if prefetcher is not None:
+                prefetcher.prioritize(selected)
             st.rerun()
 
+def stream_explanation(chunks):
+    """Renders explanation chunks as they arrive, drawing each Mermaid block once it closes."""
+    parser = MermaidStreamParser()
+    received, placeholder, markdown_text, diagram_count = [], None, "", 0
+
+    def render(segments):
+        nonlocal placeholder, markdown_text, diagram_count
+        for kind, text in segments:
+            if kind == "mermaid":
+                st_mermaid(text, height="400px", key=f"mermaid_stream_{diagram_count}")
+                diagram_count += 1
+                placeholder, markdown_text = None, ""
+            else:
+                if placeholder is None:
+                    placeholder = st.empty()
+                markdown_text += text
+                placeholder.markdown(markdown_text, unsafe_allow_html=True)
+
+    for chunk in chunks:
+        received.append(chunk)
+        render(parser.feed(chunk))
+    render(parser.close())
+    return "".join(received)
+
 # --- Main Content Area ---
-if not st.session_state.selected_concept:
+if not st.session_state.selected_concept or doc_artifact("full_text") is None:
     st.info("Upload a PDF and click 'Analyze Chapter' to begin.")
 else:
     st.header(f"📖 Learning: {st.session_state.selected_concept}")
 
-    if not st.session_state.explanation:
-        with st.spinner("Generating your detailed lesson with visuals..."):
-            explanation_data = generate_detailed_explanation_with_diagrams(st.session_state.full_text, st.session_state.selected_concept)
-            if "error" in explanation_data.lower():
-                st.error(explanation_data)
-                st.session_state.explanation = "Failed"
-            else:
-                st.session_state.explanation = explanation_data
-
-    if st.session_state.explanation and st.session_state.explanation != "Failed":
-        # Use regex to find and render mermaid diagrams inline
-        parts = re.split(r"(```mermaid.*?```)", st.session_state.explanation, flags=re.DOTALL)
-        for i, part in enumerate(parts):
-            if part.strip():
-                if part.startswith("```mermaid"):
-                    mermaid_code = part.replace("```mermaid", "").replace("```", "").strip()
-                    st_mermaid(mermaid_code, height="400px", key=f"mermaid_{i}")
+    explanations = doc_artifact("explanations", {})
+    explanation = explanations.get(st.session_state.selected_concept)
+    if explanation is None and not st.session_state.explanation_failed:
+        concept, prefetcher = st.session_state.selected_concept, doc_artifact("prefetcher")
+        explanation_data, streamed = None, False
+        if prefetcher is not None and prefetcher.is_ready(concept):
+            explanation_data = prefetcher.get(concept)
+        if explanation_data is None:
+            # A lesson the prefetcher is already generating shares its model stream, so this
+            # subscribes to it (replaying what has arrived) instead of waiting for it to finish.
+            if prefetcher is not None:
+                prefetcher.claim(concept)
+            explanation_data = stream_explanation(stream_detailed_explanation_with_diagrams(doc_artifact("full_text"), concept))
+            if prefetcher is not None:
+                prefetcher.store(concept, explanation_data)
+            streamed = True
+        if "error" in explanation_data.lower():
+            st.error(explanation_data)
+            st.session_state.explanation_failed = True
+        else:
+            explanations[concept] = explanation = explanation_data
+            if streamed:
+                st.rerun()
+
+    if explanation:
+        with instrumentation.span("app.render_explanation", chars=len(explanation)):
+            # Use regex to find and render mermaid diagrams inline
+            parts = re.split(r"(```mermaid.*?```)", explanation, flags=re.DOTALL)
+            for i, part in enumerate(parts):
+                if part.strip():
+                    if part.startswith("```mermaid"):
+                        mermaid_code = part.replace("```mermaid", "").replace("```", "").strip()
+                        st_mermaid(mermaid_code, height="400px", key=f"mermaid_{i}")
+                    else:
+                        st.markdown(part, unsafe_allow_html=True)
+        st.markdown("---")
+
+        # --- SIMULATION SECTION ---
+        st.subheader("🧪 Explore It Interactively!")
+        if st.button("Build a Simulation"):
+            with st.spinner("AI is building an interactive simulation..."):
+                simulation_page = generate_simulation_code(st.session_state.selected_concept, explanation)
+                if simulation_page.startswith("Error"):
+                    st.error(simulation_page)
                 else:
-                    st.markdown(part, unsafe_allow_html=True)
+                    st.session_state.simulation_concept = st.session_state.selected_concept
+        if st.session_state.simulation_concept == st.session_state.selected_concept:
+            simulation_store = get_simulation_store()
+            key = simulation_key(st.session_state.selected_concept, explanation)
+            # With a public URL configured, pages come from the simulation server (CSP sandbox header, ETags);
+            # otherwise they are inlined into Streamlit's own sandboxed iframe, restricted by their CSP <meta> tag.
+            server_error = start_simulation_server() if SIMULATION_PUBLIC_URL else None
+            if SIMULATION_PUBLIC_URL and server_error is None:
+                components.iframe(simulation_store.url(key), height=520, scrolling=True)
+            else:
+                if server_error:
+                    st.error(server_error)
+                simulation_page = simulation_store.get(st.session_state.selected_concept, explanation)
+                if simulation_page:
+                    components.html(simulation_page, height=520, scrolling=True)
         st.markdown("---")
 
         # --- INTERACTIVE SCENARIO SECTION ---
@@ -87,7 +280,7 @@ else:
         if st.button("Generate a Practical Scenario"):
             with st.spinner("AI is creating a scenario for you..."):
                 st.session_state.feedback = None
-                scenario_text = generate_practical_scenario(st.session_state.selected_concept, st.session_state.explanation)
+                scenario_text = generate_practical_scenario(st.session_state.selected_concept, explanation)
                 if "error" in scenario_text.lower():
                     st.error(scenario_text)
                 else:
@@ -100,8 +293,9 @@ else:
                 submitted = st.form_submit_button("Submit Solution")
                 if submitted:
                     with st.spinner("AI is evaluating your answer..."):
-                        feedback = evaluate_user_answer(st.session_state.scenario, user_solution, st.session_state.explanation)
-                        st.session_state.feedback = feedback
+                        # Empty, off-topic and repeated answers are graded instantly without the model.
+                        grade = grade_answer(st.session_state.scenario, user_solution, explanation)
+                        st.session_state.feedback = grade["feedback"]
         
         if st.session_state.feedback:
             st.markdown(st.session_state.feedback)
@@ -109,9 +303,11 @@ else:
         
         # --- QUIZ SECTION ---
         st.subheader("✍️ Test Your Knowledge!")
+        # Build the question bank while the student reads, so the quiz starts instantly.
+        get_question_bank().warm(explanation)
         if st.button("Start Quiz"):
             with st.spinner("AI is generating your quiz questions..."):
-                quiz_data = generate_quiz_questions(st.session_state.explanation)
+                quiz_data = get_question_bank().draw_quiz(explanation)
                 if "error" in quiz_data:
                     st.error(quiz_data["error"])
                 else:
@@ -139,4 +335,14 @@ else:
             else:
                 st.success(f"Quiz Complete! Your final score: {st.session_state.score} / {len(st.session_state.quiz_questions)}")
                 st.balloons()
-                del st.session_state.quiz_questions
\ No newline at end of file
+                del st.session_state.quiz_questions
+
+# --- Debug Panel (only when LEARNVERSE_TRACE includes "ring") ---
+trace_buffer = instrumentation.get_sink(instrumentation.RingBufferSink)
+if trace_buffer is not None:
+    with st.sidebar.expander("🛠️ Debug: pipeline timings"):
+        recent_spans = trace_buffer.spans()[-50:][::-1]
+        if recent_spans:
+            st.dataframe(recent_spans, use_container_width=True)
+        else:
+            st.caption("No spans recorded yet.")
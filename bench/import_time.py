@@ -0,0 +1,100 @@
+"""
+Import-time budget check for ai_core.
+
+Imports modules in a fresh interpreter under `python -X importtime` and reports
+what each ai_core module costs at startup, plus the heaviest third-party
+imports it pulls in, so a new eager SDK import shows up before it slows every
+Streamlit worker. Exits non-zero when the total is over budget.
+
+    python -m bench.import_time
+    python -m bench.import_time ai_core.library --budget-ms 150
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# Not taken from bench.run, which would import all of ai_core into this process.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What app.py imports from ai_core, i.e. the cost of starting a worker.
+APP_MODULES = [
+    "ai_core.pdf_cache", "ai_core.generator", "ai_core.answer_grader", "ai_core.question_bank",
+    "ai_core.prefetch", "ai_core.artifact_store", "ai_core.incremental", "ai_core.library",
+    "ai_core.simulation_generator", "ai_core.simulation_store", "ai_core.mermaid_stream", "ai_core.utils",
+    "ai_core.instrumentation",
+]
+DEFAULT_BUDGET_MS = 150
+MARKER = "--import-budget-start--"
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+def measure(modules):
+    """
+    Imports modules in a new interpreter and returns the -X importtime records
+    made after startup, as [{"name", "self_us", "cumulative_us", "parent"}].
+    """
+    code = f"import sys; sys.stderr.write({MARKER!r} + '\\n'); " + "; ".join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=REPO_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+    lines = result.stderr.split(MARKER, 1)[1].splitlines()
+
+    # Children are printed before their parent, one level deeper; attach them once the parent appears.
+    records, pending = [], {}
+    for line in lines:
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        depth = len(match.group(3)) // 2
+        record = {"name": match.group(4), "self_us": int(match.group(1)), "cumulative_us": int(match.group(2)), "parent": None}
+        for child in pending.pop(depth + 1, []):
+            child["parent"] = record["name"]
+        pending.setdefault(depth, []).append(record)
+        records.append(record)
+    return records
+
+def summarize(records, top=10):
+    """Returns the total startup cost, per-ai_core-module costs and the heaviest external imports."""
+    total_us = sum(r["cumulative_us"] for r in records if r["parent"] is None)
+    modules = sorted(
+        (r for r in records if r["name"].split(".")[0] == "ai_core"), key=lambda r: -r["cumulative_us"]
+    )
+    # Third-party/stdlib imports made directly by an ai_core module (not their own sub-imports).
+    external = sorted(
+        (r for r in records if r["name"].split(".")[0] != "ai_core" and (r["parent"] or "").startswith("ai_core")),
+        key=lambda r: -r["cumulative_us"],
+    )[:top]
+    return {"total_ms": total_us / 1000, "modules": modules, "external": external}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report ai_core import cost and enforce a startup budget.")
+    parser.add_argument("modules", nargs="*", default=APP_MODULES, help="modules to import (default: the app's)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="fail above this total")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the fastest of (the first may compile bytecode)")
+    parser.add_argument("--top", type=int, default=10, help="external imports to list")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    summary = min((summarize(measure(args.modules), args.top) for _ in range(max(1, args.repeat))),
+                  key=lambda s: s["total_ms"])
+
+    print(f"{'module':<32} {'self ms':>8} {'cumul ms':>9}")
+    for record in summary["modules"]:
+        print(f"{record['name']:<32} {record['self_us'] / 1000:>8.1f} {record['cumulative_us'] / 1000:>9.1f}")
+    print(f"\n{'heaviest external imports':<32} {'cumul ms':>9}  imported by")
+    for record in summary["external"]:
+        print(f"{record['name']:<32} {record['cumulative_us'] / 1000:>9.1f}  {record['parent']}")
+    over = summary["total_ms"] > args.budget_ms
+    print(f"\ntotal {summary['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms){'  OVER BUDGET' if over else ''}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": summary}, f, indent=2)
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import json
+import time
+import random
+from ai_core.llm_client import StubBackend
+
+class ReplayBackend(StubBackend):
+    """
+    LLM backend that answers prompts from recorded responses. Each recording has a
+    "match" substring and a "response"; the first recording whose substring occurs
+    in the prompt wins. Every call sleeps for latency seconds (+/- jitter) to
+    simulate the provider.
+    """
+
+    name = "replay"
+
+    def __init__(self, recordings, latency=0.0, jitter=0.0, chunk_size=40):
+        super().__init__(self._respond, latency=0.0, chunk_size=chunk_size)
+        self.recordings = recordings
+        self.base_latency = latency
+        self.jitter = jitter
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def _respond(self, prompt):
+        delay = self.base_latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        for recording in self.recordings:
+            if recording["match"] in prompt:
+                response = recording["response"]
+                return response if isinstance(response, str) else json.dumps(response)
+        raise KeyError(f"No recorded response matches prompt: {prompt[:80]!r}")
@@ -0,0 +1,188 @@
+"""
+Offline benchmark for the ai_core pipeline.
+
+LLM calls are answered by ReplayBackend from bench/recordings.json with an
+artificial latency, and video submissions go to a local fake Shotstack server,
+so the numbers reflect our own code paths plus a simulated provider.
+
+    python -m bench.run --students 10 --iterations 3 --latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_core import llm_cache, render_jobs
+from ai_core.llm_client import LLMClient, set_client
+from ai_core.extractor import extract_text_from_pdf, extract_pages_from_pdf
+from ai_core.generator import generate_detailed_explanation_with_diagrams
+from ai_core.incremental import analyze_chapter
+from ai_core.question_bank import QuestionBank
+from ai_core.answer_grader import FeedbackMemory, grade_answer
+from ai_core.video_maker import make_video_from_script
+from bench.replay import ReplayBackend
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RECORDINGS_PATH = os.path.join(BENCH_DIR, "recordings.json")
+FIXTURE_PDFS = [os.path.join(REPO_DIR, "output", "iesc107.pdf"), os.path.join(REPO_DIR, "output", "jesc109.pdf")]
+SCENARIOS = ["extraction", "concepts", "explanation", "quiz", "evaluation", "video"]
+
+SAMPLE_SCENARIO = "You drop a coin into a bucket of water and look at it from an angle. Why does the coin appear raised?"
+SAMPLE_ANSWER = "Light from the coin bends away from the normal when it leaves the water, so the coin looks higher."
+SAMPLE_SCRIPT = "Light travels in straight lines. When it enters water it slows down. This makes it bend towards the normal."
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process and of its reaped children, in MB."""
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return own, children
+
+class FakeShotstackHandler(BaseHTTPRequestHandler):
+    """Accepts renders and reports them done after a few status checks."""
+
+    polls_until_done = 2
+    renders = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            render_id = f"render-{len(self.renders)}"
+            self.renders[render_id] = 0
+        self._send_json({"response": {"id": render_id}})
+
+    def do_GET(self):
+        render_id = self.path.rsplit("/", 1)[-1]
+        with self.lock:
+            self.renders[render_id] = self.renders.get(render_id, 0) + 1
+            done = self.renders[render_id] >= self.polls_until_done
+        status = {"status": "done", "url": f"http://fake/{render_id}.mp4"} if done else {"status": "rendering"}
+        self._send_json({"response": status})
+
+def start_fake_shotstack():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeShotstackHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def build_operations(pages, bank_dir, warm_cache=False):
+    """
+    Returns the callable exercised by each scenario: the entry points app.py
+    calls, so the windowed analysis, the question bank and the grading tiers
+    are part of what is measured.
+    """
+    full_text = "\n".join(pages)
+    explanation = generate_detailed_explanation_with_diagrams(full_text, "Refraction of Light")
+    bank = QuestionBank(bank_dir=bank_dir)
+    # Like the response cache, earlier feedback is only reused with --warm-cache.
+    memory = FeedbackMemory()
+    return {
+        "extraction": lambda: extract_text_from_pdf(FIXTURE_PDFS[0]),
+        # What analyze_document runs for a chapter that isn't in the analysis store yet.
+        "concepts": lambda: analyze_chapter(pages),
+        "explanation": lambda: generate_detailed_explanation_with_diagrams(full_text, "Refraction of Light"),
+        "quiz": lambda: bank.draw_quiz(explanation),
+        "evaluation": lambda: grade_answer(SAMPLE_SCENARIO, SAMPLE_ANSWER, explanation,
+                                           memory if warm_cache else FeedbackMemory()),
+        "video": lambda: make_video_from_script(SAMPLE_SCRIPT, timeout=30, backend="shotstack"),
+    }
+
+def run_scenario(operation, students, iterations):
+    """Runs an operation from `students` concurrent threads and collects per-call latencies."""
+    latencies, lock = [], threading.Lock()
+
+    def student():
+        for _ in range(iterations):
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=students) as pool:
+        for future in [pool.submit(student) for _ in range(students)]:
+            future.result()
+    wall = time.perf_counter() - started
+    own_rss, child_rss = peak_rss_mb()
+    return {
+        "calls": len(latencies),
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "mean_s": statistics.fmean(latencies) if latencies else 0.0,
+        "throughput_per_s": len(latencies) / wall if wall else 0.0,
+        "peak_rss_mb": own_rss,
+        "peak_child_rss_mb": child_rss,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for ai_core.")
+    parser.add_argument("--students", type=int, default=10, help="concurrent simulated students")
+    parser.add_argument("--iterations", type=int, default=3, help="calls per student per scenario")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated LLM latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="random +/- latency jitter in seconds")
+    parser.add_argument("--warm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    set_client(LLMClient(ReplayBackend.from_file(RECORDINGS_PATH, latency=args.latency, jitter=args.jitter)))
+    # A zero TTL turns every lookup into a miss, so each call pays the simulated latency.
+    llm_cache.set_response_cache(llm_cache.ResponseCache(":memory:", ttl=float("inf") if args.warm_cache else 0))
+
+    server = start_fake_shotstack()
+    provider = render_jobs.ShotstackProvider("bench-key", "stage", f"http://127.0.0.1:{server.server_port}")
+    queue = render_jobs.RenderJobQueue([provider], path=":memory:", initial_interval=0.2, max_interval=1.0)
+    render_jobs.set_render_queue(queue)
+    queue.start()
+
+    bank_dir = tempfile.TemporaryDirectory(prefix="bench_bank_")
+    operations = build_operations(extract_pages_from_pdf(FIXTURE_PDFS[1]), bank_dir.name, args.warm_cache)
+
+    results = {}
+    print(f"{'scenario':<12} {'calls':>6} {'p50 s':>8} {'p95 s':>8} {'ops/s':>8} {'rss MB':>8} {'child MB':>9}")
+    for name in args.scenarios:
+        # PDF parsing is CPU-bound and already parallel; don't multiply it by the student count.
+        students = 1 if name == "extraction" else args.students
+        result = run_scenario(operations[name], students, args.iterations)
+        results[name] = result
+        print(f"{name:<12} {result['calls']:>6} {result['p50_s']:>8.3f} {result['p95_s']:>8.3f} "
+              f"{result['throughput_per_s']:>8.2f} {result['peak_rss_mb']:>8.1f} {result['peak_child_rss_mb']:>9.1f}")
+
+    queue.stop()
+    server.shutdown()
+    bank_dir.cleanup()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main()
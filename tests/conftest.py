@@ -0,0 +1,38 @@
+import pytest
+
+from ai_core import incremental, llm_cache, llm_client
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Runs each test in a scratch directory, since stores default to ./output/..."""
+    monkeypatch.chdir(tmp_path)
+    # Process-wide stores created by an earlier test point at that test's directory.
+    monkeypatch.setattr(incremental, "_store", None)
+    return tmp_path
+
+
+@pytest.fixture
+def response_cache():
+    """An in-memory response cache installed as the process-wide one."""
+    cache = llm_cache.ResponseCache(":memory:")
+    llm_cache.set_response_cache(cache)
+    yield cache
+    llm_cache.set_response_cache(None)
+
+
+@pytest.fixture
+def stub_client(response_cache):
+    """Installs an LLMClient over a StubBackend; call it with a responder to get the client."""
+    clients = []
+
+    def install(responder, **client_options):
+        client_options.setdefault("backoff_base", 0)
+        client_options.setdefault("backoff_max", 0)
+        client = llm_client.LLMClient(llm_client.StubBackend(responder), **client_options)
+        llm_client.set_client(client)
+        clients.append(client)
+        return client
+
+    yield install
+    llm_client.set_client(None)
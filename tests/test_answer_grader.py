@@ -0,0 +1,125 @@
+import pytest
+
+from ai_core import answer_grader
+from ai_core.answer_grader import FeedbackMemory, grade_answer, key_terms
+from ai_core.llm_client import RateLimitError
+
+EXPLANATION = """## Refraction of Light
+
+**Refraction** is the bending of light when it passes between media of different **density**.
+
+A glass **prism** disperses white light into a spectrum because each wavelength bends by a different angle.
+
+Lenses use refraction to focus light onto a focal point."""
+SCENARIO = "A straw in a glass of water looks bent. Why?"
+# Eleven words, so nine word 3-grams.
+ANSWER = "refraction bends light rays where water meets air so straw appears"
+
+
+@pytest.fixture
+def backend(stub_client):
+    return stub_client(lambda prompt: "### Feedback:\nCorrect, that is refraction.").backend
+
+
+@pytest.mark.parametrize("answer", ["", "   ", "refraction bends light"])
+def test_answers_below_the_word_minimum_are_graded_locally(backend, answer):
+    assert len(answer.split()) == answer_grader.MIN_ANSWER_WORDS - 1 or not answer.strip()
+
+    result = grade_answer(SCENARIO, answer, EXPLANATION, FeedbackMemory())
+
+    assert result["tier"] == "empty"
+    assert ("haven't written" in result["feedback"]) == (not answer.strip())
+    assert backend.calls == []
+
+
+def test_answer_at_the_word_minimum_reaches_the_model(backend):
+    answer = "refraction bends the light"
+    assert len(answer.split()) == answer_grader.MIN_ANSWER_WORDS
+
+    result = grade_answer(SCENARIO, answer, EXPLANATION, FeedbackMemory())
+
+    assert result["tier"] == "llm"
+    assert len(backend.calls) == 1
+
+
+def test_answer_without_any_key_term_is_off_topic(backend):
+    result = grade_answer(SCENARIO, "I think it is just magic honestly", EXPLANATION, FeedbackMemory())
+
+    assert result["tier"] == "off_topic"
+    assert result["coverage"] == 0
+    assert "**refraction**" in result["feedback"]
+    assert backend.calls == []
+
+
+def test_off_topic_check_needs_the_minimum_number_of_key_terms(backend):
+    explanation = "Refraction bends."
+    assert len(key_terms(explanation)) == answer_grader.MIN_KEY_TERMS - 1
+
+    result = grade_answer(SCENARIO, "I think it is just magic honestly", explanation, FeedbackMemory())
+
+    assert result["tier"] == "llm"
+
+
+def test_exact_and_normalized_resubmissions_reuse_feedback(backend):
+    memory = FeedbackMemory()
+    first = grade_answer(SCENARIO, ANSWER, EXPLANATION, memory)
+
+    exact = grade_answer(SCENARIO, ANSWER, EXPLANATION, memory)
+    normalized = grade_answer("  A straw in a glass of water\n looks bent.  Why? ",
+                              "Refraction bends light rays, where WATER meets air -- so straw appears!",
+                              EXPLANATION, memory)
+
+    assert first["tier"] == "llm"
+    assert exact["tier"] == normalized["tier"] == "duplicate"
+    assert exact["feedback"] == normalized["feedback"] == first["feedback"]
+    assert len(backend.calls) == 1
+
+
+def test_duplicate_threshold_boundary(backend):
+    assert answer_grader.DUPLICATE_SIMILARITY == 0.9
+    # One extra word adds one 3-gram: 9 shared of 10 is exactly the threshold.
+    memory = FeedbackMemory()
+    grade_answer(SCENARIO, ANSWER, EXPLANATION, memory)
+    assert grade_answer(SCENARIO, ANSWER + " bent", EXPLANATION, memory)["tier"] == "duplicate"
+
+    # With one word fewer it is 8 shared of 9, just below.
+    memory = FeedbackMemory()
+    shorter = ANSWER.rsplit(" ", 1)[0]
+    grade_answer(SCENARIO, shorter, EXPLANATION, memory)
+    assert grade_answer(SCENARIO, shorter + " looks", EXPLANATION, memory)["tier"] == "llm"
+    assert len(backend.calls) == 3
+
+
+def test_feedback_memory_threshold_is_inclusive():
+    memory = FeedbackMemory()
+    memory.remember(SCENARIO, ANSWER, "earlier feedback")
+
+    assert memory.find(SCENARIO, ANSWER + " bent", threshold=0.9) == "earlier feedback"
+    assert memory.find(SCENARIO, ANSWER + " bent", threshold=0.91) is None
+    assert memory.find("Another scenario", ANSWER) is None
+
+
+def test_llm_tier_sends_missing_terms_and_remembers_feedback(backend):
+    memory = FeedbackMemory()
+
+    result = grade_answer(SCENARIO, ANSWER, EXPLANATION, memory)
+
+    assert result["tier"] == "llm"
+    assert result["feedback"] == "### Feedback:\nCorrect, that is refraction."
+    assert 0 < result["coverage"] < 1
+    assert "prism" in result["missing_terms"] and "refraction" not in result["missing_terms"]
+    assert ANSWER in backend.calls[0]
+    assert memory.find(SCENARIO, ANSWER) == result["feedback"]
+
+
+def test_failed_model_call_is_not_remembered(stub_client):
+    def reject(prompt):
+        raise RateLimitError("quota exhausted")
+    stub_client(reject, max_retries=0)
+    memory = FeedbackMemory()
+
+    result = grade_answer(SCENARIO, ANSWER, EXPLANATION, memory)
+
+    assert result["tier"] == "llm"
+    assert result["feedback"].startswith("Error evaluating answer")
+    assert memory.find(SCENARIO, ANSWER) is None
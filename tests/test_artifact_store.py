@@ -0,0 +1,78 @@
+import gc
+
+from ai_core.artifact_store import ArtifactStore
+from ai_core.prefetch import LessonPrefetcher
+
+
+class Closable:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+def test_document_is_kept_while_any_lease_is_held():
+    store = ArtifactStore()
+    first, second = store.acquire("doc"), store.acquire("doc")
+    store.put("doc", "concepts", ["Refraction"])
+
+    assert store.stats() == {"doc": 2}
+    first.release()
+    assert store.stats() == {"doc": 1}
+    assert store.get("doc", "concepts") == ["Refraction"]
+
+    second.release()
+    assert store.stats() == {}
+    assert store.get("doc", "concepts") is None
+
+
+def test_releasing_a_lease_twice_drops_one_reference():
+    store = ArtifactStore()
+    lease, other = store.acquire("doc"), store.acquire("doc")
+
+    lease.release()
+    lease.release()
+
+    assert store.stats() == {"doc": 1}
+    other.release()
+
+
+def test_garbage_collected_lease_releases_its_reference():
+    store = ArtifactStore()
+    kept = store.acquire("doc")
+    # Not kept by the caller, e.g. a session that has ended.
+    store.acquire("doc")
+    gc.collect()
+
+    assert store.stats() == {"doc": 1}
+    del kept
+    gc.collect()
+    assert store.stats() == {}
+
+
+def test_evicted_document_ignores_writes_and_closes_its_artifacts():
+    store = ArtifactStore()
+    lease = store.acquire("doc")
+    resource = store.setdefault("doc", "prefetcher", Closable)
+
+    lease.release()
+    store.put("doc", "concepts", ["Refraction"])
+
+    assert resource.closed == 1
+    assert store.get("doc", "concepts") is None
+    # Without a document, setdefault hands out an unstored artifact.
+    assert store.setdefault("doc", "prefetcher", Closable) is not resource
+
+
+def test_prefetcher_is_stopped_when_its_document_is_evicted():
+    store = ArtifactStore()
+    lease = store.acquire("doc")
+    prefetcher = store.setdefault("doc", "prefetcher", lambda: LessonPrefetcher(generate=lambda text, concept: "lesson"))
+    prefetcher.start("text", ["A", "B"])
+    assert prefetcher.get("A", timeout=5) == "lesson"
+
+    lease.release()
+
+    assert prefetcher.get("A") is None and not prefetcher.claim("B")
+    assert prefetcher._batch is None
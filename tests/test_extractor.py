@@ -0,0 +1,72 @@
+import pytest
+
+from ai_core import extractor
+
+
+def write_pdf(path, page_texts):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(out)
+    return str(path)
+
+
+@pytest.fixture
+def two_workers(monkeypatch):
+    """Forces the shared extraction pool to two workers, even on a one-CPU machine."""
+    monkeypatch.setattr(extractor, "EXTRACT_WORKERS", 2)
+    monkeypatch.setattr(extractor, "_pool", None)
+    yield
+    if extractor._pool is not None:
+        extractor._pool.shutdown()
+    extractor._pool = None
+
+
+def test_parallel_and_serial_extraction_agree(tmp_path, two_workers):
+    pdf_path = write_pdf(tmp_path / "chapter.pdf", [f"Page {n} about   light" for n in range(15)])
+
+    serial = extractor.extract_text_from_pdf(pdf_path, parallel=False)
+    parallel = extractor.extract_text_from_pdf(pdf_path)
+
+    assert extractor._pool is not None
+    assert parallel == serial == " ".join(f"Page {n} about light" for n in range(15))
+    assert extractor.extract_pages_from_pdf(pdf_path)[14] == "Page 14 about light"
+
+
+def test_short_chapters_are_parsed_without_the_pool(tmp_path, two_workers):
+    pdf_path = write_pdf(tmp_path / "short.pdf", ["One", "Two"])
+    assert extractor.extract_pages_from_pdf(pdf_path) == ["One", "Two"]
+    assert extractor._pool is None
+
+
+def test_pages_stream_in_order_and_an_abandoned_read_stops(tmp_path, two_workers):
+    pdf_path = write_pdf(tmp_path / "chapter.pdf", [f"Page {n}" for n in range(40)])
+    pages = extractor.iter_page_texts(pdf_path, pages_per_task=2)
+
+    assert [next(pages) for _ in range(3)] == ["Page 0", "Page 1", "Page 2"]
+    pages.close()
+    # The pool stays usable for the next chapter.
+    assert len(extractor.extract_pages_from_pdf(pdf_path)) == 40
+
+
+def test_extraction_pool_is_shared_until_it_breaks(two_workers):
+    pool = extractor._get_pool()
+    assert extractor._get_pool() is pool
+    extractor._discard_pool(pool)
+    assert extractor._get_pool() is not pool
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from ai_core import generator
+from ai_core.generator import concept_key, merge_concept_lists
+
+# Distinct concepts whose names are near-identical character by character.
+DISTINCT_PAIRS = [
+    ("Reflection of Light", "Refraction of Light"),
+    ("Concave Mirrors", "Convex Mirrors"),
+    ("Concave Lens", "Convex Lens"),
+    ("Mitosis", "Meiosis"),
+]
+
+
+@pytest.mark.parametrize("first, second", DISTINCT_PAIRS)
+def test_merge_keeps_distinct_concepts(first, second):
+    assert merge_concept_lists([[first], [second]]) == [first, second]
+
+
+def test_merge_keeps_all_distinct_concepts_in_one_list():
+    concepts = [name for pair in DISTINCT_PAIRS for name in pair]
+    assert merge_concept_lists([concepts]) == concepts
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Concave Mirrors", "concave mirror"),
+    ("The Lens Formula", "Lens formula"),
+    ("Reflection of Light", "Light reflection"),
+    ("Properties of Gases", "Gas Property"),
+])
+def test_merge_collapses_same_concept(first, second):
+    assert merge_concept_lists([[first], [second]]) == [first]
+    assert concept_key(first) == concept_key(second)
+
+
+def test_merge_skips_empty_names_and_keeps_first_appearance_order():
+    assert merge_concept_lists([["Beta", "", "Alpha", "The"], ["alpha", "Gamma"]]) == ["Beta", "Alpha", "Gamma"]
+
+
+def test_extract_key_concepts_merges_chunk_results(stub_client, monkeypatch):
+    monkeypatch.setattr(generator, "CONCEPT_CHUNK_CHARS", 50)
+    monkeypatch.setattr(generator, "CONCEPT_CHUNK_OVERLAP", 0)
+    backend = stub_client(lambda prompt: json.dumps(
+        ["Concave Mirrors", "Mitosis"] if "mirrors" in prompt else ["Convex Mirrors", "mitosis"]
+    )).backend
+
+    concepts = generator.extract_key_concepts("mirrors " * 10 + "cells " * 10)
+
+    assert len(backend.calls) > 1
+    assert sorted(concepts) == ["Concave Mirrors", "Convex Mirrors", "Mitosis"]
@@ -0,0 +1,89 @@
+import json
+import re
+
+import pytest
+
+from ai_core.incremental import analyze_chapter, diff_pages
+from ai_core.llm_client import RateLimitError
+
+PAGE_CHARS = 4000
+
+
+def make_page(n, edit=""):
+    return f"marker{n} {edit}".ljust(PAGE_CHARS, ".")
+
+
+def concepts_for(prompt):
+    return json.dumps([f"Concept {chr(ord('A') + int(n))}" for n in re.findall(r"marker(\d+)", prompt)])
+
+
+def test_short_chapter_is_one_call_without_merge(stub_client):
+    backend = stub_client(lambda prompt: json.dumps(["Concave Mirrors", "concave mirror"])).backend
+
+    analysis, report = analyze_chapter([make_page(0), make_page(1)])
+
+    assert len(backend.calls) == 1
+    # A single window's list is kept as the model returned it.
+    assert analysis["concepts"] == ["Concave Mirrors", "concave mirror"]
+    assert report["extracted_windows"] == 1
+
+
+def test_first_analysis_costs_as_many_calls_as_map_reduce(stub_client):
+    backend = stub_client(concepts_for).backend
+    pages = [make_page(n) for n in range(8)]
+
+    analysis, _ = analyze_chapter(pages)
+
+    # 32 kB of text fits in three 15 kB prompts.
+    assert len(backend.calls) == 3
+    assert analysis["concepts"] == [f"Concept {c}" for c in "ABCDEFGH"]
+
+
+def test_revision_re_extracts_only_the_window_around_the_change(stub_client):
+    pages = [make_page(n) for n in range(8)]
+    backend = stub_client(concepts_for).backend
+    previous, _ = analyze_chapter(pages)
+    first_windows = previous["windows"]
+
+    revisions = {
+        "insert": pages[:5] + [make_page(8)] + pages[5:],
+        "remove": pages[:5] + pages[6:],
+        "edit": pages[:5] + [make_page(5, "revised")] + pages[6:],
+    }
+    for name, revised in revisions.items():
+        backend.calls.clear()
+        analysis, report = analyze_chapter(revised, previous)
+
+        assert len(backend.calls) == 1, name
+        assert report["reused_windows"] == len(analysis["windows"]) - 1, name
+        # Pages 0-2 sit in an untouched window, so their lessons are kept.
+        assert not {"Concept A", "Concept B", "Concept C"} & set(report["stale_concepts"]), name
+        assert first_windows[0] in analysis["windows"], name
+
+
+def test_diff_pages_reports_only_new_content():
+    assert diff_pages(["a", "b", "c"], ["a", "x", "b", "c"]) == [1]
+    assert diff_pages(["a", "b", "c"], ["a", "c"]) == []
+    assert diff_pages(["a", "b", "c"], ["a", "b2", "c"]) == [1]
+
+
+def test_backend_error_propagates_when_every_window_fails(stub_client):
+    def reject(prompt):
+        raise RateLimitError("quota exhausted")
+    stub_client(reject, max_retries=0)
+
+    with pytest.raises(RateLimitError, match="quota exhausted"):
+        analyze_chapter([make_page(n) for n in range(8)])
+
+
+def test_partial_failure_keeps_good_windows_and_reports_errors(stub_client):
+    def flaky(prompt):
+        if "marker0" in prompt:
+            raise RateLimitError("quota exhausted")
+        return concepts_for(prompt)
+    stub_client(flaky, max_retries=0)
+
+    analysis, report = analyze_chapter([make_page(n) for n in range(8)])
+
+    assert "Concept A" not in analysis["concepts"] and "Concept H" in analysis["concepts"]
+    assert report["errors"] == ["RateLimitError: quota exhausted"]
@@ -0,0 +1,152 @@
+import gc
+import json
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from ai_core import instrumentation
+from ai_core.instrumentation import (
+    JsonLinesSink, PrometheusSink, RingBufferSink, annotate, count, in_current_context, instrument, span,
+)
+
+
+def test_metrics_endpoint_binds_to_loopback_by_default():
+    sink = PrometheusSink()
+    server = sink.serve(port=0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def ring():
+    sink = RingBufferSink()
+    instrumentation.enable(sink)
+    yield sink
+    instrumentation.disable()
+
+
+@instrument()
+def traced_call(value):
+    annotate(value=value)
+    count("cache_hits")
+    count("cache_hits")
+    return value * 2
+
+
+@instrument("test.stream")
+def traced_stream(chunks, cleanup):
+    try:
+        for chunk in chunks:
+            annotate(last=chunk)
+            yield chunk
+    finally:
+        cleanup.append("closed")
+
+
+def test_spans_record_duration_attributes_and_parent(ring):
+    with span("outer", doc="a") as outer:
+        time.sleep(0.01)
+        assert traced_call(21) == 42
+
+    inner, recorded_outer = ring.spans()
+    assert inner["name"] == "test_instrumentation.traced_call"
+    assert inner["parent_id"] == outer.span_id
+    assert (inner["value"], inner["cache_hits"]) == (21, 2)
+    assert recorded_outer["doc"] == "a" and recorded_outer["parent_id"] is None
+    assert recorded_outer["duration_s"] >= 0.01 and inner["duration_s"] >= 0
+
+
+def test_failed_span_records_the_error(ring):
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("bad input")
+
+    assert ring.spans()[0]["error"] == "ValueError: bad input"
+
+
+def test_worker_thread_spans_attach_to_the_caller(ring):
+    with span("parent") as parent:
+        worker = threading.Thread(target=in_current_context(lambda: traced_call(1)))
+        worker.start()
+        worker.join()
+
+    assert ring.spans()[0]["parent_id"] == parent.span_id
+
+
+def test_nothing_is_recorded_while_disabled():
+    sink = RingBufferSink()
+    instrumentation.enable(sink)
+    instrumentation.disable()
+
+    with span("ignored") as record:
+        traced_call(1)
+
+    assert record is None
+    assert sink.spans() == []
+
+
+def test_generator_span_closes_when_the_stream_is_consumed(ring):
+    cleanup = []
+
+    assert list(traced_stream(["ab", "cde"], cleanup)) == ["ab", "cde"]
+
+    record, = ring.spans()
+    assert record["name"] == "test.stream"
+    assert (record["chunks"], record["response_chars"], record["last"]) == (2, 5, "cde")
+    assert record["duration_s"] >= record["first_chunk_s"] >= 0
+    assert cleanup == ["closed"]
+
+
+@pytest.mark.parametrize("abandon", ["close", "garbage_collect"])
+def test_generator_span_closes_when_the_stream_is_abandoned(ring, abandon):
+    cleanup = []
+    stream = traced_stream(["ab", "cde", "f"], cleanup)
+    assert next(stream) == "ab"
+    assert ring.spans() == []
+
+    if abandon == "close":
+        stream.close()
+    else:
+        del stream
+        gc.collect()
+
+    record, = ring.spans()
+    assert (record["chunks"], record["response_chars"]) == (1, 2)
+    assert "error" not in record
+    assert cleanup == ["closed"]
+
+
+def test_generator_error_is_recorded(ring):
+    def broken():
+        yield "a"
+        raise ConnectionError("stream reset")
+
+    with pytest.raises(ConnectionError):
+        list(instrument("test.broken")(broken)())
+
+    assert ring.spans()[0]["error"] == "ConnectionError: stream reset"
+
+
+def test_json_lines_sink_appends_one_object_per_span(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    instrumentation.enable(JsonLinesSink(str(path)))
+    try:
+        with span("first", chars=3):
+            pass
+        traced_call(2)
+    finally:
+        instrumentation.disable()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["name"] for r in records] == ["first", "test_instrumentation.traced_call"]
+    assert records[0]["chars"] == 3 and records[1]["value"] == 2
+    assert all(isinstance(r["duration_s"], float) for r in records)
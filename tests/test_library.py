@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+
+from ai_core.incremental import analyze_document, get_analysis_store
+from ai_core.library import LibraryIndex, ingest_directory
+from ai_core.llm_client import GeminiBackend, LLMClient, set_client
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output", "iesc107.pdf")
+
+
+def test_documents_report_a_concept_count_and_document_the_list():
+    index = LibraryIndex(":memory:")
+    index.add_document("abc", "optics.pdf", "Light bends at a boundary.", ["Refraction", "Snell's Law"])
+
+    assert index.documents() == [{"doc_id": "abc", "name": "optics.pdf", "concept_count": 2}]
+    assert index.document("abc")["concepts"] == ["Refraction", "Snell's Law"]
+
+
+def test_documents_with_the_same_file_name_are_kept_apart():
+    index = LibraryIndex(":memory:")
+    index.add_document("aaa", "chapter1.pdf", "Light bends.", ["Refraction"])
+    index.add_document("bbb", "chapter1.pdf", "Cells divide.", ["Mitosis"])
+    index.add_document("aaa", "chapter1.pdf", "Light bends.", ["Refraction", "Lenses"])
+
+    assert [(doc["doc_id"], doc["concept_count"]) for doc in index.documents()] == [("aaa", 2), ("bbb", 1)]
+    assert index.document("bbb")["concepts"] == ["Mitosis"]
+
+
+def test_analyses_are_keyed_by_document_hash(stub_client):
+    backend = stub_client(lambda prompt: json.dumps(["Refraction"] if "bends" in prompt else ["Mitosis"])).backend
+
+    first, _ = analyze_document("aaa", "chapter1.pdf", ["Light bends."])
+    other, _ = analyze_document("bbb", "chapter1.pdf", ["Cells divide."])
+    again, report = analyze_document("aaa", "renamed.pdf", ["Light bends."])
+
+    assert (first["concepts"], other["concepts"], again["concepts"]) == (["Refraction"], ["Mitosis"], ["Refraction"])
+    assert report["extracted_windows"] == 0
+    assert len(backend.calls) == 2
+    assert get_analysis_store().load("bbb")["name"] == "chapter1.pdf"
+
+
+def test_a_revision_is_diffed_against_the_version_it_replaces(stub_client):
+    stub_client(lambda prompt: json.dumps(["Refraction"] if "bends" in prompt else ["Lenses"]))
+
+    previous, _ = analyze_document("v1", "optics.pdf", ["Light bends.", "Lenses focus."])
+    _, report = analyze_document("v2", "optics.pdf", ["Light bends.", "Lenses focus!"], previous)
+
+    assert report["changed_pages"] == [1]
+    assert get_analysis_store().load("v1")["concepts"] == previous["concepts"]
+
+
+def test_ingest_uses_the_same_analysis_as_uploads(stub_client, tmp_path):
+    stub_client(json.dumps(["Refraction of Light", "Lenses"]))
+    shutil.copy(FIXTURE, tmp_path / "iesc107.pdf")
+    index = LibraryIndex(":memory:")
+
+    report = ingest_directory(str(tmp_path), index, workers=1)
+
+    assert report["added"] == ["iesc107.pdf"]
+    assert index.documents()[0]["concept_count"] == 2
+    # Uploading the same PDF later reuses this analysis instead of calling the model again.
+    doc_id = index.documents()[0]["doc_id"]
+    assert get_analysis_store().load(doc_id)["concepts"] == ["Refraction of Light", "Lenses"]
+    assert ingest_directory(str(tmp_path), index, workers=1)["skipped"] == ["iesc107.pdf"]
+
+
+def test_ingest_without_an_api_key_fails_without_calling_the_model(response_cache, tmp_path):
+    set_client(LLMClient(GeminiBackend(None)))
+    try:
+        shutil.copy(FIXTURE, tmp_path / "iesc107.pdf")
+        report = ingest_directory(str(tmp_path), LibraryIndex(":memory:"), workers=1)
+    finally:
+        set_client(None)
+    assert report["failed"] == ["iesc107.pdf"]
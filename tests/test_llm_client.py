@@ -0,0 +1,177 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ai_core import llm_cache
+from ai_core.llm_cache import (
+    forget_template_response, generate_from_template, generate_from_template_async, stream_from_template,
+)
+from ai_core.llm_client import RateLimitError, StubBackend
+
+TEMPLATE = "Summarize {topic}."
+
+
+def flaky(failures, error=RateLimitError, text="ok"):
+    """A responder that raises `failures` times before answering."""
+    remaining = [failures]
+
+    def respond(prompt):
+        if remaining[0]:
+            remaining[0] -= 1
+            raise error("429 quota exceeded")
+        return text
+
+    return respond
+
+
+def test_cache_miss_calls_the_model_and_hit_replays_it(stub_client, response_cache):
+    backend = stub_client(lambda prompt: f"answer to {prompt}").backend
+
+    first = generate_from_template(TEMPLATE, topic="optics")
+    second = generate_from_template("  Summarize\n {topic}.", topic="optics")
+
+    assert first == second == "answer to Summarize optics."
+    assert len(backend.calls) == 1
+    stats = response_cache.stats()
+    assert (stats["hits"], stats["entries"]) == (1, 1)
+
+
+def test_different_fields_and_uncached_calls_reach_the_model(stub_client):
+    backend = stub_client("text").backend
+
+    generate_from_template(TEMPLATE, topic="optics")
+    generate_from_template(TEMPLATE, topic="cells")
+    generate_from_template(TEMPLATE, use_cache=False, topic="optics")
+
+    assert len(backend.calls) == 3
+
+
+def test_forgotten_responses_are_generated_again(stub_client):
+    backend = stub_client("text").backend
+
+    generate_from_template(TEMPLATE, topic="optics")
+    forget_template_response(TEMPLATE, topic="optics")
+    generate_from_template(TEMPLATE, topic="optics")
+
+    assert len(backend.calls) == 2
+
+
+def test_rate_limited_calls_are_retried(stub_client):
+    client = stub_client(flaky(2), max_retries=3)
+
+    assert client.generate("prompt") == "ok"
+    assert len(client.backend.calls) == 3
+
+
+def test_retries_give_up_after_max_retries(stub_client):
+    client = stub_client(flaky(5), max_retries=2)
+
+    with pytest.raises(RateLimitError):
+        client.generate("prompt")
+    assert len(client.backend.calls) == 3
+
+
+def test_other_errors_are_not_retried(stub_client):
+    client = stub_client(flaky(1, error=ValueError), max_retries=3)
+
+    with pytest.raises(ValueError):
+        client.generate("prompt")
+    assert len(client.backend.calls) == 1
+
+
+def test_stream_yields_chunks_and_caches_the_full_response(stub_client, response_cache):
+    client = stub_client("x" * 100)
+    client.backend.chunk_size = 30
+
+    chunks = list(stream_from_template(TEMPLATE, topic="optics"))
+    replayed = list(stream_from_template(TEMPLATE, topic="optics"))
+
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+    assert replayed == ["x" * 100]
+    assert len(client.backend.calls) == 1
+    assert generate_from_template(TEMPLATE, topic="optics") == "x" * 100
+
+
+def test_stream_retries_rate_limits_before_the_first_chunk(stub_client):
+    client = stub_client(flaky(1, text="streamed"), max_retries=2)
+
+    assert "".join(client.stream("prompt")) == "streamed"
+    assert len(client.backend.calls) == 2
+
+
+class CutOffBackend(StubBackend):
+    """Fails after the first chunk has been delivered."""
+
+    def stream(self, prompt, model_name, timeout):
+        self.calls.append(prompt)
+        yield "partial"
+        raise RateLimitError("429")
+
+
+def test_stream_does_not_retry_once_chunks_were_yielded(stub_client):
+    client = stub_client("", max_retries=3)
+    client.backend = CutOffBackend()
+
+    received = []
+    with pytest.raises(RateLimitError):
+        for chunk in client.stream("prompt"):
+            received.append(chunk)
+    assert received == ["partial"]
+    assert len(client.backend.calls) == 1
+
+
+def test_max_call_seconds_covers_every_attempt_and_backoff(stub_client):
+    client = stub_client("", timeout=120, max_retries=4, backoff_max=30)
+    assert client.max_call_seconds() == 5 * 120 + 4 * 30
+
+
+def test_concurrent_misses_share_one_call_and_wait_as_long_as_it_can_take(stub_client, monkeypatch):
+    # A flight timeout shorter than the model call must not fail the waiters.
+    monkeypatch.setattr(llm_cache._flights, "timeout", 0.01)
+    client = stub_client("shared", timeout=1, max_retries=0)
+    client.backend.latency = 0.2
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: generate_from_template(TEMPLATE, topic="optics"), range(4)))
+
+    assert results == ["shared"] * 4
+    assert len(client.backend.calls) == 1
+
+
+def test_thread_and_asyncio_callers_share_one_call(stub_client):
+    client = stub_client("shared")
+    client.backend.latency = 0.2
+    results = {}
+
+    thread = threading.Thread(target=lambda: results.setdefault("thread", generate_from_template(TEMPLATE, topic="optics")))
+    thread.start()
+
+    async def await_both():
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(
+            generate_from_template_async(TEMPLATE, topic="optics"),
+            generate_from_template_async(TEMPLATE, topic="optics"),
+        )
+
+    results["async"] = asyncio.run(await_both())
+    thread.join()
+
+    assert results == {"thread": "shared", "async": ["shared", "shared"]}
+    assert len(client.backend.calls) == 1
+
+
+def test_cancelled_async_waiter_does_not_cancel_the_shared_call(stub_client):
+    client = stub_client("shared")
+    client.backend.latency = 0.2
+
+    async def cancel_one():
+        waiter = asyncio.create_task(generate_from_template_async(TEMPLATE, topic="optics"))
+        await asyncio.sleep(0.05)
+        survivor = asyncio.create_task(generate_from_template_async(TEMPLATE, topic="optics"))
+        waiter.cancel()
+        return await survivor
+
+    assert asyncio.run(cancel_one()) == "shared"
+    assert len(client.backend.calls) == 1
@@ -0,0 +1,35 @@
+import wave
+
+from ai_core import local_renderer
+from ai_core.local_renderer import build_timeline
+
+
+def write_wav(path, seconds, rate=8000):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\0\0" * int(seconds * rate))
+    return str(path)
+
+
+def test_scenes_last_as_long_as_their_narration(tmp_path):
+    sentences = ["Light bends when it enters glass", "A lens focuses light"]
+    audio = [write_wav(tmp_path / "a.wav", 7.5), write_wav(tmp_path / "b.wav", 1.0)]
+
+    timeline = build_timeline(sentences, ["scene_0.png"], audio)
+
+    assert [scene["duration"] for scene in timeline] == [7.5, local_renderer.MIN_SCENE_SECONDS]
+    assert timeline[1]["start"] == 7.5
+
+
+def test_unreadable_audio_falls_back_to_reading_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_renderer, "FFPROBE", str(tmp_path / "missing-ffprobe"))
+    broken = tmp_path / "segment.mp3"
+    broken.write_bytes(b"not audio")
+    sentence = " ".join(["word"] * 15)
+
+    timeline = build_timeline([sentence], [], [str(broken)])
+
+    assert timeline[0]["duration"] == 15 / local_renderer.READING_WORDS_PER_SECOND
+    assert timeline[0]["image"] is None
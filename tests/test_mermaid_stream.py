@@ -0,0 +1,65 @@
+from ai_core.mermaid_stream import MermaidStreamParser
+
+
+def parse(chunks):
+    parser = MermaidStreamParser()
+    segments = []
+    for chunk in chunks:
+        segments.extend(parser.feed(chunk))
+    segments.extend(parser.close())
+    return segments
+
+
+def merged(segments):
+    """Joins consecutive markdown segments, which may arrive in several pieces."""
+    result = []
+    for kind, text in segments:
+        if result and kind == "markdown" and result[-1][0] == "markdown":
+            result[-1] = ("markdown", result[-1][1] + text)
+        else:
+            result.append((kind, text))
+    return result
+
+
+TEXT = "Intro text.\n```mermaid\ngraph TD\nA-->B\n```\nAfter the diagram."
+EXPECTED = [("markdown", "Intro text.\n"), ("mermaid", "graph TD\nA-->B"), ("markdown", "\nAfter the diagram.")]
+
+
+def test_markdown_is_emitted_before_the_stream_ends():
+    parser = MermaidStreamParser()
+
+    assert parser.feed("Light bends ") == [("markdown", "Light bends ")]
+    assert parser.feed("when it enters water.") == [("markdown", "when it enters water.")]
+    assert parser.close() == []
+
+
+def test_whole_text_in_one_chunk():
+    assert parse([TEXT]) == EXPECTED
+
+
+def test_fences_split_across_chunks():
+    for size in range(1, 12):
+        chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+
+        assert merged(parse(chunks)) == EXPECTED, size
+
+
+def test_partial_opening_fence_is_held_back():
+    parser = MermaidStreamParser()
+
+    assert parser.feed("See below ``") == [("markdown", "See below ")]
+    assert parser.feed("`merm") == []
+    assert parser.feed("aid\ngraph LR\nX-->Y\n``") == []
+    assert parser.feed("`") == [("mermaid", "graph LR\nX-->Y")]
+
+
+def test_code_fence_that_is_not_mermaid_stays_markdown():
+    assert merged(parse(["```python\nprint(1)\n```"])) == [("markdown", "```python\nprint(1)\n```")]
+
+
+def test_unterminated_block_is_flushed_as_markdown_at_eof():
+    parser = MermaidStreamParser()
+
+    assert parser.feed("Text\n```mermaid\ngraph TD\nA-->") == [("markdown", "Text\n")]
+    assert parser.close() == [("markdown", "```mermaid\ngraph TD\nA-->")]
+    assert parser.close() == []
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from ai_core import pdf_cache
+from ai_core.pdf_cache import PdfTextCache, hash_pdf_bytes
+from ai_core.utils import atomic_path
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    """Replaces PDF parsing with a fake that records the paths it was asked to parse."""
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        with open(path, "rb") as f:
+            return [f.read().decode("utf-8"), "page two"]
+
+    monkeypatch.setattr(pdf_cache, "extract_pages_from_pdf", extract)
+    return calls
+
+
+def age(cache, digest, seconds_ago):
+    """Sets an entry's last-use time, which eviction orders by."""
+    when = 1_000_000_000 - seconds_ago
+    os.utime(cache._path(digest), (when, when))
+
+
+def test_second_load_is_served_without_parsing(tmp_path, extractions):
+    cache = PdfTextCache(str(tmp_path / "cache"))
+
+    first = cache.load_or_extract(b"chapter one", str(tmp_path / "a.pdf"))
+    second = cache.load_or_extract(b"chapter one", str(tmp_path / "b.pdf"))
+
+    assert second == first == {"sha256": hash_pdf_bytes(b"chapter one"), "text": first["text"],
+                               "pages": ["chapter one", "page two"]}
+    assert extractions == [str(tmp_path / "a.pdf")]
+    assert not os.path.exists(tmp_path / "b.pdf")
+
+
+def test_unreadable_pdf_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "extract_pages_from_pdf", lambda path: None)
+    cache = PdfTextCache(str(tmp_path / "cache"))
+
+    assert cache.load_or_extract(b"not a pdf", str(tmp_path / "x.pdf")) is None
+    assert cache.get(hash_pdf_bytes(b"not a pdf")) is None
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = PdfTextCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    for n, digest in enumerate(["a", "b", "c"]):
+        cache.put(digest, ["x" * 100])
+        age(cache, digest, 100 - n)
+    entry_bytes = os.path.getsize(cache._path("a"))
+    # Reading "a" makes it the most recently used of the three.
+    assert cache.get("a") is not None
+
+    cache.max_bytes = 3 * entry_bytes
+    cache.put("d", ["x" * 100])
+
+    assert [d for d in "abcd" if cache.get(d) is not None] == ["a", "c", "d"]
+
+
+def test_size_cap_is_enforced_but_keeps_the_newest_entry(tmp_path):
+    cache = PdfTextCache(str(tmp_path / "cache"), max_bytes=1000)
+    for n in range(10):
+        cache.put(f"small{n}", ["x" * 100])
+        age(cache, f"small{n}", 100 - n)
+
+    total = sum(os.path.getsize(os.path.join(cache.cache_dir, name)) for name in os.listdir(cache.cache_dir))
+    assert total <= 1000
+    assert cache.get("small9") is not None and cache.get("small0") is None
+
+    cache.put("huge", ["x" * 5000])
+    assert os.listdir(cache.cache_dir) == ["huge.json"]
+
+
+def test_atomic_write_leaves_no_partial_file_on_failure(tmp_path):
+    path = str(tmp_path / "entry.json")
+    with atomic_path(path) as tmp:
+        assert str(os.getpid()) in tmp and tmp.endswith(".tmp")
+        with open(tmp, "w") as f:
+            f.write("new")
+    assert open(path).read() == "new"
+
+    with pytest.raises(RuntimeError):
+        with atomic_path(path) as tmp:
+            with open(tmp, "w") as f:
+                f.write("partial")
+            raise RuntimeError("disk full")
+
+    assert open(path).read() == "new"
+    assert os.listdir(tmp_path) == ["entry.json"]
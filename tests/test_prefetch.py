@@ -0,0 +1,122 @@
+import threading
+import time
+
+from ai_core.generator import stream_detailed_explanation_with_diagrams
+from ai_core.prefetch import LessonPrefetcher
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_opening_a_prefetching_lesson_subscribes_to_its_stream(stub_client):
+    backend = stub_client(lambda prompt: "Lesson text " * 20).backend
+    backend.latency = 0.3
+    prefetcher = LessonPrefetcher()
+    prefetcher.start("Chapter about optics.", ["Refraction"])
+    wait_for(lambda: backend.calls)
+
+    # What the app does when the student opens the concept mid-generation.
+    streamed = "".join(stream_detailed_explanation_with_diagrams("Chapter about optics.", "Refraction"))
+
+    assert streamed == "Lesson text " * 20
+    assert prefetcher.get("Refraction", timeout=5) == streamed
+    assert len(backend.calls) == 1
+    prefetcher.cancel()
+
+
+class FakeGenerate:
+    """Records the order lessons are generated in; the first call is held until released."""
+
+    def __init__(self, lessons=None):
+        self.lessons = lessons or {}
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, context_text, concept):
+        self.calls.append(concept)
+        if len(self.calls) == 1:
+            self.release.wait(5)
+        return self.lessons.get(concept, f"Lesson on {concept}")
+
+
+def test_selected_and_prioritized_concepts_are_generated_first():
+    generate = FakeGenerate()
+    prefetcher = LessonPrefetcher(generate=generate, concurrency=1)
+
+    prefetcher.start("text", ["A", "B", "C", "D"], selected="C")
+    wait_for(lambda: generate.calls)
+    prefetcher.prioritize("D")
+    generate.release.set()
+
+    wait_for(lambda: prefetcher.is_ready("B"))
+    assert generate.calls == ["C", "D", "A", "B"]
+    prefetcher.cancel()
+
+
+def test_new_batch_cancels_the_lessons_of_the_previous_one():
+    generate = FakeGenerate()
+    prefetcher = LessonPrefetcher(generate=generate, concurrency=1)
+    prefetcher.start("old chapter", ["A", "B", "C"])
+    wait_for(lambda: generate.calls)
+
+    prefetcher.start("new chapter", ["X"])
+    generate.release.set()
+
+    assert prefetcher.get("X", timeout=5) == "Lesson on X"
+    assert prefetcher.get("A") is None and not prefetcher.is_ready("A")
+    time.sleep(0.1)
+    assert generate.calls == ["A", "X"]
+    prefetcher.cancel()
+
+
+def test_cancel_stops_scheduling_and_drops_results():
+    generate = FakeGenerate()
+    prefetcher = LessonPrefetcher(generate=generate, concurrency=1)
+    prefetcher.start("text", ["A", "B", "C"])
+    wait_for(lambda: generate.calls)
+
+    prefetcher.close()
+    generate.release.set()
+    time.sleep(0.1)
+
+    assert generate.calls == ["A"]
+    assert prefetcher.get("A") is None and not prefetcher.is_ready("A")
+    assert not prefetcher.claim("B")
+
+
+def test_claimed_concept_is_left_to_the_foreground():
+    generate = FakeGenerate()
+    prefetcher = LessonPrefetcher(generate=generate, concurrency=1)
+    prefetcher.start("text", ["A", "B"])
+    wait_for(lambda: generate.calls)
+
+    assert prefetcher.claim("B")
+    assert not prefetcher.claim("A") and not prefetcher.claim("B")
+    generate.release.set()
+    wait_for(lambda: prefetcher.is_ready("A"))
+    prefetcher.store("B", "Streamed lesson on B")
+
+    assert prefetcher.get("B") == "Streamed lesson on B"
+    assert generate.calls == ["A"]
+    prefetcher.cancel()
+
+
+def test_failed_lessons_are_not_stored():
+    generate = FakeGenerate({"A": "Error: Failed to generate explanation: quota exhausted"})
+    generate.release.set()
+    prefetcher = LessonPrefetcher(generate=generate, concurrency=1)
+    prefetcher.start("text", ["A", "B"], selected="A")
+    wait_for(lambda: prefetcher.is_ready("B"))
+
+    assert not prefetcher.is_ready("A")
+    assert prefetcher.get("A") is None
+
+    prefetcher.store("A", "Partial lesson.Error: Failed to generate explanation: timeout")
+    assert prefetcher.get("A") is None
+    prefetcher.store("A", "Streamed lesson on A")
+    assert prefetcher.get("A") == "Streamed lesson on A"
+    prefetcher.cancel()
@@ -0,0 +1,81 @@
+import threading
+
+from ai_core.question_bank import QuestionBank
+
+
+def make_questions(start, count):
+    return [
+        {"question_text": f"Question {n}?", "options": ["a", "b", "c", "d"], "correct_answer": "a"}
+        for n in range(start, start + count)
+    ]
+
+
+class FakeGenerator:
+    """Stands in for generate_question_pool; can be held mid-call and made to fail."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, concept_text, count):
+        self.calls += 1
+        self.release.wait(5)
+        result = self.results.pop(0) if self.results else []
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_warm_backs_off_after_a_failed_fill():
+    generate = FakeGenerator([RuntimeError("quota"), []])
+    bank = QuestionBank("bank", generate=generate, backoff_base=60)
+
+    bank._fill_in_background("optics").result()
+    for _ in range(5):
+        bank.warm("optics")
+
+    assert generate.calls == 1
+
+
+def test_warm_retries_once_the_backoff_expires():
+    generate = FakeGenerator([[], make_questions(0, 12)])
+    bank = QuestionBank("bank", generate=generate, backoff_base=0)
+
+    bank._fill_in_background("optics").result()
+    bank._fill_in_background("optics").result()
+
+    assert generate.calls == 2
+    assert bank.size("optics") == 12
+
+
+def test_warm_does_not_start_a_second_fill_while_one_is_in_flight():
+    generate = FakeGenerator([make_questions(0, 20)])
+    generate.release.clear()
+    bank = QuestionBank("bank", generate=generate)
+
+    for _ in range(5):
+        bank.warm("optics")
+    generate.release.set()
+    bank._fill_in_background("optics").result()
+
+    assert generate.calls == 1
+
+
+def test_draw_quiz_waits_on_the_in_flight_fill():
+    generate = FakeGenerator([make_questions(0, 20)])
+    generate.release.clear()
+    bank = QuestionBank("bank", generate=generate)
+    bank.warm("optics")
+
+    threading.Timer(0.05, generate.release.set).start()
+    quiz = bank.draw_quiz("optics")
+
+    assert generate.calls == 1
+    assert len(quiz["questions"]) == 5
+
+
+def test_draw_quiz_reports_an_error_when_nothing_can_be_generated():
+    bank = QuestionBank("bank", generate=FakeGenerator([]))
+    assert "error" in bank.draw_quiz("optics")
@@ -0,0 +1,114 @@
+import threading
+
+from ai_core.render_jobs import DONE, FAILED, PENDING, TIMEOUT, RenderJobQueue
+
+
+class FakeProvider:
+    """Accepts every job and answers status checks from a script of results."""
+
+    name = "fake"
+
+    def __init__(self, results=(), default=(PENDING, None, None)):
+        self.results = list(results)
+        self.default = default
+        self.submitted = []
+        self.checks = []
+        self._lock = threading.Lock()
+
+    def submit(self, payload, session=None):
+        self.submitted.append(payload)
+        return f"remote-{len(self.submitted)}"
+
+    def check(self, remote_id, session=None):
+        with self._lock:
+            self.checks.append(remote_id)
+            result = self.results.pop(0) if self.results else self.default
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def make_queue(provider, path="jobs.sqlite3", **options):
+    options.setdefault("initial_interval", 0.01)
+    options.setdefault("max_interval", 0.04)
+    options.setdefault("backoff", 2.0)
+    return RenderJobQueue([provider], path=path, **options)
+
+
+def stored_interval(queue, job_id):
+    return queue._conn.execute("SELECT interval FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_submit_returns_immediately_and_wait_returns_the_result():
+    provider = FakeProvider([(PENDING, None, None), (DONE, "https://cdn/video.mp4", None)])
+    queue = make_queue(provider)
+    try:
+        job_id = queue.submit("fake", {"clip": 1})
+        assert queue.status(job_id)["status"] == PENDING
+
+        job = queue.wait(job_id, timeout=5)
+
+        assert (job["status"], job["result_url"]) == (DONE, "https://cdn/video.mp4")
+        assert provider.submitted == [{"clip": 1}]
+        assert len(provider.checks) == 2
+    finally:
+        queue.stop()
+
+
+def test_polling_backs_off_up_to_the_max_interval_and_survives_errors():
+    provider = FakeProvider([ConnectionError("reset")] + [(PENDING, None, None)] * 4 + [(FAILED, None, "bad edit")])
+    queue = make_queue(provider)
+    try:
+        job_id = queue.submit("fake", {})
+        intervals = []
+        while len(provider.checks) < 4:
+            queue.wait(job_id, timeout=0.005)
+            intervals.append(stored_interval(queue, job_id))
+
+        assert intervals == sorted(intervals)
+        assert max(intervals) <= queue.max_interval
+        job = queue.wait(job_id, timeout=5)
+        assert (job["status"], job["error"]) == (FAILED, "bad edit")
+    finally:
+        queue.stop()
+
+
+def test_jobs_past_their_deadline_time_out():
+    queue = make_queue(FakeProvider())
+    try:
+        job = queue.wait(queue.submit("fake", {}, timeout=0.05), timeout=5)
+        assert job["status"] == TIMEOUT
+        assert "deadline" in job["error"]
+    finally:
+        queue.stop()
+
+
+def test_wait_timeout_reports_the_job_as_still_rendering():
+    queue = make_queue(FakeProvider())
+    try:
+        job_id = queue.submit("fake", {})
+        job = queue.wait(job_id, timeout=0.05)
+        assert job["status"] == PENDING
+        assert job["error"] == f"Still rendering after waiting 0.05s (job {job_id})."
+        # The wait timeout doesn't touch the stored job.
+        assert queue.status(job_id)["error"] is None
+    finally:
+        queue.stop()
+
+
+def test_pending_jobs_resume_after_a_restart():
+    first = make_queue(FakeProvider(), initial_interval=60)
+    job_id = first.submit("fake", {})
+    first.stop()
+
+    provider = FakeProvider([(DONE, "https://cdn/video.mp4", None)])
+    second = make_queue(provider, initial_interval=60)
+    second._conn.execute("UPDATE jobs SET next_poll = 0")
+    second._conn.commit()
+    try:
+        second.start()
+        job = second.wait(job_id, timeout=5)
+        assert (job["status"], job["result_url"]) == (DONE, "https://cdn/video.mp4")
+        assert provider.submitted == []
+    finally:
+        second.stop()
@@ -0,0 +1,135 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ai_core.render_jobs import DONE, FAILED, PENDING, DIdProvider, RenderJobQueue, ShotstackProvider
+
+
+class FakeApi:
+    """
+    Local HTTP server standing in for a provider API. Each (method, path) answers
+    from a script of (status, body) responses, repeating the last one; every
+    request is recorded with its headers and JSON body.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _answer(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                api.requests.append({"method": self.command, "path": self.path,
+                                     "headers": {k.lower(): v for k, v in self.headers.items()}, "json": body})
+                script = api.routes.get((self.command, self.path)) or [(404, {"error": "not found"})]
+                status, payload = script.pop(0) if len(script) > 1 else script[0]
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _answer
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def route(self, method, path, *responses):
+        self.routes[(method, path)] = list(responses)
+
+
+@pytest.fixture
+def api():
+    fake = FakeApi()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
+
+
+def test_shotstack_submit_posts_the_edit_with_the_api_key(api):
+    api.route("POST", "/stage/render", (201, {"success": True, "response": {"id": "render-1"}}))
+    provider = ShotstackProvider("sk-test", "stage", api.url + "/")
+
+    assert provider.submit({"timeline": {"tracks": []}}) == "render-1"
+
+    request, = api.requests
+    assert request["headers"]["x-api-key"] == "sk-test"
+    assert request["headers"]["content-type"] == "application/json"
+    assert request["json"] == {"timeline": {"tracks": []}}
+
+
+def test_shotstack_check_parses_each_status(api):
+    api.route("GET", "/v1/render/render-1",
+              (200, {"response": {"status": "rendering"}}),
+              (200, {"response": {"status": "done", "url": "https://cdn/render-1.mp4"}}))
+    api.route("GET", "/v1/render/render-2", (200, {"response": {"status": "failed", "error": "bad asset"}}))
+    provider = ShotstackProvider("sk-test", "v1", api.url)
+
+    assert provider.check("render-1") == (PENDING, None, None)
+    assert provider.check("render-1") == (DONE, "https://cdn/render-1.mp4", None)
+    assert provider.check("render-2") == (FAILED, None, "bad asset")
+
+
+def test_shotstack_rejection_raises(api):
+    api.route("POST", "/stage/render", (403, {"message": "Forbidden"}))
+
+    with pytest.raises(requests.HTTPError):
+        ShotstackProvider("wrong", "stage", api.url).submit({})
+
+
+def test_d_id_submit_posts_to_talks_with_basic_auth(api):
+    api.route("POST", "/talks", (201, {"id": "tlk_1", "status": "created"}))
+    provider = DIdProvider("user:secret", api.url)
+
+    assert provider.submit({"script": {"type": "text", "input": "Hello"}}) == "tlk_1"
+
+    request, = api.requests
+    assert request["headers"]["authorization"] == "Basic user:secret"
+    assert request["headers"]["accept"] == "application/json"
+    assert request["json"] == {"script": {"type": "text", "input": "Hello"}}
+
+
+def test_d_id_submit_without_a_talk_id_is_an_error(api):
+    api.route("POST", "/talks", (200, {"status": "created"}))
+
+    with pytest.raises(ValueError, match="talk ID"):
+        DIdProvider("key", api.url).submit({})
+
+
+def test_d_id_check_parses_each_status(api):
+    api.route("GET", "/talks/tlk_1",
+              (200, {"id": "tlk_1", "status": "started"}),
+              (200, {"id": "tlk_1", "status": "done", "result_url": "https://d-id/tlk_1.mp4"}))
+    api.route("GET", "/talks/tlk_2", (200, {"status": "error", "error": {"kind": "FaceError"}}))
+    api.route("GET", "/talks/tlk_3", (200, {"status": "rejected", "error": "moderation"}))
+    provider = DIdProvider("key", api.url)
+
+    assert provider.check("tlk_1") == (PENDING, None, None)
+    assert provider.check("tlk_1") == (DONE, "https://d-id/tlk_1.mp4", None)
+    assert provider.check("tlk_2") == (FAILED, None, "{'kind': 'FaceError'}")
+    assert provider.check("tlk_3") == (FAILED, None, "moderation")
+
+
+def test_queue_polls_a_d_id_talk_until_it_is_done(api):
+    api.route("POST", "/talks", (201, {"id": "tlk_9"}))
+    api.route("GET", "/talks/tlk_9",
+              (200, {"status": "created"}), (200, {"status": "started"}),
+              (200, {"status": "done", "result_url": "https://d-id/tlk_9.mp4"}))
+    queue = RenderJobQueue([DIdProvider("key", api.url)], path=":memory:", initial_interval=0.01, max_interval=0.02)
+    try:
+        job = queue.wait(queue.submit("d-id", {"script": {}}), timeout=5)
+    finally:
+        queue.stop()
+
+    assert (job["status"], job["result_url"], job["remote_id"]) == (DONE, "https://d-id/tlk_9.mp4", "tlk_9")
+    assert [r["path"] for r in api.requests] == ["/talks"] + ["/talks/tlk_9"] * 3
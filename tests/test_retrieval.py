@@ -0,0 +1,59 @@
+from ai_core.retrieval import ChapterIndex, build_context, chunk_text, tokenize
+
+MIRRORS = "Concave mirrors converge light to a focus. A mirror reflects rays at equal angles. " * 4
+LENSES = "Convex lenses refract light through glass and form real images on a screen. " * 4
+CELLS = "Plant cells have a cell wall, chloroplasts and a large central vacuole. " * 4
+CHAPTER = " ".join([MIRRORS, LENSES, CELLS])
+
+
+def make_index():
+    # One topic per chunk.
+    return ChapterIndex(CHAPTER, chunk_chars=len(MIRRORS) + 1, overlap=0)
+
+
+def test_chunks_with_the_query_terms_rank_first():
+    index = make_index()
+    assert len(index.chunks) == 3
+
+    scores = index.scores("How do convex lenses refract light?")
+
+    assert scores.index(max(scores)) == 1
+    assert scores[2] == 0.0
+    # "light" occurs in two chunks, so it counts for less than the rarer "refract".
+    assert scores[1] > scores[0] > 0
+
+
+def test_top_chunks_respects_the_budget_and_keeps_document_order():
+    index = make_index()
+    chunk_tokens = len(index.chunks[0]) // 4
+
+    assert index.top_chunks("chloroplasts and concave mirrors", chunk_tokens * 2 + 5) == [index.chunks[0], index.chunks[2]]
+    assert index.top_chunks("chloroplasts", chunk_tokens + 5) == [index.chunks[2]]
+
+
+def test_empty_query_falls_back_to_the_start_of_the_chapter():
+    index = make_index()
+    chunk_tokens = len(index.chunks[0]) // 4
+
+    assert index.scores("") == [0.0, 0.0, 0.0]
+    assert index.scores("the of and") == [0.0, 0.0, 0.0]
+    assert index.top_chunks("", chunk_tokens + 5) == [index.chunks[0]]
+
+
+def test_empty_corpus_is_handled():
+    index = ChapterIndex("")
+
+    assert index.chunks == []
+    assert index.scores("light") == []
+    assert index.top_chunks("light", 100) == []
+    assert index.context_for("light", 100) == ""
+    assert build_context("", "light", 100) == ""
+    assert chunk_text("   ") == []
+
+
+def test_short_text_is_returned_unchanged():
+    assert build_context(MIRRORS, "cells", 10_000) == MIRRORS
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("What is a Concave mirror's focus?") == ["concave", "mirror", "focus"]
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from ai_core import settings
+from ai_core.settings import Settings, get_settings
+
+
+def test_defaults_with_an_empty_environment():
+    config = Settings({})
+
+    assert config.gemini_api_key is None
+    assert config.llm_max_concurrency == 8
+    assert config.llm_timeout == 120.0
+    assert config.pdf_extract_workers == (os.cpu_count() or 1)
+    assert config.video_backend == "local"
+    assert config.simulation_host == "127.0.0.1" and config.simulation_port == 8765
+    assert config.simulation_public_url is None
+    assert config.grader_min_answer_words == 4
+    assert config.trace_sinks == []
+    assert config.trace_file == os.path.join("output", "traces.jsonl")
+
+
+def test_environment_overrides_are_typed():
+    config = Settings({
+        "GEMINI_API_KEY": "key",
+        "LLM_MAX_CONCURRENCY": "2",
+        "LLM_TIMEOUT": "7.5",
+        "PDF_EXTRACT_WORKERS": "3",
+        "SIMULATION_PUBLIC_URL": "https://learnverse.example/sim",
+        "GRADER_DUPLICATE_SIMILARITY": "0.75",
+        "LEARNVERSE_TRACE": " JSONL, prometheus ,,",
+    })
+
+    assert config.gemini_api_key == "key"
+    assert config.llm_max_concurrency == 2
+    assert config.llm_timeout == 7.5
+    assert config.pdf_extract_workers == 3
+    assert config.simulation_public_url == "https://learnverse.example/sim"
+    assert config.grader_duplicate_similarity == 0.75
+    assert config.trace_sinks == ["jsonl", "prometheus"]
+
+
+def test_invalid_number_is_rejected():
+    with pytest.raises(ValueError):
+        Settings({"LLM_MAX_RETRIES": "four"})
+
+
+def test_process_environment_is_read_once(monkeypatch):
+    monkeypatch.setattr(settings, "_settings", None)
+    monkeypatch.setattr(settings, "load_dotenv", lambda: None)
+    monkeypatch.setenv("PREFETCH_CONCURRENCY", "5")
+
+    first = get_settings()
+    monkeypatch.setenv("PREFETCH_CONCURRENCY", "9")
+
+    assert first.prefetch_concurrency == 5
+    assert get_settings() is first
@@ -0,0 +1,39 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ai_core.simulation_generator import render_simulation_page
+from ai_core.simulation_store import PAGE_CONTENT_SECURITY_POLICY, SimulationStore
+
+
+def test_served_pages_use_etags_and_bind_to_loopback():
+    store = SimulationStore("simulations")
+    key = store.put("Lens", "context", "<html>ok</html>")
+    server = store.serve(port=0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(store.url(key)) as response:
+            etag = response.headers["ETag"]
+            assert response.read() == b"<html>ok</html>"
+            assert "sandbox" in response.headers["Content-Security-Policy"]
+        request = urllib.request.Request(store.url(key), headers={"If-None-Match": etag})
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 304
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_public_url_is_used_without_a_local_server():
+    store = SimulationStore("simulations")
+    assert store.url("abc", public_url=None) is None
+    assert store.url("abc", public_url="https://learn.example.com/sims/") == \
+        "https://learn.example.com/sims/simulations/abc.html"
+
+
+def test_pages_carry_their_csp_for_inline_rendering():
+    page = render_simulation_page("Lens <b>", "draw();")
+    assert f'content="{PAGE_CONTENT_SECURITY_POLICY}"' in page
+    assert "Lens &lt;b&gt;" in page
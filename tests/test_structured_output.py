@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from ai_core.structured_output import (
+    IncrementalJSONParser, generate_validated, parse_json_response, repair_truncated_json,
+    validate_quiz_questions,
+)
+
+QUIZ_PROMPT = "Write {n} quiz questions about {topic}."
+TOPUP_PROMPT = "Write {count} more quiz questions about {topic}. Already have: {existing}"
+
+
+def question(text):
+    return {"question_text": text, "options": ["a", "b", "c", "d"], "correct_answer": "a"}
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('[1,2', [1, 2]),
+    ('["a"', ["a"]),
+    ('["a", "b', ["a"]),
+    ('[1, tr', [1]),
+    ('[1, 2.', [1]),
+    ('{"questions": [', {"questions": []}),
+    ('{"concepts": ["Lenses", "Mirr', {"concepts": ["Lenses"]}),
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": "x\\"y', {}),
+])
+def test_repair_drops_only_the_incomplete_tail(text, expected):
+    assert repair_truncated_json(text) == expected
+
+
+def test_repair_drops_a_partial_trailing_object():
+    complete = json.dumps(question("Q1"))
+    for tail in ('{"question_text":"Q2"', '{"question_text":"Q2",', '{"question_text":"Q2","options":["a"'):
+        text = '{"questions":[' + complete + "," + tail
+
+        assert repair_truncated_json(text) == {"questions": [question("Q1")]}, tail
+
+
+def test_repair_rejects_text_that_is_not_truncated_json():
+    with pytest.raises(ValueError):
+        repair_truncated_json("[note] the list follows")
+    with pytest.raises(ValueError):
+        repair_truncated_json('"just a string')
+
+
+def test_parse_json_response_repairs_the_first_value_rather_than_a_nested_one():
+    assert parse_json_response('Sure! [note] Here: ```json\n[["a", "b"], ["c"') == [["a", "b"]]
+
+
+def test_incremental_parser_stops_at_the_first_complete_value():
+    parser = IncrementalJSONParser()
+    chunks = ['Here [note] you go: {"questions": [{"q": "a]"}', "]}", " and some trailing prose {"]
+
+    done = [parser.feed(chunk) for chunk in chunks]
+
+    assert done == [False, True, True]
+    assert parser.value == {"questions": [{"q": "a]"}]}
+
+
+def test_truncated_answer_is_topped_up_with_only_the_missing_questions(stub_client):
+    def respond(prompt):
+        if prompt.startswith("Write 2 more"):
+            return json.dumps({"questions": [question("Q2"), question("Q3")]})
+        # Cut off inside the second question.
+        return '{"questions": [' + json.dumps(question("Q1")) + ', {"question_text": "Q2", "opt'
+    backend = stub_client(respond).backend
+
+    questions, problems = generate_validated(
+        QUIZ_PROMPT, validate_quiz_questions, expected=3, topup_template=TOPUP_PROMPT,
+        key=lambda q: q["question_text"], n=3, topic="optics",
+    )
+
+    assert [q["question_text"] for q in questions] == ["Q1", "Q2", "Q3"]
+    assert problems == []
+    assert len(backend.calls) == 2
+    # Only the complete question is listed as existing, so the partial one is asked for again.
+    assert '"Q1"' in backend.calls[1] and '"Q2"' not in backend.calls[1]
+
+
+def test_no_top_up_when_the_first_answer_is_complete(stub_client):
+    backend = stub_client(lambda prompt: json.dumps({"questions": [question("Q1"), question("Q2")]})).backend
+
+    questions, _ = generate_validated(QUIZ_PROMPT, validate_quiz_questions, expected=2,
+                                      topup_template=TOPUP_PROMPT, n=2, topic="optics")
+
+    assert len(questions) == 2
+    assert len(backend.calls) == 1
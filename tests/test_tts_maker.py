@@ -0,0 +1,87 @@
+import os
+import wave
+
+import pytest
+
+from ai_core import tts_maker
+from ai_core.tts_maker import make_tts, split_sentences
+
+
+@pytest.fixture
+def synthesizer(monkeypatch):
+    """Replaces both TTS engines with stubs; gTTS writes the sentence as its "audio"."""
+    calls = {"gtts": [], "pyttsx3": []}
+
+    def gtts(text, out_path, lang="en"):
+        calls["gtts"].append((text, out_path))
+        with open(out_path, "wb") as f:
+            f.write(f"[{text}]".encode("utf-8"))
+        return out_path
+
+    def pyttsx3(text, out_path):
+        calls["pyttsx3"].append((text, out_path))
+        with wave.open(out_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(1)
+            f.setframerate(8000)
+            f.writeframes(text.encode("utf-8"))
+        return out_path
+
+    monkeypatch.setattr(tts_maker, "make_tts_gtts", gtts)
+    monkeypatch.setattr(tts_maker, "make_tts_pyttsx3", pyttsx3)
+    return calls
+
+
+def test_split_sentences_on_terminal_punctuation():
+    assert split_sentences("Light bends.  Why? Because it slows!\nThe end") == [
+        "Light bends.", "Why?", "Because it slows!", "The end",
+    ]
+    assert split_sentences("   ") == []
+
+
+def test_segments_are_cached_per_sentence(synthesizer):
+    out = make_tts("Light bends. It slows down in water.", os.path.join("output", "a.mp3"))
+
+    assert open(out, "rb").read() == b"[Light bends.][It slows down in water.]"
+    assert [text for text, _ in synthesizer["gtts"]] == ["Light bends.", "It slows down in water."]
+
+    synthesizer["gtts"].clear()
+    out = make_tts("Light bends. It speeds up in air.", os.path.join("output", "b.mp3"))
+
+    assert open(out, "rb").read() == b"[Light bends.][It speeds up in air.]"
+    assert [text for text, _ in synthesizer["gtts"]] == ["It speeds up in air."]
+
+
+def test_segment_is_written_under_a_per_process_temp_name(synthesizer):
+    make_tts("Light bends.", os.path.join("output", "a.mp3"))
+
+    (_, tmp_path), = synthesizer["gtts"]
+    assert f".{os.getpid()}." in os.path.basename(tmp_path) and tmp_path.endswith(".mp3")
+    assert not os.path.exists(tmp_path)
+    assert os.listdir(tts_maker.SEGMENT_CACHE_DIR) == [os.path.basename(tts_maker._segment_path("Light bends.", "gtts:en"))]
+
+
+def test_failed_synthesis_leaves_nothing_in_the_cache(synthesizer, monkeypatch):
+    def broken(text, out_path, lang="en"):
+        open(out_path, "wb").close()
+        raise OSError("network down")
+    monkeypatch.setattr(tts_maker, "make_tts_gtts", broken)
+
+    with pytest.raises(OSError):
+        tts_maker.synthesize_sentence("Light bends.")
+
+    assert os.listdir(tts_maker.SEGMENT_CACHE_DIR) == []
+
+
+def test_pyttsx3_fallback_joins_wav_segments(synthesizer, monkeypatch):
+    def offline(text, out_path, lang="en"):
+        raise OSError("no network")
+    monkeypatch.setattr(tts_maker, "make_tts_gtts", offline)
+
+    out = make_tts("Light bends. It slows down.", os.path.join("output", "lesson.mp3"))
+
+    assert out == os.path.join("output", "lesson.wav")
+    with wave.open(out, "rb") as joined:
+        assert (joined.getnchannels(), joined.getsampwidth(), joined.getframerate()) == (1, 1, 8000)
+        assert joined.readframes(joined.getnframes()) == b"Light bends.It slows down."
+    assert [text for text, _ in synthesizer["pyttsx3"]] == ["Light bends.", "It slows down."]